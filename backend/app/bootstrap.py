@@ -7,15 +7,18 @@ from backend.app.core.carrefour import CarrefourParent
 from backend.app.core.publishedprices import PublishedPrices
 from backend.app.core.shufersal import Shufersal
 from backend.app.core.super_class import SupermarketChain
+from backend.app.pipeline.prefetch import start_prefetcher
 
 
 def initialize_backend():
     """
     Call this once at app startup.
-    Ensures all supermarket chains subclasses are imported and registered.
+    Ensures all supermarket chains subclasses are imported and registered,
+    and starts the background prefetcher.
     """
     # print("Registered chains:", SupermarketChain.registry)
-    pass
+    # Keep price data of popular stores warm in the background (started once per process)
+    start_prefetcher()
 
 
 
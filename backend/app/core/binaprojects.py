@@ -1,68 +1,103 @@
 import httpx
-from datetime import datetime, timedelta
+import asyncio
+from datetime import datetime, timedelta, date
 import json
 
 from backend.app.utilities.url_request import url_request
+from backend.app.utilities.file_index import FileIndex, FileRecord, parse_file_url
 from backend.app.core.super_class import SupermarketChain
 
 
+# Days to look back for files
+MAX_DAYS_BACK = 14
+# Dates probed at the same time when looking back for files
+DATE_FANOUT = 4
+# File types (as parsed from file names) → keys of the dict returned by prices()
+FILE_NAME_TYPES = {'Price': 'prices', 'Promo': 'promo', 'PriceFull': 'pricefull', 'PromoFull': 'promofull'}
+
+# Last date each chain had files of a type - {(alias, file_type): date}
+_last_dates: dict[tuple[str, int], date] = {}
+
+
+def file_type_of(file_name: str) -> str | None:
+    """ File type (PriceFull, Price, ...) of a binaprojects file name """
+    record = parse_file_url(file_name)
+    return record.file_type if record else None
+
+
 class BinaProjects(SupermarketChain):
     abstract = True
 
     @classmethod
-    async def get_file(cls, file_type: int = 0, store: int = 0, date: str | None = None,
+    async def probe_date(cls, url: str, file_type: int, store: int | str, day: datetime,
+                         client: httpx.AsyncClient | None = None) -> dict:
+        """ Files of the type published on day - {response: [...]} (empty list if none) or {Error: ...} """
+        payload = {
+            "WStore": str(store),
+            "WDate": day.strftime("%d/%m/%Y"),
+            "WFileType": str(file_type),
+        }
+        headers = {
+            "X-Requested-With": "XMLHttpRequest",
+            "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+        }
+        result = await url_request(url, method="POST", payload=payload, headers=headers, client=client)
+        # Handle response or error
+        if "Error" in result:
+            return result
+        try:
+            return {'response': json.loads(result["response"]) or []}
+        except Exception as e:
+            return {"Error": f"Invalid JSON response: {str(e)}"}
+
+    @classmethod
+    async def get_file(cls, file_type: int = 0, store: int = 0, file_date: str | None = None,
                        client: httpx.AsyncClient | None = None) -> dict:
         """
         Asynchronously get defined files for Binaproject supermarket chains.
 
-        :param chain_code: Chain code identifying the supermarket chain.
-        :param session: (Ignored) for backward compatibility.
         :param file_type: 0-all, 1-stores, 2-prices, 3-promo, 4-pricefull, 5-promofull.
         :param store: store code.
-        :param date: specific date string (DD/MM/YYYY), otherwise today.
+        :param file_date: specific date string (DD/MM/YYYY), otherwise today.
         :param client: Optional pre-configured httpx.AsyncClient.
-        :return: JSON dict of relevant files or error message.
+        :return: JSON dict of relevant files (of the latest date that has any) or error message.
+        Dates are probed backwards DATE_FANOUT at a time, the first batch reaching back to the last date
+        the chain had data.
         """
         base_url = await cls.get_url()
         base_url = base_url[:-9]  # Remove last 9 characters
         url = f"{base_url}MainIO_Hok.aspx"
 
         # Determine start date
-        current_date = (
-            datetime.today() if date is None else datetime.strptime(date, "%d/%m/%Y")
-        )
-
-        # Loop backward until we find data
-        today = datetime.today()
-        while current_date > today - timedelta(days=14):
-            date_str = current_date.strftime("%d/%m/%Y")
-            payload = {
-                "WStore": str(store),
-                "WDate": date_str,
-                "WFileType": str(file_type),
-            }
-            headers = {
-                "X-Requested-With": "XMLHttpRequest",
-                "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-            }
-            result = await url_request(url, method="POST", payload=payload, headers=headers, client=client)
-
-            # Handle response or error
-            if "Error" in result:
-                return result  # Return immediately on HTTP/network error
-
-            try:
-                data = result["response"]
-                json_data = json.loads(data)
-                if json_data:  # non-empty list
-                    return {'response': json_data}
-            except Exception as e:
-                return {"Error": f"Invalid JSON response: {str(e)}"}
-
-            # If no file for date, go back one day
-            current_date -= timedelta(days=1)
-
-        return {"Error": "No files found in the last 14 days."}
+        start = datetime.today() if file_date is None else datetime.strptime(file_date, "%d/%m/%Y")
+        oldest = datetime.today() - timedelta(days=MAX_DAYS_BACK)
+        dates = []
+        while start > oldest:
+            dates.append(start)
+            start -= timedelta(days=1)
+
+        # First batch reaches back to the last date that had data (usually today or yesterday)
+        remembered = _last_dates.get((cls.alias, file_type))
+        first = next((i + 1 for i, d in enumerate(dates) if d.date() == remembered), DATE_FANOUT)
+        batches = [dates[:first]] + [dates[i:i + DATE_FANOUT] for i in range(first, len(dates), DATE_FANOUT)]
+
+        semaphore = asyncio.Semaphore(DATE_FANOUT)
+
+        async def probe(day: datetime) -> dict:
+            async with semaphore:
+                return await cls.probe_date(url, file_type, store, day, client=client)
+
+        for batch in batches:
+            results = await asyncio.gather(*(probe(day) for day in batch))
+            # Newest date first
+            for day, result in zip(batch, results):
+                if "Error" in result:
+                    return result  # Return immediately on HTTP/network error
+                if result['response']:
+                    _last_dates[(cls.alias, file_type)] = day.date()
+                    return result
+
+        return {"Error": f"No files found in the last {MAX_DAYS_BACK} days."}
 
     @classmethod
     async def latest_file(cls, data: list[dict]) -> dict:
@@ -95,23 +130,95 @@ class BinaProjects(SupermarketChain):
 
     @classmethod
     async def prices(cls, store_code: int | str):
+        """
+        This function gets price and promo files for binaprojects supermarket chain.
+        All file types are listed with one request (WFileType=0) and split locally - only types missing on
+        that date are looked up on their own.
+        """
         types = {'prices': 2, 'promo': 3, 'pricefull': 4, 'promofull': 5}
         try:
-            prices = {}
-            for t, ft in types.items():
-                # Get links for file type
-                file_links = await cls.get_file(file_type=ft, store=store_code)
-                # From response, get the latest store file
-                latest = await cls.latest_file(file_links['response'])
-                base_url = await cls.get_url()
-                base_url = base_url[:-9]
-                # Construct full download URL
-                latest_url = f"{base_url}Download/{latest['FileNm']}"
-                prices[t] = latest_url
-            return prices
+            file_links = await cls.get_file(file_type=0, store=store_code)
+            if 'Error' in file_links:
+                return file_links
+
+            # Files of the date by type
+            rows_by_type = {t: [] for t in types}
+            for row in file_links['response']:
+                t = FILE_NAME_TYPES.get(file_type_of(row.get('FileNm', '')))
+                if t:
+                    rows_by_type[t].append(row)
+
+            # Types without a file on that date (e.g. full files published on another day)
+            missing = [t for t, rows in rows_by_type.items() if not rows]
+            if missing:
+                async with asyncio.TaskGroup() as tg:
+                    tasks = {t: tg.create_task(cls.get_file(file_type=types[t], store=store_code)) for t in missing}
+                for t, task in tasks.items():
+                    result = task.result()
+                    if 'Error' in result:
+                        print(f"Error getting {t} files for {cls.alias} store {store_code}: {result['Error']}")
+                    rows_by_type[t] = result.get('response', [])
+
+            return await cls.download_urls(rows_by_type)
         except Exception as e:
             return {'Error': str(e)}
 
+    @classmethod
+    async def files_since(cls, store_code: int | str, file_type: str, since: datetime) -> list[FileRecord] | None:
+        """
+        Files of the type published for the store after since - from the store's files of all types of the
+        latest date (None when since is before the oldest of them)
+        """
+        file_links = await cls.get_file(file_type=0, store=store_code)
+        if 'Error' in file_links:
+            return None
+        base_url = (await cls.get_url())[:-9]
+        urls = [f"{base_url}Download/{row['FileNm']}" for row in file_links['response'] if row.get('FileNm')]
+        return FileIndex.from_urls(urls).files_since(store_code, file_type, since)
+
+    @classmethod
+    async def download_urls(cls, rows_by_type: dict[str, list[dict]]) -> dict:
+        """ Download urls of the latest file of each type - {prices: url, promo: url, ...} (types with files only) """
+        base_url = await cls.get_url()
+        base_url = base_url[:-9]
+        prices = {}
+        for t, rows in rows_by_type.items():
+            if not rows:
+                continue
+            # From response, get the latest file of the type
+            latest = await cls.latest_file(rows)
+            # Construct full download URL
+            prices[t] = f"{base_url}Download/{latest['FileNm']}"
+        return prices
+
+    @classmethod
+    async def prices_for_stores(cls, store_codes: list[int | str]) -> dict[str, dict]:
+        """
+        Price and promo files for several stores with one request - the files of all stores (WStore=0) of the
+        latest date, split by store locally. Stores missing a file type on that date are resolved with prices().
+        """
+        codes = list(dict.fromkeys(str(code) for code in store_codes))
+        file_links = await cls.get_file(file_type=0, store=0)
+
+        # Files by store and type
+        by_store = {}
+        for row in file_links.get('response', []) if 'Error' not in file_links else []:
+            record = parse_file_url(row.get('FileNm', ''))
+            t = FILE_NAME_TYPES.get(record.file_type) if record else None
+            if t and record.store_code is not None:
+                by_store.setdefault(record.store_code, {}).setdefault(t, []).append(row)
+
+        results = {}
+        for code in codes:
+            rows_by_type = by_store.get(int(code), {})
+            if len(rows_by_type) == len(FILE_NAME_TYPES):
+                results[code] = await cls.download_urls(rows_by_type)
+
+        missing = [code for code in codes if code not in results]
+        if missing:
+            results.update(await super().prices_for_stores(missing))
+        return {code: results[code] for code in codes}
+
     @classmethod
     async def extract_stores_data_for_db_type1(cls, stores_data_dict: dict) -> dict[str, list[dict]]:
         """
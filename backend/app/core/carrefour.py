@@ -1,7 +1,6 @@
 import httpx
 import asyncio
 import re
-from datetime import datetime
 import json
 
 from backend.app.utilities.url_request import url_request
@@ -10,6 +9,7 @@ from backend.app.core.super_class import SupermarketChain
 
 class CarrefourParent(SupermarketChain):
     abstract = True
+    indexed = True
 
     @classmethod
     async def get_files(cls, client: httpx.AsyncClient | None = None) -> dict:
@@ -72,90 +72,32 @@ class CarrefourParent(SupermarketChain):
         return {'full_urls': full_urls}
 
     @classmethod
-    async def latest_stores(cls, urls: list[str]) -> str:
-        """ Get the latest store file from a given list of URLs. """
-        def extract_date(url: str):
-            # Extract the date and time using regex
-            match = re.search(r'/(\d{8})/.*-(\d{8})-(\d{6})\.xml$', url)
-            if match:
-                folder_date, file_date, file_time = match.groups()
-                return int(f"{file_date}{file_time}")
-
-        return max(urls, key=lambda url: extract_date(url))
-
-    @classmethod
-    async def latest_prices(cls, urls: list[str]) -> str:
-        """ Get the latest price/promo file from a given list of URLs. """
-        def extract_datetime(url: str):
-            # # Extract the date and time
-            # return int(url.split('-')[-1].split('.')[0])
-            # Pattern matches YYYYMMDD followed by optional HHMM or HHMMSS
-            pattern = r'(\d{8})(?:-?(\d{4,6}))?'
-
-            match = re.search(pattern, url)
-            if match:
-                date_part = match.group(1)  # YYYYMMDD
-                time_part = match.group(2)  # HHMM or HHMMSS (if exists)
-
-                if time_part:
-                    if len(time_part) == 4:
-                        # HHMM format
-                        datetime_str = date_part + time_part
-                        return datetime.strptime(datetime_str, '%Y%m%d%H%M')
-                    elif len(time_part) == 6:
-                        # HHMMSS format
-                        datetime_str = date_part + time_part
-                        return datetime.strptime(datetime_str, '%Y%m%d%H%M%S')
-                else:
-                    # Date only
-                    return datetime.strptime(date_part, '%Y%m%d')
-
-            return None
-        return max(urls, key=lambda url: extract_datetime(url))
-
-    @classmethod
-    async def stores(cls, client: httpx.AsyncClient | None = None) -> dict:
-        """ This function gets latest store list for carrefour supermarket chain. """
+    async def listing(cls) -> dict:
+        """ All file urls of the chain - the listing indexed by file_index() """
         all_urls = await cls.full_urls()
-        # If no errors:
-        if 'Error' not in all_urls.keys():
-            store_urls = [url for url in all_urls['full_urls'] if 'store' in url.lower()]
-            latest = await cls.latest_stores(store_urls)
-            return {'stores': store_urls[0] if store_urls else 'No Url'}
-        else:
+        if 'Error' in all_urls:
             return all_urls
+        return {'urls': all_urls['full_urls']}
 
     @classmethod
-    async def price_urls_by_type(cls, urls: list[str]) -> dict:
-        """ This function organizes price and promo URLs by type for selected Carrefour supermarket store. """
-        types = ["PromoFull", "Promo", "PriceFull", "Price"]
-        urls_by_type_dict = {t: [] for t in types}
-        for url in urls:
-            for t in types:
-                if t in url:
-                    urls_by_type_dict[t].append(url)
-                    break
-        return urls_by_type_dict
+    async def stores(cls, client: httpx.AsyncClient | None = None) -> dict:
+        """ This function gets latest store list for carrefour supermarket chain. """
+        index = await cls.file_index()
+        # If errors:
+        if isinstance(index, dict):
+            return index
+        return {'stores': index.latest_stores_url() or 'No Url'}
 
     @classmethod
     async def prices(cls, store_code: int | str = None) -> dict:
         """ This function gets price and promo files for selected carrefour supermarket chain. """
-        # All urls for the chain
-        all_urls = await cls.full_urls()
-        # If no errors:
-        if 'Error' not in all_urls.keys():
-            # Price and promo files for the selected store
-            price_urls = [url for url in all_urls['full_urls'] if int(url.split('-')[1]) == int(store_code)]
-            # Organize Urls by type and get latest for each type
-            price_urls_dict = await cls.price_urls_by_type(price_urls)
-            for key in price_urls_dict.keys():
-                if price_urls_dict[key]:
-                    price_urls_dict[key] = await cls.latest_prices(price_urls_dict[key])
-                else:
-                    price_urls_dict[key] = None
-            return price_urls_dict
-        else:
-            return all_urls
+        # Index of all files of the chain - one fetched listing answers all stores within LISTING_TTL
+        index = await cls.file_index()
+        # If errors:
+        if isinstance(index, dict):
+            return index
+        # Latest url of each type for the selected store (None if the store has no file of that type)
+        return cls.index_prices(index, store_code)
 
     @classmethod
     async def extract_stores_data_for_db(cls, stores_data_dict: dict) -> dict[str, list[dict]]:
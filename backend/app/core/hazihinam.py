@@ -2,11 +2,28 @@ import httpx
 from bs4 import BeautifulSoup
 import asyncio
 import re
+import time
+import weakref
+from html import unescape
 
 from backend.app.utilities.url_request import url_request
+from backend.app.utilities.http_client import get_client
+from backend.app.utilities.file_index import FileIndex, parse_file_url
 from backend.app.core.super_class import SupermarketChain
 
 
+FILE_LINK = re.compile(r'href="(https://hazihinamprod01\.blob\.core\.windows\.net/regulatories/[^"]+)"')
+# Concurrent page requests to the hazihinam site
+PAGE_CONCURRENCY = 4
+# Seconds between full crawls of the archive (incremental crawls in between)
+FULL_CRAWL_EVERY = 6 * 60 * 60
+
+# Page request limits - {event loop: semaphore}
+_page_limits: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]' = weakref.WeakKeyDictionary()
+# Urls seen per file type - {(alias, file_type): {'urls': [...], 'watermark': newest file time, 'crawled': time}}
+_crawled: dict[tuple[str, int], dict] = {}
+
+
 class HaziHinam(SupermarketChain):
     abstract = False
     name = 'כל בו חצי חינם בע"מ'
@@ -14,6 +31,7 @@ class HaziHinam(SupermarketChain):
     chain_code = '7290700100008'
     url = 'https://shop.hazi-hinam.co.il/Prices'
     link_type = 'hazihinam'
+    indexed = True
 
 
     @classmethod
@@ -23,66 +41,89 @@ class HaziHinam(SupermarketChain):
         """
         soup = BeautifulSoup(html, "lxml")
         pagination = soup.find("ul", class_="pagination")
-        li_items = pagination.find_all("li")
-        if not pagination:
-            li_items = 0
+        li_items = pagination.find_all("li") if pagination else []
         return {'response': len(li_items)}
 
     @classmethod
     async def parse_html_for_files(cls, html: str) -> dict:
-        """ Parse HTML to extract file URLs. """
-        soup = BeautifulSoup(html, "lxml")
-        links = [
-            a["href"]
-            for a in soup.find_all("a", href=True)
-            if a["href"].startswith("https://hazihinamprod01.blob.core.windows.net/regulatories/")
-        ]
-        return {'result': links}
+        """ Extract file URLs from a page - a targeted regex instead of building a whole soup per page """
+        return {'result': [unescape(link) for link in FILE_LINK.findall(html or '')]}
+
+    @classmethod
+    def page_limit(cls) -> asyncio.Semaphore:
+        """ Semaphore bounding concurrent page requests to the hazihinam host (per event loop) """
+        loop = asyncio.get_running_loop()
+        semaphore = _page_limits.get(loop)
+        if semaphore is None:
+            semaphore = _page_limits[loop] = asyncio.Semaphore(PAGE_CONCURRENCY)
+        return semaphore
+
+    @classmethod
+    async def get_page(cls, file_type: int, page: int, client: httpx.AsyncClient | None = None) -> list[str]:
+        """ File URLs on one page of the file type """
+        base = await cls.get_url()
+        async with cls.page_limit():
+            response = await url_request(f'{base}?p={page}&t={file_type}', client=client)
+        if 'Error' in response:
+            raise RuntimeError(response['Error'])
+        links = await cls.parse_html_for_files(response.get('response', b'').decode('utf-8', errors='ignore'))
+        return links['result']
 
     @classmethod
     async def get_files(cls, file_type: int = None, client: httpx.AsyncClient | None = None) -> dict:
         """
         This function gets all urls of given file type for HaziHinam supermarket chain.
+        Pages are crawled PAGE_CONCURRENCY at a time and parsed as they arrive. When the type was crawled
+        before, the crawl stops at the first page with no file newer than the newest file already seen
+        (the site lists newest files first) and the new urls are merged with the known ones.
         """
         base = await cls.get_url()
-        # Request the first page to determine total number of pages
-        response = await url_request(f'{base}?t={file_type}', client=client)
-        html = response.get('response', '')
-        pages = await cls.get_num_pages(html)
-        page_num = pages.get('response', 0)
-
-        urls = []
-        # Urls for first page
-        extracted_urls = await cls.parse_html_for_files(html)
-        urls.extend(extracted_urls.get('result', []))
+        key = (cls.alias, file_type)
+        known = _crawled.get(key)
+        if known and time.monotonic() - known['crawled'] > FULL_CRAWL_EVERY:
+            known = None  # full crawl now and then to resync with the archive
 
-        # Loop through all pages to get URLs
         try:
-            responses = []
-            tasks = [url_request(f'{base}?p={page}&t={file_type}', client=client)
-                     for page in range(2, page_num + 1)]
-            responses += await asyncio.gather(*tasks)
-            for resp in responses:
-                links = await cls.parse_html_for_files(resp.get('response', ''))
-                urls.extend(links.get('result', []))
-
+            # Request the first page to determine total number of pages
+            response = await url_request(f'{base}?t={file_type}', client=client)
+            if 'Error' in response:
+                return response
+            html = response.get('response', b'').decode('utf-8', errors='ignore')
+            pages = await cls.get_num_pages(html)
+            page_num = pages.get('response', 0)
+
+            # Urls for first page
+            urls = (await cls.parse_html_for_files(html)).get('result', [])
+            watermark = known['watermark'] if known else None
+
+            def newest(links: list[str]):
+                return max((r.timestamp for r in map(parse_file_url, links) if r), default=None)
+
+            # Incremental crawls go page by page - usually one or two pages are new
+            step = 1 if watermark is not None else PAGE_CONCURRENCY
+            page = 2
+            stop = watermark is not None and not (newest(urls) and newest(urls) > watermark)
+            while not stop and page <= page_num:
+                window = range(page, min(page + step, page_num + 1))
+                async with asyncio.TaskGroup() as tg:
+                    tasks = [tg.create_task(cls.get_page(file_type, p, client=client)) for p in window]
+                for task in tasks:
+                    links = task.result()
+                    urls.extend(links)
+                    if watermark is not None and not (newest(links) and newest(links) > watermark):
+                        stop = True
+                page += len(window)
+
+            if known:
+                new = set(urls)
+                urls = urls + [url for url in known['urls'] if url not in new]
+            _crawled[key] = {'urls': urls, 'watermark': newest(urls) or watermark,
+                             'crawled': known['crawled'] if known else time.monotonic()}
             return {'response': urls}
 
         except Exception as e:
             return {'Error': str(e)}
 
-    @classmethod
-    async def latest(cls, urls: list[str]) -> str:
-        """ Get the latest file from a given list of URLs. """
-        def extract_date(url: str):
-            match = re.search(r"(\d{8})-(\d{6})", url)
-            if match:
-                date_str, time_str = match.groups()  # '20251108', '100919'
-                combined_int = int(date_str + time_str)  # → 20251108100919
-                return combined_int
-
-        return max(urls, key=lambda url: extract_date(url))
-
     @classmethod
     async def stores(cls, file_type: int = 3, client: httpx.AsyncClient | None = None):
         """ This function gets store list for hazihinam supermarket chain. """
@@ -91,23 +132,10 @@ class HaziHinam(SupermarketChain):
             file_links = await cls.get_files(file_type=file_type, client=client)
             all_urls = file_links.get('response', [])
             # Get the latest store file
-            latest_store = await cls.latest(all_urls) if all_urls else None
-            return {'stores': latest_store}
+            return {'stores': FileIndex.from_urls(all_urls).latest_stores_url()}
         except Exception as e:
             return {'Error': str(e)}
 
-    @classmethod
-    async def price_urls_by_type(cls, urls: list[str]) -> dict:
-        """ This function organizes price and promo URLs by type for selected supermarket store. """
-        types = ["PromoFull", "Promo", "PriceFull", "Price"]
-        urls_by_type_dict = {t: [] for t in types}
-        for url in urls:
-            for t in types:
-                if t in url:
-                    urls_by_type_dict[t].append(url)
-                    break
-        return urls_by_type_dict
-
     @classmethod
     async def get_price_files(cls):
         """
@@ -115,11 +143,12 @@ class HaziHinam(SupermarketChain):
         Helper function for prices function
         """
         tasks = {}
-        async with httpx.AsyncClient() as client:
-            async with asyncio.TaskGroup() as tg:
-                # file types 1 and 2
-                for file_type in (1, 2):
-                    tasks[file_type] = tg.create_task(cls.get_files(file_type=file_type, client=client))
+        # Both file types share the pooled client of the hazihinam host
+        client = get_client(await cls.get_url())
+        async with asyncio.TaskGroup() as tg:
+            # file types 1 and 2
+            for file_type in (1, 2):
+                tasks[file_type] = tg.create_task(cls.get_files(file_type=file_type, client=client))
 
         # TaskGroup completed → safe to read results
         urls = []
@@ -130,24 +159,22 @@ class HaziHinam(SupermarketChain):
 
         return {'response': urls}
 
+    @classmethod
+    async def listing(cls) -> dict:
+        """ All price and promo file urls of the chain - the listing indexed by file_index() """
+        file_links = await cls.get_price_files()
+        return {'urls': file_links.get('response', [])}
+
     @classmethod
     async def prices(cls, store_code: int | str):
         """ This function gets price and promo files for hazihinam supermarket chain. """
         try:
-            # Get all file links
-            file_links = await cls.get_price_files()
-
-            all_urls = file_links.get('response', [])
-            # Filter price and promo files for the selected store
-            price_urls = [url for url in all_urls if int(url.split('-')[2]) == int(store_code)]
-            # Organize Urls by type and get latest for each type
-            price_urls_dict = await cls.price_urls_by_type(price_urls)
-            for key in price_urls_dict.keys():
-                if price_urls_dict[key]:
-                    price_urls_dict[key] = await cls.latest(price_urls_dict[key])
-                else:
-                    price_urls_dict[key] = None
-            return price_urls_dict
+            # Index of all files of the chain - one fetched listing answers all stores within LISTING_TTL
+            index = await cls.file_index()
+            if isinstance(index, dict):
+                return index
+            # Latest url of each type for the selected store (None if the store has no file of that type)
+            return cls.index_prices(index, store_code)
         except Exception as e:
             return {'Error': str(e)}
 
@@ -1,14 +1,15 @@
 import httpx
 from bs4 import BeautifulSoup
-import asyncio
 from urllib.parse import urljoin
 
 from backend.app.utilities.url_request import url_request
+from backend.app.utilities.file_index import FileIndex, parse_file_url
 from backend.app.core.super_class import SupermarketChain
 
 
 class LaibCatalog(SupermarketChain):
     abstract = True
+    indexed = True
 
     @classmethod
     async def parse_response(cls, response: bytes) -> list[str | None]:
@@ -28,95 +29,71 @@ class LaibCatalog(SupermarketChain):
         return hrefs
 
     @classmethod
-    async def chain_links(cls, urls: list[str]) -> list[str]:
-        """ This function gets chain links from all laibcatalog link for selected supermarket chain. """
-        code = await cls.get_code()
-        return [url for url in urls if code in url]
-
-    @classmethod
-    async def all_urls_for_chain(cls, client: httpx.AsyncClient | None = None) -> list | dict:
-        """ This function gets store list for laibcatalog supermarket chains. """
+    async def portal_links(cls, client: httpx.AsyncClient | None = None) -> dict:
+        """
+        Download and parse the (multi chain) laibcatalog page and partition its links by chain code.
+        Return value: {chains: {chain_code: [urls]}} or {Error: ...}
+        """
         base = await cls.get_url()
-        # Get store list
         try:
             # Get response from the URL
             response = await url_request(base, client=client, )
-            # Parse the response to extract store links
+            if 'Error' in response:
+                return response
+            # Parse the response to extract file links
             all_links = await cls.parse_response(response['response'])
-            all_for_chain = await cls.chain_links(all_links)
-            return {'urls': all_for_chain}
         except httpx.HTTPStatusError as e:
             return {'Error': f"HTTP error: {e.response.status_code} - {e.response.text}"}
         except httpx.RequestError as e:
             return {'Error': f"Request error: {str(e)}"}
 
+        chains = {}
+        for url in all_links:
+            record = parse_file_url(url)
+            if record:
+                chains.setdefault(record.chain_code, []).append(url)
+        return {'chains': chains}
+
     @classmethod
-    async def get_latest(cls, urls: list[str]) -> str:
-        """ Get the latest file from a given list of URLs. """
-        def extract_date(url: str):
-            return url.split('/')[-1].split('-')[2]
-        return max(urls, key=lambda url: extract_date(url))
+    async def all_urls_for_chain(cls, client: httpx.AsyncClient | None = None) -> list | dict:
+        """
+        This function gets all file urls for the laibcatalog supermarket chain.
+        The portal page is fetched once (per LISTING_TTL) for all chains hosted on it.
+        """
+        base = await cls.get_url()
+        portal = await cls.cached_listing('portal', lambda: cls.portal_links(client=client), scope=base)
+        if 'Error' in portal:
+            return portal
+        return {'urls': portal['chains'].get(await cls.get_code(), [])}
 
     @classmethod
-    async def extract_store_code(cls, url: str) -> int:
-        """ This function extracts store code from laibcatalog URL. """
-        return int(url.split('/')[-1].split('-')[1])
+    async def listing(cls) -> dict:
+        """ All file urls of the chain - the listing indexed by file_index() """
+        return await cls.all_urls_for_chain()
 
     @classmethod
     async def stores(cls, client: httpx.AsyncClient | None = None) -> dict:
         """ This function gets store list for selected laibcatalog supermarket chain. """
-        all_urls = await cls.all_urls_for_chain(client=client)
-        # If no errors:
-        if 'Error' not in all_urls.keys():
-            store_urls = [url for url in all_urls['urls'] if 'store' in url.lower()]
-            if len(store_urls) == 1:
-                return {'stores': store_urls[0]}
-            elif len(store_urls) > 1:
-                return {'stores': await cls.get_latest(store_urls)}
-        else:
-            return all_urls
+        index = await cls.file_index()
+        # If errors:
+        if isinstance(index, dict):
+            return index
+        return {'stores': index.latest_stores_url()}
 
     @classmethod
-    async def prices_for_store(cls, store_code: int | str) -> dict:
+    async def prices(cls, store_code: int | str) -> dict:
         """ This function gets price and promo files for selected laibcatalog supermarket chain. """
-        # All urls for the chain
-        all_urls = await cls.all_urls_for_chain()
-        # If no errors:
-        if 'Error' not in all_urls.keys():
-            # Price and promo files for the selected store
-            store_urls = [url for url in all_urls['urls'] if await cls.extract_store_code(url) == int(store_code)]
-            return {'prices': store_urls}
-        else:
-            return all_urls
+        # Index of all files of the chain - one fetched listing answers all stores within LISTING_TTL
+        index = await cls.file_index()
+        # If errors:
+        if isinstance(index, dict):
+            return index
+        return cls.index_prices(index, store_code)
 
     @classmethod
-    async def price_urls_by_type(cls, urls: list[str]) -> dict:
-        """ This function organizes price and promo URLs by type for selected laibcatalog supermarket chain. """
-        types = ["PromoFull", "Promo", "PriceFull", "Price"]
-        urls_by_type_dict = {t: [] for t in types}
-        for url in urls:
-            for t in types:
-                if t in url:
-                    urls_by_type_dict[t].append(url)
-                    break
-        return urls_by_type_dict
-
-    @classmethod
-    async def prices(cls, store_code: int | str) -> dict:
-        """ This function gets price and promo files for selected laibcatalog supermarket chain. """
-        # Get price URLs for the selected store
-        all_urls = await cls.prices_for_store(store_code)
-        # No errors
-        if 'Error' not in all_urls.keys():
-            urls_by_type = await cls.price_urls_by_type(all_urls['prices'])
-            result = {}
-            for key in urls_by_type.keys():
-                latest_url = await cls.get_latest(urls_by_type[key]) if urls_by_type[key] else None
-                if latest_url is not None:
-                    result[key] = latest_url
-            return result
-        else:
-            return all_urls
+    def index_prices(cls, index: FileIndex, store_code: int | str) -> dict:
+        """ Latest url of each type the store has """
+        return {key: url for key, url in index.latest_for_store(store_code).items() if url is not None}
 
     @classmethod
     async def extract_stores_data_for_db(cls, stores_data_dict: dict) -> dict[str, list[dict]]:
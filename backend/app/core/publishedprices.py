@@ -1,113 +1,123 @@
 import httpx
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
-from playwright.async_api import Page, BrowserContext
-from datetime import datetime
+from playwright.async_api import Page
+import json
+import os
 import re
+import time
 import asyncio
 from backend.app.core.super_class import SupermarketChain
+from backend.app.utilities.browser_pool import BrowserPool, run_in_browser, SESSION_TTL
+from backend.app.utilities.url_request import url_request
+from backend.app.utilities.request_scheduler import scheduled
+from backend.app.utilities.file_index import FileIndex
+
+
+# Override of the portal address, e.g. http://127.0.0.1:8765 for the local stand-in server (devtools)
+PORTAL_URL = os.environ.get('XOLLIFY_PUBLISHEDPRICES_URL')
+CSRF_TOKEN = re.compile(r'<meta\s+name="csrftoken"\s+content="([^"]+)"')
+
+# Portal sessions per chain login - {username: {'cookies': {...}, 'csrftoken': str, 'created': time}}
+_sessions: dict[str, dict] = {}
 
 
 class PublishedPrices(SupermarketChain):
     abstract = True
+    indexed = True
+    # How file lists are fetched - 'json': portal json endpoint after a single login, 'browser': crawl the table
+    listing_mode = 'json'
 
     @classmethod
-    async def crawl_files(cls, ):
-        """
-        This function crawls files for publishedprices supermarket chains and returns a dict with:
-        -cookies
-        -list of all file links
-        """
-        # Get login details for chain
-        url = getattr(cls, 'url', '')
+    def login_details(cls) -> dict:
+        """ Login url, credentials and url of the files page for the chain """
+        url = f'{PORTAL_URL.rstrip("/")}/login' if PORTAL_URL else getattr(cls, 'url', '')
         target_url = f'{url[:-5]}file'
         username = getattr(cls, 'username', '')
-        password = getattr(cls, 'password', '')
 
         if username == 'yuda_ho':
             target_url = f'{target_url}/d/Yuda/'
 
-        browser_config = BrowserConfig(
-            headless=True,
-        )
-
-        crawler_config = CrawlerRunConfig(
-            cache_mode=CacheMode.BYPASS,
-            delay_before_return_html=5,
-            session_id="hn_session"
-        )
-
-        crawler = AsyncWebCrawler(config=browser_config)
-
-        result_holder = {}
-
-        async def on_page_context_created(page: Page, context: BrowserContext, **kwargs):
-            # Called right after a new page + context are created (ideal for auth or route config).
-            print("[HOOK] on_page_context_created - Setting up page & context.")
-
-            # Go to login page
-            await page.goto(url)
-            # Fill credentials and press submit
-            await page.fill("input[name='username']", username)
-            await page.fill("input[name='password']", password)  # if required
-            await page.click("button[type='submit']")
-            # Wait for redirect after login
-            await page.wait_for_load_state("networkidle", timeout=80000)
-            # If redirect is not the target url with files
-            if page.url != target_url:
-                # Go to target url
-                await page.goto(target_url)
-                # Wait for redirect
-                await page.wait_for_load_state("networkidle", timeout=80000)
-
-            # On page with files:
-            # Get cookies
-            result_holder['cookies'] = await context.cookies()
-            # Convert Playwright cookies (list of dicts) to a requests-compatible dict
-            result_holder['cookies'] = cls.playwright_cookies_to_requests(result_holder['cookies'])
+        return {'url': url, 'target_url': target_url, 'username': username,
+                'password': getattr(cls, 'password', '')}
 
-            all_links = []
-            # 1️⃣ Try to set the rows-per-page dropdown to 1000
-            select = page.locator("select[name='fileList_length']")
-            try:
-                await select.select_option("1000")
-                # Wait for table to refresh
-                await page.wait_for_timeout(1000)  # short wait for JS
-            except Exception:
-                # If "1000" is not an option, skip
-                pass
-
-            while True:
-                # 2️⃣ Collect links on the current page
-                links = await page.eval_on_selector_all(
-                            "table a.f",
-                            "els => els.map(e => e.href)"
-                        )
-                all_links.extend(links)
-
-                # 3️⃣ Check if "Next" button is disabled
-                next_li = page.locator("li#fileList_next")
-                class_name = await next_li.get_attribute("class")
-                if "disabled" in class_name:
-                    break  # no more pages
-
-                # 4️⃣ Click Next and wait for table to redraw
-                await next_li.locator("a").click()
-                await page.wait_for_timeout(1000)  # adjust if needed
-
-            result_holder['links'] = all_links
-
-        # Run the hook and the crawler
-        crawler.crawler_strategy.set_hook(
-            "on_page_context_created", on_page_context_created
-        )
+    @classmethod
+    async def login(cls, page: Page):
+        """ Log in to the publishedprices portal with the chain credentials (cookies stay in the page context) """
+        details = cls.login_details()
+        # Go to login page
+        await page.goto(details['url'])
+        # Fill credentials and press submit
+        await page.fill("input[name='username']", details['username'])
+        await page.fill("input[name='password']", details['password'])  # if required
+        await page.click("button[type='submit']")
+        # Wait for redirect after login
+        await page.wait_for_load_state("networkidle", timeout=80000)
 
+    @classmethod
+    async def collect_links(cls, page: Page) -> list[str]:
+        """ Collect the links of all files in the (paginated) files table of the page """
+        all_links = []
+        # 1️⃣ Try to set the rows-per-page dropdown to 1000
+        select = page.locator("select[name='fileList_length']")
         try:
-            await crawler.start()
-            await crawler.arun(target_url, config=crawler_config)
-            return result_holder
+            await select.select_option("1000", timeout=5000)
+            # Wait for table to refresh
+            await page.wait_for_timeout(1000)  # short wait for JS
+        except Exception:
+            # If "1000" is not an option, skip
+            pass
+
+        while True:
+            # 2️⃣ Collect links on the current page
+            links = await page.eval_on_selector_all(
+                        "table a.f",
+                        "els => els.map(e => e.href)"
+                    )
+            all_links.extend(links)
+
+            # 3️⃣ Check if "Next" button is disabled
+            next_li = page.locator("li#fileList_next")
+            class_name = await next_li.get_attribute("class") or "disabled"
+            if "disabled" in class_name:
+                break  # no more pages
+
+            # 4️⃣ Click Next and wait for table to redraw
+            await next_li.locator("a").click()
+            await page.wait_for_timeout(1000)  # adjust if needed
+
+        return all_links
+
+    @classmethod
+    async def crawl_files(cls, ):
+        """
+        This function crawls files for publishedprices supermarket chains and returns a dict with:
+        -cookies
+        -list of all file links
+        The chain session (logged-in browser context) is kept in the browser pool and reused until it expires.
+        """
+        return await run_in_browser(cls.crawl_in_browser)
 
-        finally:
-            await crawler.close()
+    @classmethod
+    async def crawl_in_browser(cls, pool: BrowserPool) -> dict:
+        """ crawl_files() on the browser loop """
+        details = cls.login_details()
+        key = details['username']
+
+        for attempt in range(2):
+            async with pool.page(key, cls.login) as page:
+                await page.goto(details['target_url'])
+                await page.wait_for_load_state("networkidle", timeout=80000)
+                if 'login' in page.url:
+                    # Session expired on the portal side - log in again
+                    await pool.invalidate(key)
+                    continue
+
+                # On page with files:
+                # Get cookies - converted from Playwright cookies (list of dicts) to a requests-compatible dict
+                cookies = cls.playwright_cookies_to_requests(await page.context.cookies())
+                links = await cls.collect_links(page)
+                return {'cookies': cookies, 'links': links}
+
+        return {}
 
     @classmethod
     def playwright_cookies_to_requests(cls, playwright_cookies):
@@ -117,90 +127,139 @@ class PublishedPrices(SupermarketChain):
         return {c['name']: c['value'] for c in playwright_cookies if 'name' in c and 'value' in c}
 
     @classmethod
-    async def stores(cls, client: httpx.AsyncClient | None = None) -> dict:
+    async def form_login(cls) -> dict:
         """
-        This function gets latest store list for publishedprices supermarket chain class.
+        Log in with a plain HTTP form post (no browser).
+        Returns {'cookies': {...}, 'csrftoken': token of the files page}.
         """
-        result_holder = await cls.crawl_files()
-        all_links = result_holder.get('links', [])
-
-        if all_links:
-            latest_store_url = max(
-                (u for u in all_links if re.search(r'(\d{8}-\d{6})\.xml$', u)),
-                key=lambda u: datetime.strptime(re.search(r'(\d{8}-\d{6})\.xml$', u).group(1), "%Y%m%d-%H%M%S"),
-                default=None
-            )
-            if not latest_store_url:
-                latest_store_url = max(
-                    (
-                        u for u in all_links
-                        if re.search(r'Stores\d+-\d{12}\.xml$', u)
-                    ),
-                    key=lambda u: datetime.strptime(
-                        re.search(r'(\d{12})\.xml$', u).group(1), "%Y%m%d%H%M"
-                    ),
-                    default=None
-                )
-
-        else:
-            # If no links found
-            latest_store_url = None
-
-        return {'stores': latest_store_url, 'cookies': result_holder.get('cookies', {})}
+        details = cls.login_details()
+        base = details['url'][:-6]
+        # Short-lived client with its own cookie jar for the login redirects (pooled clients keep no cookies)
+        async with (scheduled(details['url']),
+                    httpx.AsyncClient(verify=False, follow_redirects=True, timeout=httpx.Timeout(60.0)) as client):
+            response = await client.get(details['url'])
+            token = CSRF_TOKEN.search(response.text)
+            response = await client.post(f'{base}/login/user', data={
+                'username': details['username'],
+                'password': details['password'],
+                'csrftoken': token.group(1) if token else '',
+                'r': '',
+            })
+            if 'login' in str(response.url).rsplit('/', 1)[-1]:
+                raise RuntimeError(f'Login failed for {cls.alias}')
+            response = await client.get(details['target_url'])
+            token = CSRF_TOKEN.search(response.text)
+            return {'cookies': dict(client.cookies), 'csrftoken': token.group(1) if token else ''}
 
     @classmethod
-    def pattern(cls):
-        """
-        Helper function that defines pattern of file name - store code and date
-        Works for most chains, and overwriten in chains with different patterns
-        """
-        return re.compile(
-                r"/file/d/(PriceFull|Price|PromoFull|Promo)\d+(?:-\d+)*-(\d+)-(\d{8})-?(\d{4,6})"
-            )
+    async def browser_login(cls) -> dict:
+        """ Log in with the browser pool (fallback when the form post does not work) """
+        return await run_in_browser(cls.login_in_browser)
 
+    @classmethod
+    async def login_in_browser(cls, pool: BrowserPool) -> dict:
+        """ browser_login() on the browser loop """
+        details = cls.login_details()
+        async with pool.page(details['username'], cls.login) as page:
+            await page.goto(details['target_url'])
+            token = await page.get_attribute('meta[name="csrftoken"]', 'content')
+            cookies = cls.playwright_cookies_to_requests(await page.context.cookies())
+        return {'cookies': cookies, 'csrftoken': token or ''}
 
     @classmethod
-    async def prices(cls, store_code: int | str) -> dict:
+    async def portal_session(cls, refresh: bool = False) -> dict:
+        """ Cookies and csrf token of the chain login, cached for SESSION_TTL """
+        key = cls.login_details()['username']
+        session = _sessions.get(key)
+        if session and not refresh and time.monotonic() - session['created'] < SESSION_TTL:
+            return session
+
+        try:
+            session = await cls.form_login()
+        except Exception as e:
+            print(f'Form login failed for {cls.alias}, using browser: {e!r}')
+            session = await cls.browser_login()
+        session['created'] = time.monotonic()
+        _sessions[key] = session
+        return session
+
+    @classmethod
+    async def list_files(cls, search: str = '') -> dict:
         """
-        This function gets price and promo files for publishedprices supermarket chain class.
+        Get file links straight from the portal json endpoint (the one that fills the files table),
+        filtered on the server by search text.
+        Returns {'links': [...], 'cookies': {...}}.
         """
-        result_holder = await cls.crawl_files()
-        all_links = result_holder.get('links', [])
-
-        def get_latest_file(urls: list[str], store_code: int | str) -> dict:
-            """
-                Given a list of URLs from publishedprices.co.il and a specific store code (e.g., '001'),
-                return a dict mapping each file type ('Price', 'PriceFull', 'Promo', 'PromoFull')
-                to the latest URL for that store.
-                """
-            pattern = cls.pattern()
-
-            latest = {}
-
-            for url in urls:
-                match = pattern.search(url)
-                if not match:
-                    continue
+        details = cls.login_details()
+        base = details['url'][:-6]
+        folder = details['target_url'].split('/file', 1)[1].replace('/d', '', 1) or '/'
+
+        for attempt in range(2):
+            session = await cls.portal_session(refresh=attempt > 0)
+            payload = {
+                'sEcho': '1', 'iColumns': '5', 'sColumns': ',,,,', 'iDisplayStart': '0', 'iDisplayLength': '100000',
+                'mDataProp_0': 'fname', 'mDataProp_1': 'typeLabel', 'mDataProp_2': 'size', 'mDataProp_3': 'ftime',
+                'mDataProp_4': '', 'sSearch': search, 'bRegex': 'false', 'iSortingCols': '0',
+                'cd': folder, 'csrftoken': session['csrftoken'],
+            }
+            result = await url_request(f'{base}/file/json/dir', cookies=session['cookies'], method='POST',
+                                       payload=payload, headers={'X-Requested-With': 'XMLHttpRequest'})
+            try:
+                rows = json.loads(result['response'])['aaData']
+            except (KeyError, TypeError, ValueError):
+                continue  # logged out (login page instead of json) - log in again
 
-                file_type, code_str, date, time = match.groups()
-                code = int(code_str)  # convert to int
-                if code != store_code:
-                    continue  # skip other stores
+            prefix = f'{base}/file/d{folder.rstrip("/")}/'
+            links = [f"{prefix}{row['fname']}" for row in rows if row.get('fname')]
+            return {'links': links, 'cookies': session['cookies']}
 
-                time = time.ljust(6, "0")  # ensure HHMMSS format
-                dt = datetime.strptime(date + time, "%Y%m%d%H%M%S")
+        return {'Error': f'File listing failed for {cls.alias}'}
 
-                # Keep only the latest datetime per file type
-                if file_type not in latest or dt > latest[file_type]["dt"]:
-                    latest[file_type] = {"url": url, "dt": dt}
+    @classmethod
+    async def file_links(cls, search: str = '') -> dict:
+        """ File links (and cookies for downloading them) in the configured listing mode """
+        if cls.listing_mode == 'json':
+            result = await cls.list_files(search)
+            if 'Error' not in result:
+                return result
+            print(result['Error'], '- falling back to browser crawl')
+        return await cls.crawl_files()
 
-            # Return simplified mapping: file_type -> url
-            return {file_type.lower(): data["url"] for file_type, data in latest.items()}
+    @classmethod
+    async def listing(cls) -> dict:
+        """ All file urls of the chain and the cookies for downloading them - the listing indexed by file_index() """
+        result_holder = await cls.file_links()
+        if not result_holder.get('links'):
+            return {'Error': f'No files listed for {cls.alias}'}
+        return {'urls': result_holder['links'], 'cookies': result_holder.get('cookies', {})}
 
-        # Get price and promo files for the specified store
-        result = get_latest_file(all_links, store_code=int(store_code))
+    @classmethod
+    async def stores(cls, client: httpx.AsyncClient | None = None) -> dict:
+        """
+        This function gets latest store list for publishedprices supermarket chain class.
+        """
+        index = await cls.file_index()
+        if isinstance(index, dict):
+            return {'stores': None, 'cookies': {}}
+        return {'stores': index.latest_stores_url(), 'cookies': index.cookies}
+
+    @classmethod
+    async def prices(cls, store_code: int | str) -> dict:
+        """
+        This function gets price and promo files for publishedprices supermarket chain class.
+        """
+        # Index of all files of the chain - one fetched listing answers all stores within LISTING_TTL
+        index = await cls.file_index()
+        if isinstance(index, dict):
+            return {'cookies': {}}
+
+        return cls.index_prices(index, store_code)
 
-        result['cookies'] = result_holder.get('cookies', {})
+    @classmethod
+    def index_prices(cls, index: FileIndex, store_code: int | str) -> dict:
+        """ Latest url of each type the store has, keyed by lower case file type, and the download cookies """
+        result = {key.lower(): url for key, url in index.latest_for_store(store_code).items() if url is not None}
+        result['cookies'] = index.cookies
 
         return result
 
@@ -279,13 +338,6 @@ class DorAlon(PublishedPrices):
     username = 'doralon'
     link_type = 'publishedprices'
 
-    @classmethod
-    def pattern(cls):
-        """ Overwriting the pattern for PublishedPrices class """
-        return re.compile(
-            r"(Price|Promo|PriceFull|PromoFull)\d+-\d+-(\d+)-(\d{8})-(\d{6})\.gz"
-        )
-
     @classmethod
     async def extract_stores_data_for_db(cls, stores_data_dict: dict) -> dict[str, list[dict]]:
         """ Define what schema to use for extracting stores data for chain """
@@ -377,13 +429,6 @@ class Politzer(PublishedPrices):
     username = 'politzer'
     link_type = 'publishedprices'
 
-    @classmethod
-    def pattern(cls):
-        """ Overwriting the pattern for PublishedPrices class """
-        return re.compile(
-            r"(Price|Promo|PriceFull|PromoFull)\d+-\d+-(\d+)-(\d{8})-(\d{6})\.gz"
-        )
-
     @classmethod
     async def extract_stores_data_for_db(cls, stores_data_dict: dict) -> dict[str, list[dict]]:
         """ Define what schema to use for extracting stores data for chain """
@@ -1,9 +1,22 @@
 import httpx
-import asyncio
-from bs4 import BeautifulSoup
+import re
+from datetime import datetime, timedelta
+from html import unescape
 
 from backend.app.core.super_class import SupermarketChain
 from backend.app.utilities.url_request import url_request
+from backend.app.utilities.http_client import get_client
+from backend.app.utilities.file_index import FileIndex, FileRecord
+
+
+# Links of the listing table (files on the blob storage) and of the pager
+FILE_LINK = re.compile(r'href="(https?://[^"]+?\.(?:gz|xml|zip)(?:\?[^"]*)?)"', re.IGNORECASE)
+PAGE_LINK = re.compile(r'[?&;]page=(\d+)')
+# Paging of a store listing stops when a page reaches this far back from the newest file of the store -
+# file types still missing are not published by the store
+STORE_LISTING_SPAN = timedelta(days=1)
+# Most pages read from a store listing
+MAX_STORE_PAGES = 5
 
 
 class Shufersal(SupermarketChain):
@@ -15,22 +28,7 @@ class Shufersal(SupermarketChain):
     link_type = 'shufersal'
 
     @classmethod
-    def extract_date_from_url(cls, url: str) -> dict:
-        """ Extract date from the given URL if present. """
-        return {'date': url.split('-')[2].split('.')[0]}
-
-    @classmethod
-    def extract_store_code_from_url(cls, url: str) -> dict:
-        """ Extract store code from the given URL if present. """
-        return {'store_code': url.split('-')[1]}
-
-    @classmethod
-    def latest(cls, urls: list[str]) -> dict:
-        """ Get the latest file URL from the list based on date. """
-        return {'latest': max(urls, key=lambda x: cls.extract_date_from_url(x).get('date', '0'))}
-
-    @classmethod
-    async def get_file(cls, store_code: int | str | None = None, file_type: int = 0,
+    async def get_file(cls, store_code: int | str | None = None, file_type: int = 0, page: int = 1,
                        client: httpx.AsyncClient | None = None) -> dict:
         """
         This function gets defined file for shufersal supermarket chain.
@@ -41,8 +39,10 @@ class Shufersal(SupermarketChain):
         try:
             # Define URL for file list
             url = f"{base}FileObject/UpdateCategory?catID={file_type}&storeId={store_code}"
-            # Get response from the URL
-            response = await url_request(url, client=client)
+            if page > 1:
+                url = f"{url}&page={page}"
+            # Get response from the URL - with the pooled client of the shufersal host
+            response = await url_request(url, client=client or get_client(base))
             return response
 
         except ValueError as e:
@@ -50,46 +50,78 @@ class Shufersal(SupermarketChain):
 
     @classmethod
     def parse_response(cls, response: bytes) -> dict[str, list[str | None]]:
-        """ This function parses the HTML response using BeautifulSoup. """
-        soup = BeautifulSoup(response, "lxml")
-        return {'response': [a.get("href") for a in soup.select("table.webgrid tbody tr td a") if a.get("href")]}
+        """ Extract the file links of the listing table (a targeted regex - no soup for the whole page) """
+        html = (response or b'').decode('utf-8', errors='ignore')
+        return {'response': [unescape(link) for link in FILE_LINK.findall(html)]}
+
+    @classmethod
+    def num_pages(cls, response: bytes) -> int:
+        """ Number of pages of the listing (from the pager links) """
+        html = (response or b'').decode('utf-8', errors='ignore')
+        return max((int(p) for p in PAGE_LINK.findall(html)), default=1)
+
+    @classmethod
+    async def store_listing(cls, store_code: int | str) -> dict:
+        """
+        All file types of the store from the catID=0 listing, classified from the file names.
+        Further pages are only fetched while a file type is still missing (the listing is newest first),
+        up to STORE_LISTING_SPAN back from the newest file and at most MAX_STORE_PAGES pages.
+        """
+        urls = []
+        page, pages = 1, 1
+        while page <= min(pages, MAX_STORE_PAGES):
+            response = await cls.get_file(store_code, file_type=0, page=page)
+            if 'Error' in response:
+                return response
+            pages = cls.num_pages(response.get('response'))
+            urls.extend(cls.parse_response(response.get('response')).get('response'))
+            index = FileIndex.from_urls(urls)
+            latest = index.latest_for_store(store_code)
+            if all(latest.values()) or not index.records:
+                break
+            if index.records[-1].timestamp - index.records[0].timestamp >= STORE_LISTING_SPAN:
+                break
+            page += 1
+        return {'response': {key.lower(): url for key, url in latest.items()}, 'urls': urls}
 
     @classmethod
     async def stores(cls, ) -> dict:
         """ This function gets store list for shufersal supermarket chain. """
-        response = await cls.get_file(file_type=5, )
+        async def listing():
+            return await cls.get_file(file_type=5, )
+
+        # The store listing is shared by all lookups within LISTING_TTL
+        response = await cls.cached_listing('stores', listing)
         # Check if response contains 'response' key
         if response.get('response'):
             # Parse the response to extract store links
             parsed = cls.parse_response(response.get('response'))
             # Get the latest store url
-            latest = cls.latest(parsed.get('response'))
-            return {'stores': latest.get('latest')}
+            return {'stores': FileIndex.from_urls(parsed.get('response')).latest_stores_url()}
         else:
             return response
 
+    @classmethod
+    async def cached_store_listing(cls, store_code: int | str) -> dict:
+        """ One catID=0 listing per store, shared by all lookups of the store within LISTING_TTL """
+        return await cls.cached_listing(f'store-{int(store_code)}', lambda: cls.store_listing(store_code))
+
     @classmethod
     async def prices(cls, store_code: int | str, ) -> dict:
         """ This function gets latest price and promo files for relevant store for the shufersal supermarket chain. """
-        async with asyncio.TaskGroup() as tg:
-            tasks = {
-                'price': tg.create_task(cls._fetch(store_code, 1)),
-                'pricefull': tg.create_task(cls._fetch(store_code, 2)),
-                'promo': tg.create_task(cls._fetch(store_code, 3)),
-                'promofull': tg.create_task(cls._fetch(store_code, 4)),
-            }
+        result = await cls.cached_store_listing(store_code)
+        if 'Error' in result:
+            return result
         # Return dict with file types and latest url for that type - price, pricefull, promo, promofull
-        return {name: cls.latest(cls.parse_response(task.result().get('response')).get('response')).get('latest')
-                for name, task in tasks.items()}
+        return dict(result['response'])
 
     @classmethod
-    async def _fetch(cls, store_code: int | str, file_type: int):
-        """ Helper function to create client used in get_file function """
-        async with httpx.AsyncClient(
-                verify=False,
-                timeout=httpx.Timeout(15.0),
-        ) as client:
-            return await cls.get_file(store_code, file_type, client=client)
+    async def files_since(cls, store_code: int | str, file_type: str, since: datetime) -> list[FileRecord] | None:
+        """ Files of the type published for the store after since - from the store listing """
+        result = await cls.cached_store_listing(store_code)
+        if 'Error' in result:
+            return None
+        return FileIndex.from_urls(result.get('urls', [])).files_since(store_code, file_type, since)
 
     @classmethod
     async def extract_stores_data_for_db(cls, stores_data_dict: dict) -> dict[str, list[dict]]:
@@ -1,9 +1,28 @@
+import asyncio
+import os
+import time
+import weakref
+from datetime import datetime
+
 import streamlit as st
 
+from backend.app.utilities.file_index import FileIndex, FileRecord
+
+
+# Seconds a fetched chain file listing answers store lookups before it is fetched again
+LISTING_TTL = int(os.environ.get('XOLLIFY_LISTING_TTL', 120))
+
+# Chain file listings - {(chain alias, listing name): {'value': listing, 'created': time}}
+_listings: dict[tuple[str, str], dict] = {}
+# Listing fetches in flight - {event loop: {(chain alias, listing name): task}}, tasks are bound to their loop
+_inflight: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]' = weakref.WeakKeyDictionary()
+
 
 class SupermarketChain:
     """ The parent class for all supermarket chains """
     registry = []  # holds all subclasses automatically
+    # Chains that resolve store files from a FileIndex of the whole chain listing (listing() + index_prices())
+    indexed = False
 
     def __init_subclass__(cls, **kwargs):
         """Automatically register any subclass."""
@@ -28,7 +47,116 @@ class SupermarketChain:
         """
         raise NotImplementedError("Subclasses must implement this method.")
 
+    @classmethod
+    async def prices_for_stores(cls, store_codes: list[int | str]) -> dict[str, dict]:
+        """
+        Latest price and promo urls for several stores of the chain.
+        Return value: {store_code: prices() result of the store}
+        Indexed chains answer all stores from one listing, others resolve the stores concurrently
+        (chains with a batch request of their own override this).
+        """
+        codes = list(dict.fromkeys(str(code) for code in store_codes))
+        if cls.indexed:
+            index = await cls.file_index()
+            if isinstance(index, dict):
+                return {code: index for code in codes}
+            return {code: cls.index_prices(index, code) for code in codes}
+
+        results = await asyncio.gather(*(cls.prices(code) for code in codes), return_exceptions=True)
+        return {code: {'Error': str(result)} if isinstance(result, Exception) else result
+                for code, result in zip(codes, results)}
+
     ### Other general class methods
+    @classmethod
+    async def safe_prices_for_stores(cls, store_codes: list[int | str]) -> dict[str, dict | None]:
+        """ Wrapper for prices_for_stores() that returns None for the stores if it raises an exception """
+        try:
+            return await cls.prices_for_stores(store_codes)
+        except Exception as e:
+            msg = f"Error getting prices for {cls.alias} stores {', '.join(map(str, store_codes))}. " \
+                  f"Please try again in a few minutes."
+            print(f'{msg} + {e}')
+            st.session_state.setdefault('load_errors', []).append(msg)
+            return {str(code): None for code in store_codes}
+
+    @classmethod
+    async def cached_listing(cls, name: str, fetch, scope: str | None = None) -> dict:
+        """
+        Return the chain file listing fetched by fetch() (a coroutine function), cached for LISTING_TTL.
+        Concurrent lookups while the listing is fetched wait for that single fetch (single flight).
+        Error results and exceptions are not cached.
+        scope - share the listing between chains (e.g. the portal url of chains hosted on one aggregator),
+        default is the chain alias.
+        """
+        key = (scope or cls.alias, name)
+        entry = _listings.get(key)
+        if entry and time.monotonic() - entry['created'] < LISTING_TTL:
+            return entry['value']
+
+        loop = asyncio.get_running_loop()
+        tasks = _inflight.setdefault(loop, {})
+        task = tasks.get(key)
+        if task is None:
+            task = tasks[key] = loop.create_task(fetch())
+
+            def done(t: asyncio.Task):
+                tasks.pop(key, None)
+                if t.cancelled() or t.exception() is not None:
+                    return
+                value = t.result()
+                if value and not (isinstance(value, dict) and 'Error' in value):
+                    _listings[key] = {'value': value, 'created': time.monotonic()}
+
+            task.add_done_callback(done)
+
+        # shield - a cancelled caller must not cancel the fetch the other callers wait for
+        return await asyncio.shield(task)
+
+    @classmethod
+    async def listing(cls) -> dict:
+        """
+        Fetch the chain file listing - implemented by chains that publish a listing of all their files.
+        Return value: {urls: [...], cookies: {...} (optional)} or {Error: ...}
+        """
+        raise NotImplementedError("Subclasses with a file listing must implement this method.")
+
+    @classmethod
+    async def file_index(cls) -> FileIndex | dict:
+        """ The chain listing parsed into a FileIndex - built once per listing refresh, {Error: ...} on failure """
+        async def build():
+            listing = await cls.listing()
+            if not listing or 'Error' in listing:
+                return listing
+            return FileIndex.from_urls(listing.get('urls', []), cookies=listing.get('cookies'))
+
+        index = await cls.cached_listing('index', build)
+        return index if index else {'Error': f'No files found for {cls.alias}'}
+
+    @classmethod
+    async def files_since(cls, store_code: int | str, file_type: str, since: datetime) -> list[FileRecord] | None:
+        """
+        Files of the type (e.g. 'Price') published for the store after since, oldest first - for applying
+        every delta file on top of a baseline. None when the chain cannot list them.
+        Indexed chains answer from the chain FileIndex, chains with a listing of their own override this.
+        """
+        if not cls.indexed:
+            return None
+        index = await cls.file_index()
+        if isinstance(index, dict):
+            return None
+        return index.files_since(store_code, file_type, since)
+
+    @classmethod
+    def index_prices(cls, index: FileIndex, store_code: int | str) -> dict:
+        """ The prices() result for the store taken from the chain FileIndex """
+        return index.latest_for_store(store_code)
+
+    @classmethod
+    def clear_listing_cache(cls):
+        """ Drop the cached listings of the chain """
+        for key in [k for k in _listings if k[0] == cls.alias]:
+            _listings.pop(key, None)
+
     @classmethod
     async def safe_prices(cls, store_code: int | str, ):
         """ Wrapper for prices() that returns None if prices() raises an exception """
@@ -88,13 +216,12 @@ class SupermarketChain:
         }
 
     @classmethod
-    def get_price_data(cls, price_data: dict):
-        """ Extract the list of prices from task.result() """
-        items = (price_data.get("Root") or price_data.get("root"))["Items"]["Item"]
-        for item in items:
-            item["ChainAlias"] = cls.alias
+    def tag_records(cls, records: list[dict]) -> list[dict]:
+        """ Add the chain alias to records parsed with data_records() """
+        for record in records:
+            record["ChainAlias"] = cls.alias
 
-        return items
+        return records
 
     @classmethod
     def get_shopping_prices(cls, price_data: dict, shoppinglist: list[str | int]) -> dict:
@@ -105,15 +232,6 @@ class SupermarketChain:
 
         return results
 
-    @classmethod
-    def get_promo_data(cls, promo_data: dict):
-        """ Extract the list of prices from task.result() """
-        items = (promo_data.get("Root") or promo_data.get("root"))["Promotions"]["Promotion"]
-        for item in items:
-            item["ChainAlias"] = cls.alias
-
-        return items
-
     @classmethod
     def get_shopping_promos(cls, promo_data: list[dict], shoppinglist: list[str | int],
                             blacklist: set) -> dict:
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+
+class StorageBackend:
+    """
+    Store and price operations of a database backend - implemented by PostgresBackend (db/prices_db.py,
+    COPY into staging tables) and SqliteBackend (db/sqlite_db.py, executemany).
+    db/storage.py selects the implementation of the configured database once.
+    """
+
+    @classmethod
+    async def upsert_stores(cls, stores_data_list: list[dict]) -> int:
+        """ Insert new stores and update stores whose details changed - returns the number of rows written """
+        raise NotImplementedError
+
+    @classmethod
+    async def ingest_store_prices(cls, chain_code: str | int, store_code: str | int, records: list[dict]) -> int:
+        """ Replace the prices of the store with the records of its price file - returns the number of rows written """
+        raise NotImplementedError
+
+    @classmethod
+    async def ingest_store_promotions(cls, chain_code: str | int, store_code: str | int, records: list[dict]) -> int:
+        """ Replace the promotions of the store with the records of its promo file - returns the number of promos """
+        raise NotImplementedError
+
+    @classmethod
+    async def ingest_price_changes(cls, chain_code: str | int, store_code: str | int, changed_at: datetime,
+                                   rows: list[tuple]) -> int:
+        """
+        Append the price changes of the store published at changed_at to price_history -
+        rows are (item_code, item_price, previous_price). Returns the number of rows added.
+        """
+        raise NotImplementedError
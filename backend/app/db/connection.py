@@ -1,31 +1,97 @@
 import streamlit as st
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     create_async_engine,
     async_sessionmaker,
 )
 import asyncio
+import os
+import threading
+import weakref
 
 from backend.app.db.models import Base, Store
 
 # DATABASE_URL = st.secrets["DATABASE_URL"]
-DATABASE_URL = st.secrets.get("DATABASE_URL")
+# XOLLIFY_DATABASE_URL overrides the secret, e.g. sqlite+aiosqlite:///xollify.db for a single node / offline box
+DATABASE_URL = os.environ.get('XOLLIFY_DATABASE_URL') or st.secrets.get("DATABASE_URL")
 
+# Connection pool settings (one pool per event loop)
+DB_POOL_SIZE = int(os.environ.get('XOLLIFY_DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('XOLLIFY_DB_MAX_OVERFLOW', 5))
+# Seconds after which a pooled connection is replaced (Supabase closes idle connections)
+DB_POOL_RECYCLE = int(os.environ.get('XOLLIFY_DB_POOL_RECYCLE', 1800))
+DB_ECHO = os.environ.get('XOLLIFY_DB_ECHO', '0') == '1'
 
-def get_engine(database_url: str = DATABASE_URL):
-    """ Create and return an asynchronous SQLAlchemy engine. """
-    engine = create_async_engine(database_url, echo=True, pool_pre_ping=True,
-                                 connect_args={
-                                     "statement_cache_size": 0, },  # 🔑 REQUIRED for Supabase
-                                 )
-    return engine
+# Engines and session factories - {event loop: {database url: (engine, sessionmaker)}}
+# asyncpg connections are bound to the event loop they were opened in, so each loop gets its own pool -
+# the sessions of a script run (or of the prefetch thread) reuse its connections, and the pool is disposed
+# when its loop is done (end of run_async, prefetch shutdown).
+_engines: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]' = weakref.WeakKeyDictionary()
+_engines_lock = threading.Lock()
+
+
+def is_sqlite(database_url: str | None = None) -> bool:
+    """ True when the database is the embedded SQLite backend """
+    return (database_url or DATABASE_URL or '').startswith('sqlite')
+
+
+def sqlite_pragmas(dbapi_connection, connection_record):
+    """ WAL lets readers run during a write - set on every new SQLite connection """
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+def make_engine(database_url: str) -> AsyncEngine:
+    """ Create an asynchronous SQLAlchemy engine with the configured pool """
+    pool = dict(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_recycle=DB_POOL_RECYCLE,
+                pool_pre_ping=True)
+    if is_sqlite(database_url):
+        # Local file - asyncpg connect_args do not apply
+        engine = create_async_engine(database_url, echo=DB_ECHO, **pool, connect_args={'timeout': 30})
+        event.listen(engine.sync_engine, 'connect', sqlite_pragmas)
+        return engine
+    return create_async_engine(database_url, echo=DB_ECHO, **pool,
+                               connect_args={
+                                   "statement_cache_size": 0, },  # 🔑 REQUIRED for Supabase
+                               )
+
+
+def get_factory(database_url: str = DATABASE_URL) -> tuple[AsyncEngine, async_sessionmaker]:
+    """ Return the (engine, sessionmaker) of the running event loop, creating them on first use """
+    loop = asyncio.get_running_loop()
+    with _engines_lock:
+        factories = _engines.setdefault(loop, {})
+        factory = factories.get(database_url)
+        if factory is None:
+            engine = make_engine(database_url)
+            factory = factories[database_url] = (
+                engine, async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession))
+        return factory
+
+
+def get_engine(database_url: str = DATABASE_URL) -> AsyncEngine:
+    """ Return the shared asynchronous SQLAlchemy engine (one connection pool per event loop). """
+    return get_factory(database_url)[0]
+
+
+def get_sessionmaker(database_url: str = DATABASE_URL) -> async_sessionmaker:
+    """ Return the shared session factory """
+    return get_factory(database_url)[1]
 
 
 async def get_session() -> AsyncSession:
-    """ Create and return an asynchronous SQLAlchemy session. """
-    engine = get_engine()
-    async_session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-    return async_session()
+    """ Create and return an asynchronous SQLAlchemy session (connections come from the shared pool). """
+    return get_sessionmaker()()
 
 
+async def dispose_engine():
+    """ Dispose the engines of the running event loop - called when the loop is done (see run_async) """
+    with _engines_lock:
+        factories = _engines.pop(asyncio.get_running_loop(), {})
+    for engine, _ in factories.values():
+        await engine.dispose()
@@ -1,8 +1,6 @@
-from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy import inspect
-import asyncio
-from backend.app.db.connection import get_engine, get_session
-from backend.app.db.models import Base, Store
+from backend.app.db.connection import get_engine
+from backend.app.db.models import Base
 
 
 # --- Function to create database ---
@@ -20,24 +18,45 @@ async def create_db():
     engine = get_engine()
     async with engine.begin() as conn:
         # Check if tables already exist
-        if await tables_exist(conn):
-            return "ℹ️ Tables already exist — skipping create_all()"
-        # Use run_sync to call synchronous create_all in async context
+        existed = await tables_exist(conn)
+        # Use run_sync to call synchronous create_all in async context - creates only missing tables
         await conn.run_sync(Base.metadata.create_all)
+        if existed:
+            return "ℹ️ Tables already exist — created missing tables only"
         return "✅ Database and tables created successfully!"
 
 
-async def insert_new_stores(stores_data_list: list[dict]):
+# Store columns loaded by upsert_stores (all but the surrogate id)
+STORE_COLUMNS = ('chain_code', 'chain_name', 'subchain_code', 'subchain_name', 'store_code', 'store_name',
+                 'store_type', 'address', 'city', 'zipcode')
+# Columns that identify a store - the rest is updated when it changed
+STORE_KEY = ('chain_code', 'store_code')
+
+_staging_columns = ', '.join(f'{c} text' for c in STORE_COLUMNS)
+_update_columns = [c for c in STORE_COLUMNS if c not in STORE_KEY]
+# Staging table, dropped at the end of the transaction
+CREATE_STAGING = f"CREATE TEMP TABLE stores_staging ({_staging_columns}) ON COMMIT DROP"
+# Set based upsert - rows that did not change are not rewritten (no dead tuples, no WAL)
+UPSERT_FROM_STAGING = f"""
+    INSERT INTO stores ({', '.join(STORE_COLUMNS)})
+    SELECT DISTINCT ON ({', '.join(STORE_KEY)}) {', '.join(STORE_COLUMNS)}
+    FROM stores_staging
+    ORDER BY {', '.join(STORE_KEY)}
+    ON CONFLICT ({', '.join(STORE_KEY)}) DO UPDATE SET
+        {', '.join(f'{c} = EXCLUDED.{c}' for c in _update_columns)}
+    WHERE ({', '.join(f'stores.{c}' for c in _update_columns)})
+        IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in _update_columns)})
+"""
+
+
+def store_rows(stores_data_list: list[dict]) -> list[tuple]:
     """
-    Insert new stores into the database, ignoring duplicates based on chain_code and store_code.
-    Params:
-        stores_data_list - list of dicts of stores data for some chain
+    Store dicts (as_store_dict) as COPY records - text values, store codes as published by the chain
+    (existing rows are keyed by them), rows without chain / store code skipped
     """
-    engine = get_engine()
-    async with await get_session() as session:
-        stmt = insert(Store).values(stores_data_list)
-        stmt = stmt.on_conflict_do_nothing(index_elements=["chain_code", "store_code"])
-        await session.execute(stmt)
-        await session.commit()
-
-
+    rows = []
+    for store in stores_data_list:
+        row = tuple(None if store.get(c) is None else str(store.get(c)).strip() for c in STORE_COLUMNS)
+        if row[0] and row[4]:
+            rows.append(row)
+    return rows
@@ -1,5 +1,7 @@
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, String, Integer, Index, Boolean, Text
+from sqlalchemy import Column, String, Integer, Index, Boolean, Text, Numeric, DateTime, PrimaryKeyConstraint
+from sqlalchemy.types import TypeDecorator
+from decimal import Decimal, InvalidOperation
 import json
 
 # Define SQLAlchemy ORM model for stores
@@ -7,6 +9,20 @@ import json
 Base = declarative_base()
 
 
+def store_code_key(store_code: str | int | None) -> str:
+    """
+    Store code as kept in the price tables - numeric codes without leading zeros ('001' and 1 are the same store),
+    other codes stripped as published. Never raises - a missing code is ''.
+    """
+    code = str(store_code).strip() if store_code is not None else ''
+    return str(int(code)) if code.isascii() and code.isdigit() else code
+
+
+def store_key(chain_code: str | int, store_code: str | int | None) -> tuple[str, str]:
+    """ (chain_code, store_code) of a store as kept in the price tables (stores keeps the published code) """
+    return str(chain_code).strip(), store_code_key(store_code)
+
+
 class Store(Base):
     """ Class representing a store in the database. All chains in one table. """
     __tablename__ = "stores"
@@ -32,3 +48,128 @@ class Store(Base):
         Index("ix_chain_code", "chain_code"),
         Index("ix_chain_store", "chain_code", "store_code", unique=True),
     )
+
+
+# Price and promotion data of the stores - fed by the ingester in db/prices_db.py
+
+class ExactNumeric(TypeDecorator):
+    """
+    Exact decimal column - NUMERIC on Postgres, canonical decimal text on SQLite (its NUMERIC is a float).
+    Values are Decimal both ways, equal values have the same text ('5.90' and '5.9' are stored as '5.9'),
+    so comparisons like IS DISTINCT FROM are exact on both backends.
+    """
+    impl = Numeric
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'sqlite':
+            return dialect.type_descriptor(Text())
+        return dialect.type_descriptor(Numeric())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name != 'sqlite':
+            return value
+        return format(Decimal(str(value)).normalize(), 'f')
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            return Decimal(str(value))
+        except InvalidOperation:
+            return None
+
+
+class Item(Base):
+    """ Class representing an item (barcode) - details shared by all chains and stores """
+    __tablename__ = "items"
+
+    item_code = Column(String, primary_key=True)
+    item_name = Column(String, nullable=True)
+    manufacturer_name = Column(String, nullable=True)
+    manufacture_country = Column(String, nullable=True)
+    unit_qty = Column(String, nullable=True)
+    quantity = Column(ExactNumeric, nullable=True)
+    unit_of_measure = Column(String, nullable=True)
+    is_weighted = Column(Boolean, nullable=True)
+    qty_in_package = Column(ExactNumeric, nullable=True)
+
+
+class StorePrice(Base):
+    """ Class representing the current price of an item in a store """
+    __tablename__ = "store_prices"
+
+    chain_code = Column(String, primary_key=True)
+    store_code = Column(String, primary_key=True)
+    item_code = Column(String, primary_key=True)
+
+    item_price = Column(ExactNumeric, nullable=True)
+    unit_of_measure_price = Column(ExactNumeric, nullable=True)
+    allow_discount = Column(Boolean, nullable=True)
+    item_status = Column(String, nullable=True)
+    price_update_date = Column(String, nullable=True)
+
+    __table_args__ = (
+        # Lookups of barcodes across stores
+        Index("ix_store_prices_item", "item_code"),
+    )
+
+
+class Promotion(Base):
+    """ Class representing a promotion of a store """
+    __tablename__ = "promotions"
+
+    chain_code = Column(String, primary_key=True)
+    store_code = Column(String, primary_key=True)
+    promotion_id = Column(String, primary_key=True)
+
+    description = Column(String, nullable=True)
+    start_date = Column(String, nullable=True)
+    end_date = Column(String, nullable=True)
+    reward_type = Column(String, nullable=True)
+    min_qty = Column(ExactNumeric, nullable=True)
+    discounted_price = Column(ExactNumeric, nullable=True)
+    discount_rate = Column(ExactNumeric, nullable=True)
+    club_id = Column(String, nullable=True)
+    # The full promotion record as published (json) - for the promo logic working on chain records
+    raw = Column(Text, nullable=True)
+
+
+class PromotionItem(Base):
+    """ Class representing an item taking part in a promotion """
+    __tablename__ = "promotion_items"
+
+    chain_code = Column(String, primary_key=True)
+    store_code = Column(String, primary_key=True)
+    promotion_id = Column(String, primary_key=True)
+    item_code = Column(String, primary_key=True)
+
+    __table_args__ = (
+        # Promotions of barcodes in a store
+        Index("ix_promotion_items_store_item", "chain_code", "store_code", "item_code"),
+    )
+
+
+class PriceHistory(Base):
+    """
+    Class representing a price change of an item in a store - a row is added only when the price differs
+    from the price recorded last for the store (see services/history_service.py).
+    Partitioned by month of changed_at, partitions are created by the ingester.
+    """
+    __tablename__ = "price_history"
+
+    item_code = Column(String, nullable=False)
+    chain_code = Column(String, nullable=False)
+    store_code = Column(String, nullable=False)
+    # Publication time of the file with the new price
+    changed_at = Column(DateTime, nullable=False)
+
+    item_price = Column(ExactNumeric, nullable=True)
+    previous_price = Column(ExactNumeric, nullable=True)
+
+    __table_args__ = (
+        # Barcode first and covering the price - price trend queries are index only scans
+        PrimaryKeyConstraint("item_code", "chain_code", "store_code", "changed_at",
+                             postgresql_include=["item_price"]),
+        {"postgresql_partition_by": "RANGE (changed_at)"},
+    )
@@ -0,0 +1,306 @@
+import json
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from backend.app.db.backend import StorageBackend
+from backend.app.db.connection import get_engine
+from backend.app.db.create_db import STORE_COLUMNS, CREATE_STAGING, UPSERT_FROM_STAGING, store_rows
+from backend.app.db.models import store_key
+
+
+# Ingest the price / promo snapshots of the stores into the price tables (requires the tables - see create_db)
+PRICE_DB_ENABLED = os.environ.get('XOLLIFY_PRICE_DB', '1') != '0'
+
+# Table column → field names used by the chains in the price files (first found is used)
+ITEM_FIELDS = {
+    'item_name': ('ItemName', 'ItemNm'),
+    'manufacturer_name': ('ManufacturerName', 'ManufactureName'),
+    'manufacture_country': ('ManufactureCountry',),
+    'unit_qty': ('UnitQty',),
+    'quantity': ('Quantity',),
+    'unit_of_measure': ('UnitOfMeasure',),
+    'is_weighted': ('bIsWeighted', 'BisWeighted'),
+    'qty_in_package': ('QtyInPackage',),
+}
+PRICE_FIELDS = {
+    'item_price': ('ItemPrice',),
+    'unit_of_measure_price': ('UnitOfMeasurePrice',),
+    'allow_discount': ('AllowDiscount',),
+    'item_status': ('ItemStatus',),
+    'price_update_date': ('PriceUpdateDate',),
+}
+PROMO_FIELDS = {
+    'description': ('PromotionDescription',),
+    'reward_type': ('RewardType',),
+    'min_qty': ('MinQty',),
+    'discounted_price': ('DiscountedPrice',),
+    'discount_rate': ('DiscountRate',),
+}
+NUMERIC_COLUMNS = {'quantity', 'qty_in_package', 'item_price', 'unit_of_measure_price', 'previous_price',
+                   'min_qty', 'discounted_price', 'discount_rate'}
+BOOLEAN_COLUMNS = {'is_weighted', 'allow_discount'}
+
+PRICE_COLUMNS = ('item_code', *ITEM_FIELDS, *PRICE_FIELDS)
+PROMO_COLUMNS = ('promotion_id', *PROMO_FIELDS, 'start_date', 'end_date', 'club_id', 'raw')
+
+
+def column_type(column: str) -> str:
+    return 'numeric' if column in NUMERIC_COLUMNS else 'boolean' if column in BOOLEAN_COLUMNS else 'text'
+
+
+def staging_table(name: str, columns: tuple[str, ...]) -> str:
+    """ Temporary staging table for COPY, dropped at the end of the transaction """
+    definition = ', '.join(f'{c} {column_type(c)}' for c in columns)
+    return f'CREATE TEMP TABLE {name} ({definition}) ON COMMIT DROP'
+
+
+def changed(table: str, columns) -> str:
+    """ Condition for updating a row only when a value changed """
+    return (f"({', '.join(f'{table}.{c}' for c in columns)}) IS DISTINCT FROM "
+            f"({', '.join(f'EXCLUDED.{c}' for c in columns)})")
+
+
+# Items are shared by all chains - values missing in the table are filled in, existing ones are kept
+# (the chains name the same barcode differently, overwriting would flip the row on every ingest)
+UPSERT_ITEMS = f"""
+INSERT INTO items (item_code, {', '.join(ITEM_FIELDS)})
+SELECT DISTINCT ON (item_code) item_code, {', '.join(ITEM_FIELDS)}
+FROM price_staging
+ORDER BY item_code
+ON CONFLICT (item_code) DO UPDATE SET
+    {', '.join(f'{c} = COALESCE(items.{c}, EXCLUDED.{c})' for c in ITEM_FIELDS)}
+WHERE {' OR '.join(f'(items.{c} IS NULL AND EXCLUDED.{c} IS NOT NULL)' for c in ITEM_FIELDS)}
+"""
+
+# Items no longer in the store's file
+DELETE_MISSING_PRICES = """
+DELETE FROM store_prices p
+WHERE p.chain_code = $1::text AND p.store_code = $2::text
+  AND NOT EXISTS (SELECT 1 FROM price_staging s WHERE s.item_code = p.item_code)
+"""
+
+UPSERT_PRICES = f"""
+INSERT INTO store_prices (chain_code, store_code, item_code, {', '.join(PRICE_FIELDS)})
+SELECT DISTINCT ON (item_code) $1::text, $2::text, item_code, {', '.join(PRICE_FIELDS)}
+FROM price_staging
+ORDER BY item_code
+ON CONFLICT (chain_code, store_code, item_code) DO UPDATE SET
+    {', '.join(f'{c} = EXCLUDED.{c}' for c in PRICE_FIELDS)}
+WHERE {changed('store_prices', PRICE_FIELDS)}
+"""
+
+DELETE_PROMO_ITEMS = "DELETE FROM promotion_items WHERE chain_code = $1::text AND store_code = $2::text"
+DELETE_PROMOS = "DELETE FROM promotions WHERE chain_code = $1::text AND store_code = $2::text"
+
+INSERT_PROMOS = f"""
+INSERT INTO promotions (chain_code, store_code, {', '.join(PROMO_COLUMNS)})
+SELECT DISTINCT ON (promotion_id) $1::text, $2::text, {', '.join(PROMO_COLUMNS)}
+FROM promo_staging
+ORDER BY promotion_id
+"""
+
+INSERT_PROMO_ITEMS = """
+INSERT INTO promotion_items (chain_code, store_code, promotion_id, item_code)
+SELECT DISTINCT $1::text, $2::text, promotion_id, item_code
+FROM promo_item_staging
+"""
+
+HISTORY_COLUMNS = ('item_code', 'item_price', 'previous_price')
+
+# Changes already recorded (same store and publication time) are skipped - recording is idempotent
+INSERT_HISTORY = """
+INSERT INTO price_history (item_code, chain_code, store_code, changed_at, item_price, previous_price)
+SELECT DISTINCT ON (item_code) item_code, $1::text, $2::text, $3::timestamp, item_price, previous_price
+FROM history_staging
+ORDER BY item_code
+ON CONFLICT DO NOTHING
+"""
+
+
+def history_partition(changed_at: datetime) -> str:
+    """ DDL of the monthly price_history partition holding changed_at """
+    start = changed_at.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return (f"CREATE TABLE IF NOT EXISTS price_history_{start:%Y_%m} PARTITION OF price_history "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')")
+
+
+def field(record: dict, names: tuple[str, ...]):
+    """ Value of the first of names found in the record """
+    return next((record[n] for n in names if record.get(n) not in (None, '')), None)
+
+
+def to_numeric(value) -> Decimal | None:
+    try:
+        return Decimal(str(value).strip().replace(',', '')) if value is not None else None
+    except InvalidOperation:
+        return None
+
+
+def to_boolean(value) -> bool | None:
+    if value is None:
+        return None
+    return str(value).strip().lower() in ('1', 'true', 'yes')
+
+
+def to_text(value) -> str | None:
+    return str(value).strip() if value is not None else None
+
+
+def convert(column: str, value):
+    """ Convert a value from the price file to the type of its column """
+    if column in NUMERIC_COLUMNS:
+        return to_numeric(value)
+    if column in BOOLEAN_COLUMNS:
+        return to_boolean(value)
+    return to_text(value)
+
+
+def price_rows(records: list[dict]) -> list[tuple]:
+    """ Rows for price_staging from the item records of a price file """
+    fields = ITEM_FIELDS | PRICE_FIELDS
+    rows = []
+    for record in records:
+        item_code = to_text(record.get('ItemCode'))
+        if not item_code:
+            continue
+        rows.append((item_code, *(convert(c, field(record, names)) for c, names in fields.items())))
+    return rows
+
+
+def promo_items(promo: dict) -> list[dict]:
+    """ Items of a promotion (a single item is parsed as a dict) """
+    items = (promo.get('PromotionItems') or {}).get('Item', [])
+    return [items] if isinstance(items, dict) else items or []
+
+
+def promo_club(promo: dict) -> str | None:
+    """ Club (audience) of a promotion - binaprojects nests it in AdditionalRestrictions """
+    clubs = promo.get('Clubs') or (promo.get('AdditionalRestrictions') or {}).get('Clubs') or {}
+    return to_text(clubs.get('ClubId')) if isinstance(clubs, dict) else None
+
+
+def promo_time(promo: dict, prefix: str) -> str | None:
+    """ Start / end of a promotion as 'date hour' """
+    parts = [promo.get(f'{prefix}Date'), promo.get(f'{prefix}Hour')]
+    return ' '.join(str(p).strip() for p in parts if p) or None
+
+
+def promo_rows(records: list[dict]) -> tuple[list[tuple], list[tuple]]:
+    """ Rows for promo_staging and promo_item_staging from the records of a promo file """
+    promos, items = [], []
+    for promo in records:
+        promotion_id = to_text(promo.get('PromotionId'))
+        if not promotion_id:
+            continue
+        promos.append((promotion_id,
+                       *(convert(c, field(promo, names)) for c, names in PROMO_FIELDS.items()),
+                       promo_time(promo, 'PromotionStart'), promo_time(promo, 'PromotionEnd'),
+                       promo_club(promo), json.dumps(promo, ensure_ascii=False)))
+        items.extend((promotion_id, item_code) for item in promo_items(promo)
+                     if (item_code := to_text(item.get('ItemCode'))))
+    return promos, items
+
+
+@asynccontextmanager
+async def raw_transaction():
+    """
+    A transaction on an asyncpg connection - for COPY and set based SQL that SQLAlchemy does not expose.
+    Yields the asyncpg connection.
+    """
+    async with get_engine().connect() as conn:
+        raw = await conn.get_raw_connection()
+        driver = raw.driver_connection
+        async with driver.transaction():
+            yield driver
+
+
+class PostgresBackend(StorageBackend):
+    """ Postgres (Supabase) - rows are streamed with COPY into staging tables and merged with set based SQL """
+
+    @classmethod
+    async def upsert_stores(cls, stores_data_list: list[dict]) -> int:
+        """
+        Insert new stores and update stores whose details changed - in one transaction:
+        the rows are streamed with COPY into a temporary staging table and merged with a single
+        INSERT ... ON CONFLICT DO UPDATE ... WHERE changed.
+        Returns the number of inserted or updated stores.
+        """
+        rows = store_rows(stores_data_list)
+        if not rows:
+            return 0
+
+        # COPY is not available through SQLAlchemy - use the asyncpg connection
+        async with raw_transaction() as driver:
+            await driver.execute(CREATE_STAGING)
+            await driver.copy_records_to_table('stores_staging', records=rows, columns=list(STORE_COLUMNS))
+            status = await driver.execute(UPSERT_FROM_STAGING)
+
+        # Status is 'INSERT 0 <rows>'
+        return int(status.rsplit(' ', 1)[-1])
+
+    @classmethod
+    async def ingest_store_prices(cls, chain_code: str | int, store_code: str | int, records: list[dict]) -> int:
+        """
+        Replace the prices of the store with the records of its price file - one transaction:
+        COPY into a staging table, add new items, drop items no longer sold and upsert changed prices.
+        Returns the number of prices inserted or updated.
+        """
+        rows = price_rows(records)
+        if not rows:
+            return 0
+
+        key = store_key(chain_code, store_code)
+        async with raw_transaction() as driver:
+            await driver.execute(staging_table('price_staging', PRICE_COLUMNS))
+            await driver.copy_records_to_table('price_staging', records=rows, columns=list(PRICE_COLUMNS))
+            await driver.execute(UPSERT_ITEMS)
+            await driver.execute(DELETE_MISSING_PRICES, *key)
+            status = await driver.execute(UPSERT_PRICES, *key)
+
+        # Status is 'INSERT 0 <rows>'
+        return int(status.rsplit(' ', 1)[-1])
+
+    @classmethod
+    async def ingest_store_promotions(cls, chain_code: str | int, store_code: str | int, records: list[dict]) -> int:
+        """
+        Replace the promotions of the store with the records of its promo file - one transaction:
+        delete the store's promotions and COPY the new ones in. Returns the number of promotions.
+        """
+        promos, items = promo_rows(records)
+        key = store_key(chain_code, store_code)
+        async with raw_transaction() as driver:
+            await driver.execute(DELETE_PROMO_ITEMS, *key)
+            await driver.execute(DELETE_PROMOS, *key)
+            if promos:
+                await driver.execute(staging_table('promo_staging', PROMO_COLUMNS))
+                await driver.execute(staging_table('promo_item_staging', ('promotion_id', 'item_code')))
+                await driver.copy_records_to_table('promo_staging', records=promos, columns=list(PROMO_COLUMNS))
+                await driver.copy_records_to_table('promo_item_staging', records=items,
+                                                   columns=['promotion_id', 'item_code'])
+                await driver.execute(INSERT_PROMOS, *key)
+                await driver.execute(INSERT_PROMO_ITEMS, *key)
+
+        return len(promos)
+
+    @classmethod
+    async def ingest_price_changes(cls, chain_code: str | int, store_code: str | int, changed_at: datetime,
+                                   rows: list[tuple]) -> int:
+        """
+        Append the price changes of the store published at changed_at to price_history -
+        rows are (item_code, item_price, previous_price). Returns the number of rows added.
+        """
+        if not rows:
+            return 0
+
+        key = store_key(chain_code, store_code)
+        async with raw_transaction() as driver:
+            await driver.execute(history_partition(changed_at))
+            await driver.execute(staging_table('history_staging', HISTORY_COLUMNS))
+            await driver.copy_records_to_table('history_staging', records=rows, columns=list(HISTORY_COLUMNS))
+            status = await driver.execute(INSERT_HISTORY, *key, changed_at)
+
+        # Status is 'INSERT 0 <rows>'
+        return int(status.rsplit(' ', 1)[-1])
@@ -0,0 +1,119 @@
+from datetime import datetime
+
+from sqlalchemy import delete, func, or_, text
+from sqlalchemy.dialects.sqlite import insert
+
+from backend.app.db.backend import StorageBackend
+from backend.app.db.connection import get_engine
+from backend.app.db.create_db import STORE_COLUMNS, STORE_KEY, store_rows
+from backend.app.db.models import Store, Item, StorePrice, Promotion, PromotionItem, PriceHistory, store_key
+from backend.app.db.prices_db import (ITEM_FIELDS, PRICE_FIELDS, PRICE_COLUMNS, PROMO_COLUMNS, HISTORY_COLUMNS,
+                                      price_rows, promo_rows)
+
+
+# SQLite implementation of the store and price operations (XOLLIFY_DATABASE_URL=sqlite+aiosqlite:///...).
+# There is no COPY - rows are sent with executemany inside one transaction, which is as fast on a local file.
+
+def changed(table, statement, columns):
+    """ Condition for updating a row only when a value changed """
+    return or_(*(table.c[c].is_distinct_from(statement.excluded[c]) for c in columns))
+
+
+class SqliteBackend(StorageBackend):
+    """ Embedded SQLite - rows are sent with executemany inside one transaction """
+
+    @classmethod
+    async def upsert_stores(cls, stores_data_list: list[dict]) -> int:
+        """ Insert new stores and update stores whose details changed - returns the number of rows written """
+        rows = [dict(zip(STORE_COLUMNS, row)) for row in store_rows(stores_data_list)]
+        if not rows:
+            return 0
+
+        update_columns = [c for c in STORE_COLUMNS if c not in STORE_KEY]
+        stmt = insert(Store)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(STORE_KEY),
+            set_={c: stmt.excluded[c] for c in update_columns},
+            where=changed(Store.__table__, stmt, update_columns),
+        )
+        async with get_engine().begin() as conn:
+            result = await conn.execute(stmt, rows)
+        return result.rowcount
+
+    @classmethod
+    async def ingest_store_prices(cls, chain_code: str | int, store_code: str | int, records: list[dict]) -> int:
+        """
+        Replace the prices of the store with the records of its price file - one transaction:
+        add new items, drop items no longer sold and upsert changed prices.
+        Returns the number of prices inserted or updated.
+        """
+        rows = [dict(zip(PRICE_COLUMNS, row)) for row in price_rows(records)]
+        if not rows:
+            return 0
+
+        chain, store = store_key(chain_code, store_code)
+        items = insert(Item)
+        # Items are shared by all chains - only missing values are filled in (see prices_db.UPSERT_ITEMS)
+        items = items.on_conflict_do_update(
+            index_elements=['item_code'],
+            set_={c: func.coalesce(Item.__table__.c[c], items.excluded[c]) for c in ITEM_FIELDS},
+            where=or_(*(Item.__table__.c[c].is_(None) & items.excluded[c].is_not(None) for c in ITEM_FIELDS)),
+        )
+        prices = insert(StorePrice)
+        prices = prices.on_conflict_do_update(
+            index_elements=['chain_code', 'store_code', 'item_code'],
+            set_={c: prices.excluded[c] for c in PRICE_FIELDS},
+            where=changed(StorePrice.__table__, prices, PRICE_FIELDS),
+        )
+
+        async with get_engine().begin() as conn:
+            await conn.execute(items, [{c: row[c] for c in ('item_code', *ITEM_FIELDS)} for row in rows])
+            # Items no longer in the store's file
+            await conn.execute(text('CREATE TEMP TABLE IF NOT EXISTS price_codes (item_code TEXT PRIMARY KEY)'))
+            await conn.execute(text('DELETE FROM price_codes'))
+            await conn.execute(text('INSERT OR IGNORE INTO price_codes VALUES (:item_code)'),
+                               [{'item_code': row['item_code']} for row in rows])
+            await conn.execute(text('DELETE FROM store_prices WHERE chain_code = :chain AND store_code = :store '
+                                    'AND item_code NOT IN (SELECT item_code FROM price_codes)'),
+                               {'chain': chain, 'store': store})
+            result = await conn.execute(prices, [{'chain_code': chain, 'store_code': store,
+                                                  'item_code': row['item_code'], **{c: row[c] for c in PRICE_FIELDS}}
+                                                 for row in rows])
+        return result.rowcount
+
+    @classmethod
+    async def ingest_store_promotions(cls, chain_code: str | int, store_code: str | int, records: list[dict]) -> int:
+        """ Replace the promotions of the store with the records of its promo file - returns the number of promos """
+        promos, items = promo_rows(records)
+        chain, store = store_key(chain_code, store_code)
+
+        async with get_engine().begin() as conn:
+            for model in (PromotionItem, Promotion):
+                await conn.execute(delete(model).where(model.chain_code == chain, model.store_code == store))
+            if promos:
+                # Repeated ids / items replace the earlier row
+                await conn.execute(insert(Promotion).prefix_with('OR REPLACE'),
+                                   [{'chain_code': chain, 'store_code': store, **dict(zip(PROMO_COLUMNS, row))}
+                                    for row in promos])
+            if items:
+                await conn.execute(insert(PromotionItem).prefix_with('OR IGNORE'),
+                                   [{'chain_code': chain, 'store_code': store, 'promotion_id': promotion_id,
+                                     'item_code': item_code} for promotion_id, item_code in items])
+        return len(promos)
+
+    @classmethod
+    async def ingest_price_changes(cls, chain_code: str | int, store_code: str | int, changed_at: datetime,
+                                   rows: list[tuple]) -> int:
+        """
+        Append the price changes of the store published at changed_at to price_history -
+        one table (SQLite has no partitions), same primary key. Returns the number of rows added.
+        """
+        if not rows:
+            return 0
+
+        chain, store = store_key(chain_code, store_code)
+        stmt = insert(PriceHistory).on_conflict_do_nothing()
+        async with get_engine().begin() as conn:
+            result = await conn.execute(stmt, [{'chain_code': chain, 'store_code': store, 'changed_at': changed_at,
+                                                **dict(zip(HISTORY_COLUMNS, row))} for row in rows])
+        return result.rowcount
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from backend.app.db.backend import StorageBackend
+from backend.app.db.connection import DATABASE_URL, is_sqlite
+from backend.app.db.prices_db import PostgresBackend
+from backend.app.db.sqlite_db import SqliteBackend
+
+
+# Store and price operations of the configured database - Postgres (COPY) or embedded SQLite.
+# Callers use these instead of the backend classes.
+
+def get_backend(database_url: str | None = DATABASE_URL) -> type[StorageBackend]:
+    """ The StorageBackend implementation of the database at database_url """
+    return SqliteBackend if is_sqlite(database_url) else PostgresBackend
+
+
+# Backend of the configured database - selected once
+backend = get_backend()
+
+
+async def upsert_stores(stores_data_list: list[dict]) -> int:
+    """ Insert new stores and update changed ones - returns the number of rows written """
+    return await backend.upsert_stores(stores_data_list)
+
+
+async def ingest_store_records(chain_code: str | int, store_code: str | int, kind: str, records: list[dict]) -> int:
+    """ Ingest the items / promotions records of the store """
+    if kind == 'items':
+        return await backend.ingest_store_prices(chain_code, store_code, records)
+    return await backend.ingest_store_promotions(chain_code, store_code, records)
+
+
+async def ingest_price_changes(chain_code: str | int, store_code: str | int, changed_at: datetime,
+                               rows: list[tuple]) -> int:
+    """ Append price changes of the store to the price history """
+    return await backend.ingest_price_changes(chain_code, store_code, changed_at, rows)
@@ -0,0 +1,132 @@
+"""
+Local stand-in for the publishedprices portal - lets the browserless listing path be run offline.
+
+Run:
+    python -m backend.app.devtools.publishedprices_stub --port 8765
+and point the chains at it:
+    XOLLIFY_PUBLISHEDPRICES_URL=http://127.0.0.1:8765
+
+Implements the endpoints used by PublishedPrices: login page (csrf token), form login, files page,
+json file listing with server side search, and file download.
+Any username / password is accepted; the files are generated for the chain logged in as.
+"""
+import argparse
+import gzip
+import json
+import secrets
+from datetime import datetime
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from backend.app.core.publishedprices import PublishedPrices
+
+
+STORE_CODES = ('001', '002', '015')
+CSRF = secrets.token_hex(16)
+# session id → username
+SESSIONS: dict[str, str] = {}
+
+
+def chain_for(username: str):
+    """ The publishedprices chain class logging in with username """
+    return next((c for c in PublishedPrices.__subclasses__() if getattr(c, 'username', None) == username),
+                None)
+
+
+def files_for(username: str) -> dict[str, bytes]:
+    """ Generate today's files of the chain - {file name: content} """
+    chain = chain_for(username)
+    chain_code = chain.chain_code if chain else '7290000000000'
+    stamp = datetime.now().strftime('%Y%m%d')
+    files = {}
+    stores = ''.join(f'<Store><StoreID>{int(c)}</StoreID><StoreName>Store {c}</StoreName></Store>'
+                     for c in STORE_CODES)
+    files[f'Stores{chain_code}-{stamp}0500.xml'] = (
+        f'<Root><ChainID>{chain_code}</ChainID><SubChains><SubChain><SubChainID>1</SubChainID>'
+        f'<Stores>{stores}</Stores></SubChain></SubChains></Root>').encode('utf-8')
+    for store in STORE_CODES:
+        items = ''.join(f'<Item><ItemCode>{729000000000 + i}</ItemCode><ItemName>Item {i}</ItemName>'
+                        f'<ItemPrice>{i}.90</ItemPrice></Item>' for i in range(1, 11))
+        files[f'PriceFull{chain_code}-{store}-{stamp}0600.gz'] = gzip.compress(
+            f'<root><ChainId>{chain_code}</ChainId><StoreId>{store}</StoreId><Items>{items}</Items></root>'.encode())
+        files[f'Price{chain_code}-{store}-{stamp}0900.gz'] = gzip.compress(
+            f'<root><Items><Item><ItemCode>729000000001</ItemCode><ItemPrice>0.50</ItemPrice></Item></Items></root>'
+            .encode())
+        files[f'PromoFull{chain_code}-{store}-{stamp}0600.gz'] = gzip.compress(
+            b'<Root><Promotions><Promotion><PromotionId>1</PromotionId><PromotionItems><Item>'
+            b'<ItemCode>729000000002</ItemCode></Item></PromotionItems></Promotion></Promotions></Root>')
+        files[f'Promo{chain_code}-{store}-{stamp}0900.gz'] = gzip.compress(b'<Root><Promotions/></Root>')
+    return files
+
+
+class PortalHandler(BaseHTTPRequestHandler):
+    """ Request handler mimicking the publishedprices (Cerberus) web client """
+
+    def session_user(self) -> str | None:
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        sid = cookie.get('cftpSID')
+        return SESSIONS.get(sid.value) if sid else None
+
+    def form(self) -> dict[str, str]:
+        length = int(self.headers.get('Content-Length', 0))
+        return {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode(), keep_blank_values=True).items()}
+
+    def send(self, status: int, body: bytes = b'', content_type: str = 'text/html', headers: dict | None = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def page(self, title: str) -> bytes:
+        return f'<html><head><meta name="csrftoken" content="{CSRF}"></head><body>{title}</body></html>'.encode()
+
+    def do_GET(self):
+        if self.path.startswith('/login'):
+            return self.send(200, self.page('login'))
+        user = self.session_user()
+        if user is None:
+            return self.send(302, headers={'Location': '/login'})
+        if self.path.startswith('/file/d/'):
+            content = files_for(user).get(self.path.rsplit('/', 1)[-1])
+            if content is None:
+                return self.send(404)
+            return self.send(200, content, 'application/octet-stream')
+        if self.path.startswith('/file'):
+            return self.send(200, self.page('files'))
+        return self.send(404)
+
+    def do_POST(self):
+        form = self.form()
+        if self.path == '/login/user':
+            sid = secrets.token_hex(16)
+            SESSIONS[sid] = form.get('username', '')
+            return self.send(302, headers={'Location': '/file', 'Set-Cookie': f'cftpSID={sid}; Path=/'})
+        if self.path == '/file/json/dir':
+            user = self.session_user()
+            if user is None or form.get('csrftoken') != CSRF:
+                return self.send(302, headers={'Location': '/login'})
+            search = form.get('sSearch', '')
+            rows = [{'fname': name, 'size': len(content), 'ftime': ''}
+                    for name, content in files_for(user).items() if search.lower() in name.lower()]
+            body = json.dumps({'sEcho': form.get('sEcho'), 'iTotalRecords': len(rows),
+                               'iTotalDisplayRecords': len(rows), 'aaData': rows}).encode()
+            return self.send(200, body, 'application/json')
+        return self.send(404)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in publishedprices portal')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), PortalHandler)
+    print(f'publishedprices stub on http://{args.host}:{args.port}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
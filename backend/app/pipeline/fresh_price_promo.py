@@ -1,27 +1,133 @@
 import streamlit as st
 import asyncio
+from datetime import datetime
 
 from backend.app.services.async_runner import run_async
-from backend.app.utilities.url_to_dict import data_dict
+from backend.app.utilities.url_to_dict import data_records
+from backend.app.services.snapshot_service import load_snapshot, save_snapshot, latest_snapshot, file_timestamp
+from backend.app.services.demand_service import record_demand, record_publication
+from backend.app.pipeline.ingest_worker import submit_ingest
 from backend.app.utilities.general import all_session_keys, all_session_keys_dicts
 from backend.app.core.super_class import SupermarketChain
 
 
+async def store_records(chain, store_code: str | int, kind: str, url: str,
+                        cookies: dict[str, str] | None = None) -> list[dict] | None:
+    """
+    Get the parsed records (items / promotions) of the file at url for the store.
+    Uses the snapshot of a file parsed before, otherwise parses the file and saves its snapshot.
+    """
+    records = load_snapshot(chain.chain_code, store_code, kind, url)
+    if records is None:
+        records = await data_records(url=url, kind=kind, cookies=cookies, chain=chain.alias)
+        save_snapshot(chain.chain_code, store_code, kind, url, records)
+
+    return records
+
+
+# Full / delta file keys in the urls dict returned by chain.prices(), the delta file type and the field
+# identifying a record
+DELTA_FILES = {
+    'items': {'full': ('pricefull', 'PriceFull'), 'delta': ('price', 'prices', 'Price'), 'type': 'Price',
+              'key': 'ItemCode'},
+    'promotions': {'full': ('promofull', 'PromoFull'), 'delta': ('promo', 'Promo'), 'type': 'Promo',
+                   'key': 'PromotionId'},
+}
+
+
+def file_url(urls: dict, keys: tuple[str, ...]) -> str | None:
+    """ Get the first url found under any of the keys (chains name the file types differently) """
+    return next((urls[k] for k in keys if urls.get(k)), None)
+
+
+def merge_records(baseline: list[dict], delta: list[dict], key: str) -> list[dict]:
+    """ Apply delta records on top of baseline records - records with same key are replaced, new ones added """
+    merged = {r.get(key): r for r in baseline}
+    for record in delta:
+        merged[record.get(key)] = record
+    return list(merged.values())
+
+
+async def snapshot_records(chain, store_code: str | int, kind: str, urls: dict,
+                           cookies: dict[str, str] | None = None) -> tuple[str | None, list[dict] | None]:
+    """
+    Get the records of the store using the last full file as baseline and applying, in order, every
+    (much smaller) incremental Price / Promo file published since.
+    The full file is loaded when there is no baseline or the chain published a newer full file.
+    When the chain cannot list the delta files published since the baseline, the full file is used as is.
+    Returns (timestamp of the last file applied, records).
+    """
+    files = DELTA_FILES[kind]
+    full_url = file_url(urls, files['full'])
+    full_timestamp = file_timestamp(full_url)
+
+    baseline = latest_snapshot(chain.chain_code, store_code, kind)
+    if baseline is None or (full_timestamp and full_timestamp > baseline['full_timestamp']):
+        if not full_url:
+            return (baseline['timestamp'], baseline['records']) if baseline else (None, None)
+        records = await store_records(chain, store_code, kind, full_url, cookies)
+        if records is None:
+            return None, None
+        baseline = {'timestamp': full_timestamp, 'full_timestamp': full_timestamp, 'records': records}
+
+    delta_timestamp = file_timestamp(file_url(urls, files['delta']))
+    if delta_timestamp is None or baseline['timestamp'] is None or delta_timestamp <= baseline['timestamp']:
+        # Nothing published since the baseline
+        return baseline['timestamp'], baseline['records']
+
+    # Every delta published since the baseline, oldest first
+    deltas = await chain.files_since(store_code, files['type'], datetime.strptime(baseline['timestamp'],
+                                                                                   '%Y%m%d%H%M%S'))
+    if not deltas or deltas[-1].timestamp.strftime('%Y%m%d%H%M%S') < delta_timestamp:
+        # The listing does not reach back to the baseline (or is behind) - deltas might be skipped
+        if not full_url:
+            return baseline['timestamp'], baseline['records']
+        return full_timestamp, await store_records(chain, store_code, kind, full_url, cookies)
+
+    async with asyncio.TaskGroup() as tg:
+        tasks = [tg.create_task(data_records(url=record.url, kind=kind, cookies=cookies, chain=chain.alias))
+                 for record in deltas]
+    records = baseline['records']
+    for task in tasks:
+        records = merge_records(records, task.result(), files['key'])
+    save_snapshot(chain.chain_code, store_code, kind, deltas[-1].url, records,
+                  full_timestamp=baseline['full_timestamp'])
+
+    return file_timestamp(deltas[-1].url), records
+
+
+async def delta_store_records(chain, store_code: str | int, kind: str, urls: dict,
+                              cookies: dict[str, str] | None = None) -> list[dict] | None:
+    """
+    Get the current records of the store (see snapshot_records).
+    Loading them into the price tables and recording the price changes is left to the ingest thread
+    (skipped there when they are not newer than the ones loaded before) - the records are returned at once.
+    """
+    timestamp, records = await snapshot_records(chain, store_code, kind, urls, cookies)
+    submit_ingest(chain.chain_code, store_code, kind, timestamp, records)
+    return records
+
+
 # @st.cache_data(ttl=1800)
-async def fresh_price_data(chain_code: str | int, store_code: str | int, ) -> dict | None:
-    """ Fetch fresh price data for the given chain and store code """
+async def fresh_price_data(chain_code: str | int, store_code: str | int, urls: dict | None = None) -> dict | None:
+    """
+    Fetch fresh price data for the given chain and store code.
+    urls - the store's prices() result when already resolved (e.g. with prices_for_stores())
+    """
     # Get the supermarket chain class from its chain code
     chain = next((c for c in SupermarketChain.registry if c.chain_code == str(chain_code)), None)
     # Get the latest price URLs for the given chain and store code
-    urls = await chain.safe_prices(store_code=store_code) if chain and store_code else None
+    if urls is None:
+        urls = await chain.safe_prices(store_code=store_code) if chain and store_code else None
     if urls:
-        # Use pricefull URL and cookies if available
-        url = urls.get('pricefull') or urls.get('PriceFull') if urls else None
+        # Feed the background prefetcher - which stores are popular and when the chain publishes
+        record_demand(chain_code, store_code)
+        record_publication(chain_code, urls)
         cookies = urls.get('cookies', None) if urls else None
-        # Make data dict from data in pricefull URL
-        price_dict = await data_dict(url=url, cookies=cookies) if url else None
-        # Clean data dict to only include dicts of items
-        price_data = chain.get_price_data(price_data=price_dict) if price_dict else None
+        # Item records - baseline pricefull snapshot with latest price file applied, or freshly parsed pricefull
+        price_records = await delta_store_records(chain, store_code, 'items', urls, cookies)
+        # Add chain alias to the item dicts
+        price_data = chain.tag_records(price_records) if price_records else None
         return price_data
     else:
         raise RuntimeError(f"No price URLs found for chain {chain_code} and store {store_code}.")
@@ -35,13 +141,12 @@ async def fresh_promo_data(chain_code: str | int, store_code: str | int, ) -> di
     # Get the latest price URLs for the given chain and store code
     urls = await chain.safe_prices(store_code=store_code) if chain and store_code else None
     if urls:
-        # Use promofull URL and cookies if available
-        url = urls.get('promofull') or urls.get('PromoFull') if urls else None
+        record_publication(chain_code, urls)
         cookies = urls.get('cookies', None) if urls else None
-        # Make data dict from data in pricefull URL
-        promo_dict = await data_dict(url=url, cookies=cookies) if url else None
-        # Clean data dict to only include dicts of items
-        promo_data = chain.get_promo_data(promo_data=promo_dict) if promo_dict else None
+        # Promotion records - baseline promofull snapshot with latest promo file applied, or freshly parsed promofull
+        promo_records = await delta_store_records(chain, store_code, 'promotions', urls, cookies)
+        # Add chain alias to the promotion dicts
+        promo_data = chain.tag_records(promo_records) if promo_records else None
         return promo_data
     else:
         raise RuntimeError(f"No promo URLs found for chain {chain_code} and store {store_code}.")
@@ -54,13 +159,25 @@ async def load_stores_price_data():
     # Make list of dicts with chain_code and store_code from each session key
     session_keys_dicts = all_session_keys_dicts(session_keys=session_keys)
 
+    # Resolve the file urls of the selected stores - one listing pass per chain
+    stores_by_chain = {}
+    for store in session_keys_dicts:
+        stores_by_chain.setdefault(str(store['chain_code']), []).append(store['store_code'])
+    chains = {c.chain_code: c for c in SupermarketChain.registry}
+    async with asyncio.TaskGroup() as tg:
+        url_tasks = {chain_code: tg.create_task(chains[chain_code].safe_prices_for_stores(store_codes))
+                     for chain_code, store_codes in stores_by_chain.items() if chain_code in chains}
+    urls_by_store = {(chain_code, store_code): urls
+                     for chain_code, task in url_tasks.items() for store_code, urls in task.result().items()}
+
     # Get price data for all selected stores
     async with asyncio.TaskGroup() as tg:
         tasks = [
             tg.create_task(
                 fresh_price_data(
                     chain_code=store['chain_code'],
-                    store_code=store['store_code']
+                    store_code=store['store_code'],
+                    urls=urls_by_store.get((str(store['chain_code']), str(store['store_code'])))
                 )
             )
             for store in session_keys_dicts
@@ -0,0 +1,90 @@
+import asyncio
+import atexit
+import threading
+from concurrent.futures import Future
+
+from backend.app.services import db_service
+from backend.app.services.async_runner import close_loop_resources
+from backend.app.services.db_service import ingest_snapshot
+from backend.app.services.history_service import record_price_history
+
+
+# Parsed snapshots are loaded into the price tables and the price history off the interactive path -
+# by one background thread with its own event loop, one snapshot at a time in the order they were submitted
+_thread: threading.Thread | None = None
+_thread_lock = threading.Lock()
+# Event loop of the ingest thread and its queue of (ingest_store_snapshot arguments, Future), None stops it
+_loop: asyncio.AbstractEventLoop | None = None
+_queue: asyncio.Queue | None = None
+
+
+async def ingest_store_snapshot(chain_code: str | int, store_code: str | int, kind: str, timestamp: str,
+                                records: list[dict]) -> bool:
+    """ Load the snapshot of the store into the price tables and, for items, record its price changes """
+    ingested = await ingest_snapshot(chain_code, store_code, kind, timestamp, records)
+    if kind == 'items':
+        await record_price_history(chain_code, store_code, timestamp, records)
+    return ingested
+
+
+async def ingest_loop(queue: asyncio.Queue):
+    """ Load the queued snapshots until stop_ingester() queues None - failures are logged and skipped """
+    try:
+        while (job := await queue.get()) is not None:
+            args, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(await ingest_store_snapshot(*args))
+            except Exception as e:
+                print(f"Ingesting {args[2]} of chain {args[0]} store {args[1]} failed: {e!r}")
+                future.set_exception(e)
+    finally:
+        await close_loop_resources()
+
+
+def run_ingester(loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+    """ Body of the ingest thread """
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(ingest_loop(queue))
+    finally:
+        loop.close()
+
+
+def submit_ingest(chain_code: str | int, store_code: str | int, kind: str, timestamp: str | None,
+                  records: list[dict] | None) -> Future | None:
+    """
+    Queue the snapshot for loading and return at once - a Future of ingest_store_snapshot(),
+    None when there is nothing to load. The ingest thread is started on first use.
+    """
+    global _thread, _loop, _queue
+    if not db_service.PRICE_DB_ENABLED or not timestamp or records is None:
+        return None
+    # Copies - the caller goes on using (and tagging) the records while they are loaded
+    args = (chain_code, store_code, kind, timestamp, [dict(r) for r in records])
+    future = Future()
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _loop, _queue = asyncio.new_event_loop(), asyncio.Queue()
+            _thread = threading.Thread(target=run_ingester, args=(_loop, _queue), name='xollify-ingest',
+                                       daemon=True)
+            _thread.start()
+        _loop.call_soon_threadsafe(_queue.put_nowait, (args, future))
+    return future
+
+
+@atexit.register
+def stop_ingester(timeout: float = 30):
+    """ Load the snapshots still queued and close the connections of the ingest thread (runs at interpreter exit) """
+    global _thread, _loop, _queue
+    with _thread_lock:
+        thread, loop, queue = _thread, _loop, _queue
+        _thread = _loop = _queue = None
+    if thread is None or not thread.is_alive():
+        return
+    try:
+        loop.call_soon_threadsafe(queue.put_nowait, None)
+    except RuntimeError:
+        return  # loop already closed
+    thread.join(timeout)
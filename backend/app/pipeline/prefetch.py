@@ -0,0 +1,136 @@
+import asyncio
+import atexit
+import os
+import threading
+from datetime import datetime, timedelta
+
+from backend.app.core.super_class import SupermarketChain
+from backend.app.pipeline.fresh_price_promo import delta_store_records
+from backend.app.services.async_runner import close_loop_resources
+from backend.app.services.demand_service import (popular_stores, record_publication, next_publication,
+                                                 chain_cadence)
+from backend.app.utilities.http_client import host_of
+from backend.app.utilities.request_scheduler import PREFETCH, request_priority
+
+
+# Background prefetch of price / promo data for the most requested stores
+PREFETCH_ENABLED = os.environ.get('XOLLIFY_PREFETCH', '1') != '0'
+# Seconds between scheduler rounds
+PREFETCH_INTERVAL = int(os.environ.get('XOLLIFY_PREFETCH_INTERVAL', 300))
+# Number of most requested stores kept warm
+PREFETCH_STORES = int(os.environ.get('XOLLIFY_PREFETCH_STORES', 10))
+# Concurrent prefetches per chain host (leaves room for interactive requests)
+PREFETCH_PER_HOST = 2
+# A store is not prefetched again sooner than this, even if its chain publishes more often
+MIN_REFETCH = timedelta(minutes=15)
+
+# (chain_code, store_code) → time of last prefetch
+_last_prefetch: dict[tuple[str, str], datetime] = {}
+_thread: threading.Thread | None = None
+_thread_lock = threading.Lock()
+# Event loop of the prefetch thread and its scheduler task (cancelled by stop_prefetcher)
+_loop: asyncio.AbstractEventLoop | None = None
+_task: asyncio.Task | None = None
+
+
+def is_due(chain_code: str, store_code: str, now: datetime) -> bool:
+    """
+    Prefetch when never done, when the chain is expected to have published since the last prefetch,
+    or when a publication interval passed since the last prefetch (the expected publication moves on only
+    when a new file is seen - a prefetch that found nothing new must not stop the store from being prefetched)
+    """
+    last = _last_prefetch.get((chain_code, store_code))
+    if last is None:
+        return True
+    if now - last < MIN_REFETCH:
+        return False
+    expected = next_publication(chain_code)
+    return expected is None or last < expected <= now or now - last >= chain_cadence(chain_code)
+
+
+async def prefetch_store(chain, store_code: str, semaphore: asyncio.Semaphore):
+    """ Resolve the newest files of the store and parse them into the file cache / snapshots """
+    async with semaphore:
+        try:
+            urls = await chain.prices(store_code)
+            if not urls or 'Error' in urls:
+                return
+            record_publication(chain.chain_code, urls)
+            cookies = urls.get('cookies')
+            for kind in ('items', 'promotions'):
+                # Snapshots are updated (price tables and history queued) when the chain published since the last round
+                await delta_store_records(chain, store_code, kind, urls, cookies)
+        except Exception as e:
+            print(f"Prefetch failed for {chain.alias} store {store_code}: {e!r}")
+
+
+async def prefetch_round(semaphores: dict[str, asyncio.Semaphore]):
+    """ Prefetch all popular stores that are due """
+    now = datetime.now()
+    chains = {c.chain_code: c for c in SupermarketChain.registry}
+
+    async with asyncio.TaskGroup() as tg:
+        for chain_code, store_code in popular_stores(PREFETCH_STORES):
+            chain = chains.get(chain_code)
+            if chain is None or not is_due(chain_code, store_code, now):
+                continue
+            _last_prefetch[(chain_code, store_code)] = now
+            semaphore = semaphores.setdefault(host_of(chain.url), asyncio.Semaphore(PREFETCH_PER_HOST))
+            tg.create_task(prefetch_store(chain, store_code, semaphore))
+
+
+async def prefetch_loop():
+    """ Scheduler loop - runs for the life of the process in the prefetch thread """
+    semaphores = {}
+    try:
+        # Prefetch requests give way to interactive requests in the request scheduler
+        with request_priority(PREFETCH):
+            while True:
+                try:
+                    await prefetch_round(semaphores)
+                except Exception as e:
+                    print(f"Prefetch round failed: {e!r}")
+                await asyncio.sleep(PREFETCH_INTERVAL)
+    finally:
+        await close_loop_resources()
+
+
+def run_prefetcher():
+    """ Body of the prefetch thread - runs the scheduler loop until stop_prefetcher() cancels it """
+    global _loop, _task
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        with _thread_lock:
+            _loop, _task = loop, loop.create_task(prefetch_loop())
+        loop.run_until_complete(_task)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        loop.close()
+
+
+def start_prefetcher():
+    """ Start the background prefetch thread once per process """
+    global _thread
+    if not PREFETCH_ENABLED:
+        return
+    with _thread_lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        _thread = threading.Thread(target=run_prefetcher, name='xollify-prefetch', daemon=True)
+        _thread.start()
+
+
+@atexit.register
+def stop_prefetcher(timeout: float = 10):
+    """ Cancel the prefetch loop and wait for it to close its connections (runs at interpreter exit) """
+    with _thread_lock:
+        thread, loop, task = _thread, _loop, _task
+    if thread is None or not thread.is_alive() or loop is None:
+        return
+    try:
+        loop.call_soon_threadsafe(task.cancel)
+    except RuntimeError:
+        return  # loop already closed
+    thread.join(timeout)
@@ -2,6 +2,18 @@ import httpx
 import asyncio
 import streamlit as st
 
+from backend.app.db.connection import dispose_engine
+from backend.app.utilities.http_client import close_clients
+
+
+async def close_loop_resources():
+    """
+    Close the connections pooled in the running event loop and dispose its database engine.
+    Each script run gets a new event loop, so nothing opened in it can be reused by the next run.
+    """
+    await close_clients()
+    await dispose_engine()
+
 
 def run_async(coro, key: str = None, *args, **kwargs):
     """
@@ -29,5 +41,8 @@ def run_async(coro, key: str = None, *args, **kwargs):
         asyncio.create_task(wrapper())
         return None
     else:
-        return loop.run_until_complete(wrapper())
+        try:
+            return loop.run_until_complete(wrapper())
+        finally:
+            loop.run_until_complete(close_loop_resources())
 
@@ -1,14 +1,22 @@
 import streamlit as st
 import asyncio
-from sqlalchemy import select
+from sqlalchemy import select, tuple_
 
 from backend.app.utilities.url_to_dict import data_dict
-from backend.app.db.models import Store
+from backend.app.utilities.request_scheduler import request_priority, BULK
+from backend.app.db.models import Store, Item, StorePrice
 from backend.app.db.connection import get_session
-from backend.app.db.create_db import insert_new_stores
+from backend.app.db.storage import upsert_stores, ingest_store_records
+from backend.app.db.prices_db import PRICE_DB_ENABLED
+from backend.app.db.models import store_key
+from backend.app.services.snapshot_service import ingested_timestamp, mark_ingested
 from backend.app.core.super_class import SupermarketChain
 
 
+# Chains whose stores are updated at the same time
+CHAIN_CONCURRENCY = 5
+
+
 # UPDATE STORES DATA IN DB ##############
 async def update_chain_stores_db(chain):
     """ Function with flow of all steps to update a chain stores data in db"""
@@ -17,23 +25,26 @@ async def update_chain_stores_db(chain):
     url = url_dict.get('stores')
     cookies = url_dict.get('cookies')
     # Read and make stores url into data dict
-    chain_data = await data_dict(url, cookies)
+    chain_data = await data_dict(url, cookies, chain=chain.alias)
     # Prepare the data dict for insertion into db
     insert_data = await chain.extract_stores_data_for_db(chain_data)
-    # Insert the data into db
-    for k, v in insert_data.items():
-        await insert_new_stores(v)
+    # Insert new stores and update changed ones - one COPY + upsert transaction for the chain
+    stores = [store for stores_list in insert_data.values() for store in stores_list]
+    changed = await upsert_stores(stores)
 
-    return {chain.alias: 'New stores entered into db'}
+    return {chain.alias: f'{changed} stores inserted or updated in db'}
 
 
 async def update_stores_db():
     """
     Function to update all registered chains stores data
     Use this function to populate / update db
+    Requests run with bulk priority - the request scheduler limits them per host and serves
+    interactive requests first. The number of chains updated at the same time is limited as well,
+    since browser logins, parsing and db connections are not covered by the scheduler.
     """
-    # Set asyncio semaphore limit (concurrent tasks)
-    sem = asyncio.Semaphore(5)
+    # Set asyncio semaphore limit (concurrent chains)
+    sem = asyncio.Semaphore(CHAIN_CONCURRENCY)
 
     async def limited(chain):
         """ A wrapper to run function with semaphore limitation"""
@@ -46,10 +57,11 @@ async def update_stores_db():
 
     try:
         # Make TaskGroup of tasks where each task is getting stores url (and cookies) for chain and updating db
-        async with asyncio.TaskGroup() as tg:
-            tasks = {}
-            for chain in chains:
-                tasks[chain.alias] = tg.create_task(limited(chain))
+        with request_priority(BULK):
+            async with asyncio.TaskGroup() as tg:
+                tasks = {}
+                for chain in chains:
+                    tasks[chain.alias] = tg.create_task(limited(chain))
 
     except* Exception as eg:
         for exc in eg.exceptions:
@@ -86,3 +98,63 @@ async def get_stores_for_chain(chain: SupermarketChain):
         ]
 
 
+# PRICE TABLES ##############
+async def ingest_snapshot(chain_code: str | int, store_code: str | int, kind: str, timestamp: str | None,
+                          records: list[dict] | None) -> bool:
+    """
+    Load the current snapshot (items / promotions records) of the store into the price tables -
+    only when it is newer than the snapshot loaded last time. Returns True when the tables were updated.
+    """
+    if not PRICE_DB_ENABLED or not timestamp or records is None:
+        return False
+    if timestamp <= ingested_timestamp(chain_code, store_code, kind):
+        return False
+    try:
+        await ingest_store_records(chain_code, store_code, kind, records)
+    except Exception as e:
+        print(f"Ingesting {kind} of chain {chain_code} store {store_code} failed: {e!r}")
+        return False
+    mark_ingested(chain_code, store_code, kind, timestamp)
+    return True
+
+
+# PRICE LOOKUPS ##############
+def number_text(value) -> str | None:
+    """ A numeric column (Decimal) as text like in the price files, without trailing zeros """
+    return format(value.normalize(), 'f') if value is not None else None
+
+
+async def get_store_prices(stores: list[tuple], item_codes: list[str]) -> dict:
+    """
+    Prices of the barcodes in the stores - one indexed query instead of loading the stores' catalogs.
+    stores is a list of (chain_code, store_code).
+    Returns {(chain_code, store_code): [item records shaped like the price file records]}
+    """
+    keys = [store_key(chain_code, store_code) for chain_code, store_code in stores]
+    results = {key: [] for key in keys}
+    if not keys or not item_codes:
+        return results
+
+    Session = await get_session()
+
+    async with Session as session:
+        result = await session.execute(
+            select(StorePrice, Item)
+            .join(Item, Item.item_code == StorePrice.item_code, isouter=True)
+            .where(tuple_(StorePrice.chain_code, StorePrice.store_code).in_(keys))
+            .where(StorePrice.item_code.in_([str(code) for code in item_codes]))
+        )
+
+        for price, item in result.all():
+            results[(price.chain_code, price.store_code)].append({
+                'ItemCode': price.item_code,
+                'ItemName': item.item_name if item else None,
+                'ManufacturerName': item.manufacturer_name if item else None,
+                'UnitQty': item.unit_qty if item else None,
+                'Quantity': number_text(item.quantity) if item else None,
+                'ItemPrice': number_text(price.item_price),
+                'UnitOfMeasurePrice': number_text(price.unit_of_measure_price),
+                'PriceUpdateDate': price.price_update_date,
+            })
+
+        return results
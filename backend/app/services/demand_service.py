@@ -0,0 +1,69 @@
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from statistics import median
+
+from backend.app.services.snapshot_service import file_timestamp
+
+
+# Limits for the learned publication interval of a chain
+MIN_CADENCE = timedelta(minutes=15)
+MAX_CADENCE = timedelta(hours=24)
+DEFAULT_CADENCE = timedelta(hours=1)
+# Number of publication timestamps kept per chain for learning its cadence
+TIMESTAMPS_TO_KEEP = 20
+
+_lock = threading.Lock()
+# (chain_code, store_code) → number of times its price / promo data was requested
+_demand: Counter = Counter()
+# chain_code → sorted publication datetimes seen in its file names
+_publications: dict[str, list[datetime]] = defaultdict(list)
+
+
+def record_demand(chain_code: str | int, store_code: str | int):
+    """ Count a user request for the store's price / promo data """
+    with _lock:
+        _demand[(str(chain_code), str(store_code))] += 1
+
+
+def popular_stores(n: int = 10) -> list[tuple[str, str]]:
+    """ The n most requested (chain_code, store_code) pairs """
+    with _lock:
+        return [key for key, _ in _demand.most_common(n)]
+
+
+def record_publication(chain_code: str | int, urls: dict | None):
+    """ Learn from the timestamps in file names returned by chain.prices() when the chain publishes """
+    if not urls:
+        return
+    seen = set()
+    for key, url in urls.items():
+        if key == 'cookies' or not isinstance(url, str):
+            continue
+        timestamp = file_timestamp(url)
+        if timestamp:
+            seen.add(datetime.strptime(timestamp, '%Y%m%d%H%M%S'))
+
+    with _lock:
+        publications = _publications[str(chain_code)]
+        publications.extend(t for t in seen if t not in publications)
+        publications.sort()
+        del publications[:-TIMESTAMPS_TO_KEEP]
+
+
+def chain_cadence(chain_code: str | int) -> timedelta:
+    """ Typical interval between publications of the chain (median of observed intervals) """
+    with _lock:
+        publications = list(_publications.get(str(chain_code), []))
+    intervals = [b - a for a, b in zip(publications, publications[1:]) if b > a]
+    if not intervals:
+        return DEFAULT_CADENCE
+    return min(max(median(intervals), MIN_CADENCE), MAX_CADENCE)
+
+
+def next_publication(chain_code: str | int) -> datetime | None:
+    """ Expected time of the next publication of the chain, None if nothing was observed yet """
+    with _lock:
+        publications = _publications.get(str(chain_code))
+        last = publications[-1] if publications else None
+    return last + chain_cadence(chain_code) if last else None
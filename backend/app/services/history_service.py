@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from backend.app.db.prices_db import PRICE_DB_ENABLED, to_numeric
+from backend.app.db.storage import ingest_price_changes
+from backend.app.services.snapshot_service import records_to_table, recorded_prices, save_recorded_prices
+
+
+# A price as published - digits with an optional fraction (anything else is not compared)
+PRICE_PATTERN = r'^\d+(\.\d+)?$'
+
+
+def price_column(table: pa.Table) -> pa.Table:
+    """
+    (ItemCode, price text, price value) of the items of a snapshot - items without a valid price are left out.
+    The value is the price in canonical text (no leading zeros, no trailing fraction zeros), so '5.90' and
+    '5.9' are the same price and prices are compared exactly.
+    """
+    if 'ItemCode' not in table.column_names or 'ItemPrice' not in table.column_names:
+        return pa.table({'ItemCode': pa.array([], pa.string()), 'price': pa.array([], pa.string()),
+                         'value': pa.array([], pa.string())})
+    text = pc.utf8_trim_whitespace(table['ItemPrice'])
+    valid = pc.fill_null(pc.match_substring_regex(text, PRICE_PATTERN), False)
+    codes = pc.utf8_trim_whitespace(table['ItemCode'])
+    prices = pa.table({'ItemCode': codes, 'price': text}).filter(valid)
+    value = pc.replace_substring_regex(prices['price'], r'(\.\d*?)0+$', r'\1')
+    value = pc.replace_substring_regex(value, r'\.$', '')
+    value = pc.replace_substring_regex(value, r'^0+(\d)', r'\1')
+    return prices.append_column('value', value)
+
+
+def price_changes(previous: pa.Table | None, current: pa.Table) -> pa.Table:
+    """
+    Vectorized diff of the items of a store (ItemCode / ItemPrice tables) versus its previous prices -
+    (ItemCode, price, previous_price) of the items that are new or whose price changed.
+    """
+    prices = price_column(current)
+    if previous is None:
+        return pa.table({'ItemCode': prices['ItemCode'], 'price': prices['price'],
+                         'previous_price': pa.nulls(len(prices), pa.string())})
+
+    before = price_column(previous).rename_columns(['ItemCode', 'previous_price', 'previous_value'])
+    joined = prices.join(before, keys='ItemCode', join_type='left outer')
+    changed = pc.fill_null(pc.or_kleene(pc.is_null(joined['previous_value']),
+                                        pc.not_equal(joined['value'], joined['previous_value'])), True)
+    return joined.filter(changed).select(['ItemCode', 'price', 'previous_price'])
+
+
+def history_rows(changes: pa.Table) -> list[tuple]:
+    """ Rows for ingest_price_changes """
+    return [(code, to_numeric(price), to_numeric(previous))
+            for code, price, previous in zip(*(changes[c].to_pylist()
+                                               for c in ('ItemCode', 'price', 'previous_price')))]
+
+
+async def record_price_history(chain_code: str | int, store_code: str | int, timestamp: str | None,
+                               records: list[dict] | None) -> int:
+    """
+    Append the price changes of the items snapshot published at timestamp to the price history -
+    compared with the prices recorded last for the store (kept next to its snapshots), so no published
+    change is skipped however many snapshots came in between. The first snapshot of a store is only kept
+    as the starting point. Returns the number of changes recorded.
+    """
+    if not PRICE_DB_ENABLED or not timestamp or not records:
+        return 0
+    recorded = recorded_prices(chain_code, store_code)
+    if recorded is not None and recorded[0] >= timestamp:
+        return 0
+
+    current = price_column(records_to_table(records)).select(['ItemCode', 'price'])
+    current = current.rename_columns(['ItemCode', 'ItemPrice'])
+    count = 0
+    if recorded is not None:
+        changes = price_changes(recorded[1], current)
+        try:
+            count = await ingest_price_changes(chain_code, store_code, datetime.strptime(timestamp, '%Y%m%d%H%M%S'),
+                                               history_rows(changes))
+        except Exception as e:
+            print(f"Recording price history of chain {chain_code} store {store_code} failed: {e!r}")
+            return 0
+    save_recorded_prices(chain_code, store_code, timestamp, current)
+    return count
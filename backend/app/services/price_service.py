@@ -2,6 +2,11 @@ import streamlit as st
 import itertools
 import math
 
+from backend.app.db.models import store_key
+from backend.app.db.prices_db import PRICE_DB_ENABLED
+from backend.app.services.async_runner import run_async
+from backend.app.services.db_service import get_store_prices
+
 
 def best_cost_for_k_stores(shoppinglist, k):
     """
@@ -75,31 +80,46 @@ def best_cost_for_k_stores(shoppinglist, k):
     return best_combo, best_total, best_plan
 
 
+def shopping_list_prices(shopping_list: dict) -> dict[str, dict[str, str]]:
+    """
+    Prices of the barcodes in the shopping list from the price tables - one indexed query for all stores.
+    Returns {session_key: {item_code: price}} ({} when the price tables are not available).
+    """
+    if not PRICE_DB_ENABLED or not shopping_list:
+        return {}
+    stores = {session_key: store_key(*session_key.split('_')) for session_key in shopping_list}
+    item_codes = sorted({str(item['Item Code']) for items in shopping_list.values() for item in items})
+    try:
+        results = run_async(get_store_prices, stores=list(stores.values()), item_codes=item_codes)
+    except Exception as e:
+        print(f"Price lookup failed: {e!r}")
+        return {}
+    return {session_key: {d['ItemCode']: d['ItemPrice'] for d in results.get(key, [])}
+            for session_key, key in stores.items()}
+
+
 def add_prices_to_shopping_list(shopping_list: dict) -> dict:
     """
     Add 'price' to every item in every store in the shopping list.
-    Looks up prices from st.session_state[store_key].
+    Looks up prices in the price tables, stores not found there in st.session_state[store_key].
     Returns a NEW updated shopping dict.
     """
     updated = {}
+    db_prices = shopping_list_prices(shopping_list)
 
     for session_key, items in shopping_list.items():
-        price_data = st.session_state.get(session_key, [])
+        # {item code: price} of the store
+        prices = db_prices.get(session_key) or {d["ItemCode"]: d["ItemPrice"]
+                                                for d in st.session_state.get(session_key) or []}
 
         new_items = []
         for item in items:
             # Normalize item code to string
             item_code = str(item["Item Code"])
 
-            # Find price for this item in the store's price data
-            price = next(
-                (d["ItemPrice"] for d in price_data if d["ItemCode"] == item_code),
-                None
-            )
-
             # Create a copy so we don't mutate the original
             updated_item = dict(item)
-            updated_item["price"] = price
+            updated_item["price"] = prices.get(item_code)
 
             new_items.append(updated_item)
 
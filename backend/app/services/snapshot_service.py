@@ -0,0 +1,185 @@
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+
+from backend.app.db.models import store_code_key
+from backend.app.utilities.file_cache import CACHE_DIR
+from backend.app.utilities.file_index import file_name, parse_timestamp
+
+
+# Parsed price / promo records are kept as Arrow IPC files -
+# {SNAPSHOT_DIR}/{chain}/{store}/{kind}-{timestamp}-{full|delta}.arrow
+SNAPSHOT_DIR = Path(os.environ.get('XOLLIFY_SNAPSHOT_DIR', CACHE_DIR / 'snapshots'))
+# Number of snapshots kept per store and kind (older ones are deleted)
+SNAPSHOTS_TO_KEEP = 2
+
+
+def file_timestamp(url: str | None) -> str | None:
+    """ Extract the publication timestamp (YYYYMMDDHHMMSS) from the file name in url """
+    if not url:
+        return None
+    found = parse_timestamp(re.findall(r'\d+', file_name(url)))
+    return found[1].strftime('%Y%m%d%H%M%S') if found else None
+
+
+def store_folder(chain_code: str | int, store_code: str | int) -> Path:
+    """ Folder of the snapshots of the store """
+    return SNAPSHOT_DIR / str(chain_code) / store_code_key(store_code)
+
+
+def file_source(url: str | None) -> str:
+    """ 'full' for PriceFull / PromoFull files, 'delta' for the incremental Price / Promo files """
+    name = (url or '').split('?')[0].replace('\\', '/').rstrip('/').split('/')[-1]
+    return 'full' if name.lower().startswith(('pricefull', 'promofull')) else 'delta'
+
+
+def snapshot_path(chain_code: str | int, store_code: str | int, kind: str, timestamp: str, source: str) -> Path:
+    """
+    Path of the snapshot for given chain, store, record kind, source file timestamp and source (full / delta) -
+    a full and a delta file published at the same time get their own snapshots (the newest first scan of
+    latest_snapshot picks the full one - 'full' sorts after 'delta')
+    """
+    return store_folder(chain_code, store_code) / f'{kind}-{timestamp}-{source}.arrow'
+
+
+def records_to_table(records: list[dict]) -> pa.Table:
+    """
+    Make an Arrow table of string columns from parsed records.
+    Nested values (e.g. PromotionItems) are stored as JSON text and listed in the schema metadata.
+    """
+    columns = list(dict.fromkeys(k for r in records for k in r))
+    json_columns = [c for c in columns if any(isinstance(r.get(c), (dict, list)) for r in records)]
+
+    data = {}
+    for c in columns:
+        if c in json_columns:
+            data[c] = [json.dumps(r[c], ensure_ascii=False) if r.get(c) is not None else None for r in records]
+        else:
+            data[c] = [r.get(c) for r in records]
+
+    table = pa.table({c: pa.array(v, type=pa.string()) for c, v in data.items()})
+    return table.replace_schema_metadata({'json_columns': json.dumps(json_columns)})
+
+
+def table_to_records(table: pa.Table) -> list[dict]:
+    """ Convert a snapshot table back to the list of record dicts """
+    metadata = table.schema.metadata or {}
+    json_columns = json.loads(metadata.get(b'json_columns', b'[]'))
+    records = table.to_pylist()
+    for c in json_columns:
+        for r in records:
+            if r[c] is None:
+                # Nested field missing in this record - leave it out like the parser does
+                del r[c]
+            else:
+                r[c] = json.loads(r[c])
+    return records
+
+
+def read_snapshot(path: Path) -> pa.Table | None:
+    """ Memory map the snapshot file at path """
+    try:
+        with pa.memory_map(str(path), 'r') as source:
+            return pa.ipc.open_file(source).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+def load_snapshot(chain_code: str | int, store_code: str | int, kind: str, url: str | None) -> list[dict] | None:
+    """ Return records of the snapshot made from the file at url, or None if there is no such snapshot """
+    timestamp = file_timestamp(url)
+    if timestamp is None:
+        return None
+    table = read_snapshot(snapshot_path(chain_code, store_code, kind, timestamp, file_source(url)))
+    return table_to_records(table) if table is not None else None
+
+
+def latest_snapshot(chain_code: str | int, store_code: str | int, kind: str) -> dict | None:
+    """
+    Return the newest snapshot of the store as
+    {'timestamp': last file applied, 'full_timestamp': full file it is based on, 'records': [...]}
+    """
+    folder = store_folder(chain_code, store_code)
+    for path in sorted(folder.glob(f'{kind}-*.arrow'), reverse=True):
+        table = read_snapshot(path)
+        if table is None:
+            continue
+        timestamp = path.stem.split('-')[1]
+        metadata = table.schema.metadata or {}
+        return {
+            'timestamp': timestamp,
+            'full_timestamp': metadata.get(b'full_timestamp', timestamp.encode()).decode(),
+            'records': table_to_records(table),
+        }
+    return None
+
+
+def write_table(path: Path, table: pa.Table):
+    """ Write an Arrow table to path - via a temp file renamed into place, so a reader never maps a partial file """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.part')
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp_name, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_name, path)
+    except Exception:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def recorded_prices(chain_code: str | int, store_code: str | int) -> tuple[str, pa.Table] | None:
+    """ (timestamp, prices table) last recorded in the price history of the store, None before the first one """
+    table = read_snapshot(store_folder(chain_code, store_code) / 'history-prices.arrow')
+    if table is None:
+        return None
+    return (table.schema.metadata or {}).get(b'timestamp', b'').decode(), table
+
+
+def save_recorded_prices(chain_code: str | int, store_code: str | int, timestamp: str, table: pa.Table):
+    """ Keep the prices recorded in the price history of the store - the next snapshot is compared with them """
+    table = table.replace_schema_metadata({b'timestamp': timestamp.encode()})
+    write_table(store_folder(chain_code, store_code) / 'history-prices.arrow', table)
+
+
+def ingested_timestamp(chain_code: str | int, store_code: str | int, kind: str) -> str:
+    """ Timestamp of the last snapshot of the store loaded into the price tables ('' if none) """
+    path = store_folder(chain_code, store_code) / f'{kind}.ingested'
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return ''
+
+
+def mark_ingested(chain_code: str | int, store_code: str | int, kind: str, timestamp: str):
+    """ Remember that the snapshot with timestamp was loaded into the price tables """
+    path = store_folder(chain_code, store_code) / f'{kind}.ingested'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(timestamp)
+
+
+def save_snapshot(chain_code: str | int, store_code: str | int, kind: str, url: str | None,
+                  records: list[dict], full_timestamp: str | None = None) -> Path | None:
+    """
+    Persist parsed records of the file at url, and delete old snapshots of the same store and kind.
+    full_timestamp - timestamp of the full file the records are based on, when url is a delta (Price / Promo) file
+    """
+    timestamp = file_timestamp(url)
+    if timestamp is None or not records:
+        return None
+    path = snapshot_path(chain_code, store_code, kind, timestamp, file_source(url))
+
+    table = records_to_table(records)
+    table = table.replace_schema_metadata({**table.schema.metadata,
+                                           b'full_timestamp': (full_timestamp or timestamp).encode()})
+    write_table(path, table)
+
+    for old in sorted(path.parent.glob(f'{kind}-*.arrow'))[:-SNAPSHOTS_TO_KEEP]:
+        old.unlink(missing_ok=True)
+
+    return path
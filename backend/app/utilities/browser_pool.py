@@ -0,0 +1,144 @@
+import asyncio
+import atexit
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Playwright
+
+
+# Logged-in contexts are reused for this many seconds, then the chain logs in again
+SESSION_TTL = 20 * 60
+# Max pages open at the same time in the browser (all chains together)
+MAX_PAGES = 4
+
+
+class BrowserPool:
+    """
+    A long-lived headless Chromium with one authenticated context (cookie jar) per chain login.
+    Pages are opened in the logged-in context, so a lookup costs one page evaluation instead of
+    a browser boot and a login.
+    """
+
+    def __init__(self):
+        self.playwright: Playwright | None = None
+        self.browser: Browser | None = None
+        # login key → {'context': BrowserContext, 'created': time}
+        self.sessions: dict[str, dict] = {}
+        self.locks: dict[str, asyncio.Lock] = {}
+        self.pages = asyncio.Semaphore(MAX_PAGES)
+        self.start_lock = asyncio.Lock()
+
+    async def start(self):
+        """ Launch the browser on first use (or after it crashed) """
+        async with self.start_lock:
+            if self.browser is None or not self.browser.is_connected():
+                if self.playwright is None:
+                    self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(headless=True)
+                self.sessions.clear()
+
+    async def context(self, key: str, login) -> BrowserContext:
+        """
+        Return the logged-in context for key, logging in with login(page) when there is no session
+        or it is older than SESSION_TTL.
+        """
+        await self.start()
+        async with self.locks.setdefault(key, asyncio.Lock()):
+            session = self.sessions.get(key)
+            if session and time.monotonic() - session['created'] < SESSION_TTL:
+                return session['context']
+            if session:
+                await self.invalidate(key)
+
+            context = await self.browser.new_context(ignore_https_errors=True)
+            page = await context.new_page()
+            try:
+                await login(page)
+            except Exception:
+                await context.close()
+                raise
+            finally:
+                if not page.is_closed():
+                    await page.close()
+            self.sessions[key] = {'context': context, 'created': time.monotonic()}
+            return context
+
+    async def invalidate(self, key: str):
+        """ Drop the session of key (e.g. when the portal logged it out) """
+        session = self.sessions.pop(key, None)
+        if session:
+            try:
+                await session['context'].close()
+            except Exception:
+                pass
+
+    @asynccontextmanager
+    async def page(self, key: str, login):
+        """ Open a page in the logged-in context of key - bounded by MAX_PAGES """
+        async with self.pages:
+            context = await self.context(key, login)
+            page: Page = await context.new_page()
+            try:
+                yield page
+            finally:
+                await page.close()
+
+    async def close(self):
+        """ Close all contexts, the browser and playwright """
+        for key in list(self.sessions):
+            await self.invalidate(key)
+        if self.browser is not None:
+            await self.browser.close()
+            self.browser = None
+        if self.playwright is not None:
+            await self.playwright.stop()
+            self.playwright = None
+
+
+# The pool lives on an event loop of its own, in a thread that runs as long as the process - playwright objects
+# are bound to the loop they were created in, and every script run gets a new loop
+_pool: BrowserPool | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+_thread: threading.Thread | None = None
+_lock = threading.Lock()
+
+
+def browser_loop() -> tuple[asyncio.AbstractEventLoop, BrowserPool]:
+    """ Return the browser loop and the pool, starting the browser thread on first use """
+    global _pool, _loop, _thread
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name='xollify-browser', daemon=True)
+            _thread.start()
+            _pool = BrowserPool()
+        return _loop, _pool
+
+
+async def run_in_browser(func, *args):
+    """
+    Run func(pool, *args) - a coroutine function working with the browser pool - on the browser loop
+    and await its result in the calling loop.
+    """
+    loop, pool = browser_loop()
+    if asyncio.get_running_loop() is loop:
+        return await func(pool, *args)
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(func(pool, *args), loop))
+
+
+@atexit.register
+def close_browser_pool(timeout: float = 10):
+    """ Close the browser and stop the browser thread (runs at interpreter exit) """
+    global _pool, _thread
+    with _lock:
+        pool, loop, thread = _pool, _loop, _thread
+        _pool = _thread = None
+    if thread is None or not thread.is_alive():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(pool.close(), loop).result(timeout)
+    except Exception as e:
+        print(f"Closing the browser failed: {e!r}")
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout)
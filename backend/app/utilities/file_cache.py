@@ -0,0 +1,231 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from filelock import FileLock, Timeout
+
+
+# Local cache for downloaded chain files (price / promo / store files)
+CACHE_DIR = Path(os.environ.get('XOLLIFY_CACHE_DIR', Path(tempfile.gettempdir()) / 'xollify_cache'))
+# Max total size of cached files - least recently used files are evicted above it
+CACHE_MAX_BYTES = int(os.environ.get('XOLLIFY_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+
+# Partial downloads not resumed within this time (seconds) are deleted
+PARTIAL_MAX_AGE = 24 * 60 * 60
+# Seconds between cache size checks - a check scans the whole cache folder
+EVICT_INTERVAL = 60
+
+# Query parameters that change between requests for the same file (signed blob urls, session ids, cache busters)
+VOLATILE_PARAMS = {'sv', 'se', 'st', 'sp', 'sr', 'spr', 'srt', 'ss', 'sig', 'skoid', 'sktid', 'skt', 'ske',
+                   'sks', 'skv', 'token', 'sid', 'cftpsid', 'ts', '_', 'rnd'}
+
+# Chain files carry a date in their name or folder (YYYYMMDD...) and never change once published
+TIMESTAMPED = re.compile(r'(?:19|20)\d{6}')
+
+
+def normalize_url(url: str) -> str:
+    """ Normalize url for use as cache key - lower case host, sorted query without volatile parameters """
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in VOLATILE_PARAMS)
+    path = parts.path.replace('\\', '/')
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+
+def is_cacheable(url: str) -> bool:
+    """ Only files with a timestamp in their path are immutable and safe to cache """
+    return bool(url) and bool(TIMESTAMPED.search(urlsplit(url).path))
+
+
+def cache_path(url: str) -> Path:
+    """ Path of the cached file for url - content addressed by the hash of the normalized url """
+    key = hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+    return CACHE_DIR / key[:2] / key
+
+
+def cached_file(url: str) -> Path | None:
+    """ Return path of the cached file for url if present, and mark it as recently used """
+    if not is_cacheable(url):
+        return None
+    path = cache_path(url)
+    try:
+        # mtime is used as the LRU clock
+        os.utime(path)
+        return path
+    except OSError:
+        return None
+
+
+def evict(max_bytes: int = CACHE_MAX_BYTES):
+    """ Delete least recently used files until the cache is below max_bytes """
+    entries = []
+    total = 0
+    now = time.time()
+    for path in CACHE_DIR.glob('??/*'):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue  # evicted by another process
+        if path.suffix in ('.part', '.lock'):
+            if path.suffix == '.part' and now - stat.st_mtime > PARTIAL_MAX_AGE:
+                path.unlink(missing_ok=True)  # abandoned download
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            # Readers that already opened the file keep reading it (POSIX unlink semantics)
+            path.unlink()
+            total -= size
+        except OSError:
+            pass
+
+
+_last_evict = 0.0
+_evict_lock = threading.Lock()
+
+
+def schedule_evict():
+    """ Enforce the cache size in a background thread, at most once per EVICT_INTERVAL """
+    global _last_evict
+    with _evict_lock:
+        now = time.monotonic()
+        if _last_evict and now - _last_evict < EVICT_INTERVAL:
+            return
+        _last_evict = now
+    threading.Thread(target=evict, name='xollify-cache-evict', daemon=True).start()
+
+
+class CacheWriter:
+    """
+    Write a downloaded file into the cache.
+    Content goes to a temp file in the cache folder and is renamed into place only on commit(),
+    so readers never see a partial file.
+    """
+
+    def __init__(self, url: str):
+        self.path = cache_path(url)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, suffix='.part')
+        self.tmp_path = Path(tmp_name)
+        self.file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk: bytes):
+        self.file.write(chunk)
+
+    def commit(self):
+        """ Atomically move the complete file into place and enforce the cache size """
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        schedule_evict()
+
+    def abort(self):
+        """ Drop the partial file """
+        self.file.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+class TempWriter(CacheWriter):
+    """ Write a downloaded file that must not be cached (no timestamp in its url) to a temp file """
+
+    def __init__(self):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+        self.path = self.tmp_path = Path(tmp_name)
+        self.file = os.fdopen(fd, 'wb')
+
+    def commit(self):
+        """ The temp file is the final file - just close it """
+        self.file.close()
+
+
+class PartialFile:
+    """
+    Download of a cached file in progress, kept as {key}.part next to the final file,
+    so an interrupted transfer can be resumed with an HTTP Range request.
+    """
+
+    def __init__(self, url: str):
+        self.path = cache_path(url)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.part_path = self.path.with_name(f'{self.path.name}.part')
+        # Only one downloader (thread / process) may write the partial file at a time
+        self.lock = FileLock(str(self.path.with_name(f'{self.path.name}.lock')))
+
+    def try_lock(self) -> bool:
+        """ Acquire the download lock without blocking """
+        try:
+            self.lock.acquire(timeout=0)
+            return True
+        except Timeout:
+            return False
+
+    def unlock(self):
+        """ Release the download lock - its lock file is removed once the download is complete """
+        if self.path.exists():
+            try:
+                # Still held - a waiting downloader finds the complete file in the cache
+                Path(self.lock.lock_file).unlink(missing_ok=True)
+            except OSError:
+                pass
+        self.lock.release()
+
+    def size(self) -> int:
+        """ Number of bytes already downloaded """
+        try:
+            return self.part_path.stat().st_size
+        except OSError:
+            return 0
+
+    def open(self, append: bool):
+        """ Open the partial file for writing - append to resume, otherwise start over """
+        return open(self.part_path, 'ab' if append else 'wb')
+
+    def discard(self):
+        self.part_path.unlink(missing_ok=True)
+
+    def commit(self):
+        """ Move the complete, verified file into place and enforce the cache size """
+        os.replace(self.part_path, self.path)
+        schedule_evict()
+
+
+def verify_file(path: Path, expected_size: int | None = None) -> bool:
+    """
+    Integrity check of a downloaded file before it is parsed:
+    expected size (when the server sent it), gzip CRC / length of every member, zip member CRCs.
+    """
+    try:
+        if expected_size is not None and path.stat().st_size != expected_size:
+            return False
+
+        with open(path, 'rb') as f:
+            head = f.read(4)
+            f.seek(0)
+            if head[:2] == b"\x1f\x8b":
+                # zlib checks CRC32 and ISIZE of each gzip member when it reaches the member trailer
+                d = zlib.decompressobj(zlib.MAX_WBITS | 16)
+                while chunk := f.read(1024 * 1024):
+                    while chunk:
+                        d.decompress(chunk)
+                        chunk = d.unused_data
+                        if chunk:
+                            d = zlib.decompressobj(zlib.MAX_WBITS | 16)
+                return d.eof
+            if head == b"PK\x03\x04":
+                with zipfile.ZipFile(f) as z:
+                    return z.testzip() is None
+        return True
+
+    except (OSError, zlib.error, zipfile.BadZipFile):
+        return False
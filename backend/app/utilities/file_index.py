@@ -0,0 +1,140 @@
+import re
+from bisect import bisect_right
+from datetime import datetime, date
+from typing import NamedTuple
+from urllib.parse import urlsplit, unquote
+
+
+# File types published by the chains (longest first - 'PriceFull' must not be read as 'Price')
+FILE_TYPES = ('PriceFull', 'PromoFull', 'Price', 'Promo', 'Stores')
+FILE_NAME = re.compile(r'^(?P<type>pricefull|promofull|price|promo|storesfull|stores?)'
+                       r'(?P<chain>\d{13})(?P<rest>[-_\d]*)', re.IGNORECASE)
+CANONICAL_TYPES = {t.lower(): t for t in FILE_TYPES} | {'store': 'Stores', 'storesfull': 'Stores'}
+
+
+class FileRecord(NamedTuple):
+    """ A chain file parsed from its name - store_code is None for store list files """
+    file_type: str
+    chain_code: str
+    store_code: int | None
+    timestamp: datetime
+    url: str
+
+
+def file_name(url: str) -> str:
+    """ File name part of a url (without query string) """
+    return unquote(urlsplit(url).path).replace('\\', '/').rsplit('/', 1)[-1]
+
+
+def parse_timestamp(numbers: list[str]) -> tuple[int, datetime] | None:
+    """
+    Find the timestamp among the number groups of a file name -
+    YYYYMMDDHHMM(SS) in one group or YYYYMMDD and HHMM(SS) in two groups.
+    Returns (index of the first group of the timestamp, datetime).
+    """
+    for i, number in enumerate(numbers):
+        day = number[:8]
+        if day[:2] not in ('19', '20'):
+            continue
+        if len(number) in (12, 14):
+            clock = number[8:]
+        elif len(number) == 8:
+            following = numbers[i + 1] if i + 1 < len(numbers) else ''
+            clock = following if len(following) in (4, 6) else ''
+        else:
+            continue
+        clock = clock.ljust(6, '0')
+        try:
+            return i, datetime(int(day[:4]), int(day[4:6]), int(day[6:]),
+                               int(clock[:2]), int(clock[2:4]), int(clock[4:]))
+        except ValueError:
+            continue
+    return None
+
+
+def parse_file_url(url: str) -> FileRecord | None:
+    """
+    Parse a chain file url into a FileRecord, e.g.
+    PriceFull7290058140886-001-202510160600.gz, Price7290492000005-000-123-20251016-060000.gz,
+    Stores7290058140886-202510160500.xml. Returns None for names that do not follow the convention.
+    """
+    match = FILE_NAME.match(file_name(url))
+    if not match:
+        return None
+    numbers = re.findall(r'\d+', match.group('rest'))
+    found = parse_timestamp(numbers)
+    if found is None:
+        return None
+    position, timestamp = found
+
+    file_type = CANONICAL_TYPES[match.group('type').lower()]
+    # The store code is the number right before the timestamp (after the optional sub chain code)
+    store_code = int(numbers[position - 1]) if file_type != 'Stores' and position > 0 else None
+    return FileRecord(file_type, match.group('chain'), store_code, timestamp, url)
+
+
+class FileIndex:
+    """
+    Typed index of a chain file listing, built once per listing refresh.
+    Answers latest file per (store, type), stores with files on a date and files newer than a time
+    without rescanning the listing.
+    """
+
+    def __init__(self, records: list[FileRecord], cookies: dict[str, str] | None = None):
+        # All records ordered by timestamp (for newer_than)
+        self.records = sorted(records, key=lambda r: r.timestamp)
+        self.timestamps = [r.timestamp for r in self.records]
+        # Cookies needed for downloading the files (publishedprices)
+        self.cookies = cookies or {}
+        # (store_code, file_type) → latest record
+        self.latest: dict[tuple[int | None, str], FileRecord] = {}
+        # store_code → {dates with files}
+        self.dates: dict[int, set[date]] = {}
+        for record in self.records:
+            # Ordered by time - later records replace earlier ones
+            self.latest[(record.store_code, record.file_type)] = record
+            if record.store_code is not None:
+                self.dates.setdefault(record.store_code, set()).add(record.timestamp.date())
+
+    @classmethod
+    def from_urls(cls, urls: list[str], cookies: dict[str, str] | None = None, chain_code: str | None = None):
+        """ Build the index from file urls - urls of other chains (shared portals) are skipped """
+        records = (parse_file_url(url) for url in urls)
+        return cls([r for r in records if r and (chain_code is None or r.chain_code == chain_code)], cookies)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def latest_file(self, store_code: int | str | None, file_type: str) -> FileRecord | None:
+        """ Latest file of the type for the store (store_code None for the store list file) """
+        store = int(store_code) if store_code is not None else None
+        return self.latest.get((store, file_type))
+
+    def latest_for_store(self, store_code: int | str, types: tuple[str, ...] = FILE_TYPES[:4]) -> dict:
+        """ {file type: url of the latest file or None} for the store """
+        store = int(store_code)
+        return {t: (r.url if (r := self.latest.get((store, t))) else None) for t in types}
+
+    def latest_stores_url(self) -> str | None:
+        """ Url of the latest store list file """
+        record = self.latest.get((None, 'Stores'))
+        return record.url if record else None
+
+    def stores_on(self, day: date | None = None) -> set[int]:
+        """ Store codes that have files on the day (default today) """
+        day = day or date.today()
+        return {store for store, days in self.dates.items() if day in days}
+
+    def newer_than(self, timestamp: datetime) -> list[FileRecord]:
+        """ Records published after timestamp, oldest first """
+        return self.records[bisect_right(self.timestamps, timestamp):]
+
+    def files_since(self, store_code: int | str, file_type: str, since: datetime) -> list[FileRecord] | None:
+        """
+        The store's files of the type published after since, oldest first.
+        None when the index does not reach back to since (files in between may be missing from it).
+        """
+        if not self.records or self.records[0].timestamp > since:
+            return None
+        store = int(store_code)
+        return [r for r in self.newer_than(since) if r.store_code == store and r.file_type == file_type]
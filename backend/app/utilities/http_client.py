@@ -0,0 +1,75 @@
+import asyncio
+import weakref
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    import h2  # noqa: F401 - only needed to enable HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+# Default connection limits per host
+DEFAULT_LIMITS = {'max_connections': 10, 'max_keepalive_connections': 5, 'keepalive_expiry': 60.0}
+
+# Hosts that need different limits than the default (portals that throttle or drop parallel connections)
+HOST_LIMITS = {
+    'url.publishedprices.co.il': {'max_connections': 4, 'max_keepalive_connections': 4},
+    'laibcatalog.co.il': {'max_connections': 4, 'max_keepalive_connections': 4},
+    'shop.hazi-hinam.co.il': {'max_connections': 6, 'max_keepalive_connections': 6},
+}
+
+# Pooled clients - {event loop: {host: client}}
+# httpx connections are bound to the event loop they were opened in, so each loop gets its own pool.
+# The pools are closed with close_clients() when the loop is done (end of run_async, prefetch shutdown).
+_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]]' = \
+    weakref.WeakKeyDictionary()
+
+
+def host_of(url: str) -> str:
+    """ Return the (lower case) host name of url """
+    return (urlsplit(url).hostname or '').lower()
+
+
+def make_client(host: str) -> httpx.AsyncClient:
+    """
+    Create a new keep-alive client for host.
+    The client never stores cookies - cookies are sent per request - so it can be shared by all chains
+    and sessions using the same host.
+    """
+    limits = {**DEFAULT_LIMITS, **HOST_LIMITS.get(host, {})}
+    return httpx.AsyncClient(
+        verify=False,
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(60.0),
+        limits=httpx.Limits(**limits),
+        cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+    )
+
+
+def get_client(url: str) -> httpx.AsyncClient:
+    """ Return the pooled client for the host of url, creating it on first use """
+    loop = asyncio.get_running_loop()
+    pool = _clients.setdefault(loop, {})
+    host = host_of(url)
+
+    client = pool.get(host)
+    if client is None or client.is_closed:
+        client = make_client(host)
+        pool[host] = client
+
+    return client
+
+
+async def close_clients():
+    """
+    Close all pooled clients of the running event loop.
+    Called when the loop is done - at the end of run_async() and when the prefetch thread stops.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _clients.pop(loop, {})
+    for client in pool.values():
+        await client.aclose()
@@ -0,0 +1,49 @@
+import asyncio
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+
+# Number of worker processes for CPU bound work (decompression and XML parsing), 0 runs it on the event loop
+PARSE_WORKERS = int(os.environ.get('XOLLIFY_PARSE_WORKERS', max((os.cpu_count() or 2) - 1, 1)))
+
+_executor: ProcessPoolExecutor | None = None
+# The pool is shared by the script threads and the prefetch thread
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor | None:
+    """ Return the process pool, creating it on first use """
+    global _executor
+    if PARSE_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # spawn - forking the (multi threaded) streamlit server process is not safe
+            _executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+async def run_in_pool(func, *args, **kwargs):
+    """
+    Run func(*args, **kwargs) in the process pool and await its result, keeping the event loop free
+    for network I/O. func must be a module level (picklable) function.
+    """
+    executor = get_executor()
+    if executor is None:
+        return func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+
+@atexit.register
+def shutdown_executor():
+    """ Stop the worker processes (runs at interpreter exit) """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,152 @@
+import asyncio
+import heapq
+import itertools
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from backend.app.utilities.http_client import DEFAULT_LIMITS, HOST_LIMITS, host_of
+
+
+# Request priorities - lower value is served first
+INTERACTIVE = 0  # a user waiting for the page
+PREFETCH = 1     # background prefetch of popular stores
+BULK = 2         # bulk refreshes (e.g. the stores db update)
+
+# Slots per host kept free for interactive requests (background requests use at most limit - reserve)
+INTERACTIVE_RESERVE = 1
+
+# Priority of requests made in the current task (inherited by tasks it creates)
+_priority: ContextVar[int] = ContextVar('request_priority', default=INTERACTIVE)
+
+
+def current_priority() -> int:
+    """ Priority of requests made in the current task """
+    return _priority.get()
+
+
+@contextmanager
+def request_priority(priority: int):
+    """ Run the requests in the block (and in tasks created in it) with priority """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def host_limit(host: str) -> int:
+    """ Concurrent requests allowed to host - the connection limit of its pooled client """
+    return {**DEFAULT_LIMITS, **HOST_LIMITS.get(host, {})}['max_connections']
+
+
+class Waiter:
+    """ A request waiting for a slot - its future lives in the event loop of the waiting task """
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+        self.granted = False
+        self.cancelled = False
+
+
+class HostScheduler:
+    """
+    Admission control for one host, shared by all event loops of the process (the script runs and the
+    prefetch thread) - at most limit requests run at the same time, waiting requests are served by priority
+    (then first come first served).
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        # (priority, sequence, waiter)
+        self.waiting: list[tuple[int, int, Waiter]] = []
+
+    def can_start(self, priority: int) -> bool:
+        """ A free slot for priority - background requests leave INTERACTIVE_RESERVE slots free """
+        limit = self.limit if priority == INTERACTIVE else max(self.limit - INTERACTIVE_RESERVE, 1)
+        return self.active < limit
+
+    async def acquire(self, priority: int):
+        """ Wait for a slot """
+        with self.lock:
+            if not self.waiting and self.can_start(priority):
+                self.active += 1
+                return
+            waiter = Waiter(priority)
+            heapq.heappush(self.waiting, (priority, next(self.counter), waiter))
+            # Served at once when it is the most urgent request and a slot is free
+            self.wake()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self.lock:
+                granted = waiter.granted
+                waiter.cancelled = True
+            if granted:
+                # Granted a slot just before being cancelled - pass it on
+                self.release()
+            raise
+
+    def release(self):
+        """ Free a slot and start the waiting requests that may start now """
+        with self.lock:
+            self.active -= 1
+            self.wake()
+
+    def wake(self):
+        """ Grant free slots to the most urgent waiting requests (called with the lock held) """
+        while self.waiting:
+            priority, _, waiter = self.waiting[0]
+            if waiter.cancelled:
+                heapq.heappop(self.waiting)
+                continue
+            if not self.can_start(priority):
+                break
+            heapq.heappop(self.waiting)
+            try:
+                waiter.loop.call_soon_threadsafe(grant, waiter.future)
+            except RuntimeError:
+                continue  # loop of the waiter is closed
+            waiter.granted = True
+            self.active += 1
+
+
+def grant(future: asyncio.Future):
+    """ Wake a waiting request (runs in the loop of the waiter) """
+    if not future.done():
+        future.set_result(None)
+
+
+# Schedulers - {host: scheduler}, one per host for the whole process so all loops share the limits
+_schedulers: dict[str, HostScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(url: str) -> HostScheduler:
+    """ Return the scheduler for the host of url """
+    host = host_of(url)
+    with _schedulers_lock:
+        scheduler = _schedulers.get(host)
+        if scheduler is None:
+            scheduler = _schedulers[host] = HostScheduler(host_limit(host))
+        return scheduler
+
+
+@asynccontextmanager
+async def scheduled(url: str, priority: int | None = None):
+    """
+    Hold a request slot for the host of url for the duration of the block.
+    priority defaults to the priority of the current task (see request_priority).
+    """
+    scheduler = get_scheduler(url)
+    await scheduler.acquire(current_priority() if priority is None else priority)
+    try:
+        yield
+    finally:
+        scheduler.release()
@@ -1,5 +1,17 @@
 import httpx
 
+from backend.app.utilities.http_client import get_client
+from backend.app.utilities.request_scheduler import scheduled
+
+
+def cookie_header(cookies: dict[str, str] | None, headers: dict[str, str] | None = None) -> dict[str, str] | None:
+    """ Add cookies to request headers (pooled clients are shared, so cookies are never put in their jar) """
+    if not cookies:
+        return headers
+    headers = dict(headers or {})
+    headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in cookies.items())
+    return headers
+
 
 async def url_request(
     url: str = None,
@@ -10,8 +22,9 @@ async def url_request(
     client: httpx.AsyncClient | None = None,
 ) -> dict:
     """
-    Use client provided or create a new client and make an async HTTP request (GET or POST)
+    Use client provided or the pooled client for the url host and make an async HTTP request (GET or POST)
     and safely return content or an error message.
+    The request waits for a slot of the host in the request scheduler (priority of the calling task).
 
     :param url: The URL to request.
     :param cookies: Optional cookies dictionary.
@@ -21,26 +34,18 @@ async def url_request(
     :param client: Optional pre-configured httpx.AsyncClient.
     :return: {'response': content} or {'Error': message}.
     """
-    # Reuse existing client if provided, otherwise create a new one
-    owns_client = client is None
-
-    if owns_client:
-        client = httpx.AsyncClient(
-            verify=False,
-            cookies=cookies,
-            timeout=httpx.Timeout(60.0),
-        )
-
-    else:
-        # shared client → do NOT modify cookie jar if cookies is None
-        if cookies:
-            client.cookies.update(cookies)
+    # Reuse existing client if provided, otherwise use the pooled (keep-alive) client for the host
+    if client is None:
+        client = get_client(url)
+    # Cookies go with this request only - a shared client's cookie jar is never modified
+    headers = cookie_header(cookies, headers)
 
     try:
-        if method.upper() == "POST":
-            response = await client.post(url, data=payload, headers=headers, )
-        else:
-            response = await client.get(url, headers=headers, )
+        async with scheduled(url):
+            if method.upper() == "POST":
+                response = await client.post(url, data=payload, headers=headers, )
+            else:
+                response = await client.get(url, headers=headers, )
 
         response.raise_for_status()
         return {"response": response.content}
@@ -53,8 +58,3 @@ async def url_request(
             "Error": repr(e),
             "Type": type(e).__name__
         }
-
-    finally:
-        if owns_client:
-            await client.aclose()
-
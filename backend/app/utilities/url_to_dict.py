@@ -1,122 +1,296 @@
+import asyncio
 import httpx
 import xmltodict
-import io
-import gzip
 import zipfile
-import chardet
-import re
+import shutil
+import tempfile
+import zlib
 
-from backend.app.utilities.url_request import url_request
+from backend.app.utilities import file_cache
+from backend.app.utilities.url_request import cookie_header
+from backend.app.utilities.http_client import get_client, host_of
+from backend.app.utilities.request_scheduler import scheduled
+from backend.app.utilities.xml_records import iter_records
+from backend.app.utilities.parse_executor import run_in_pool
+from backend.app.utilities.xml_repair import parse_with_repair, record_repairs, record_repair_failure
 
 
-async def download_url(url: str, cookies: dict[str, str] | None = None,
-                       client: httpx.AsyncClient | None = None) -> bytes | dict:
-    """ Function to get the content of the specified URL """
-    try:
-        # Download the file
-        if client is not None:
-            response = await url_request(url, client=client)
+# Size of network chunks read from the response stream
+CHUNK_SIZE = 256 * 1024
+# Attempts to complete a (resumable) download before giving up
+DOWNLOAD_ATTEMPTS = 4
+# Decompressed xml is kept in memory up to this size and rolls over to a temp file on disk above it
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+
+class ChunkDecompressor:
+    """
+    Decompress gzip / zip / plain XML content chunk by chunk into a spooled temp file.
+    The format is sniffed from the magic bytes at the start of the stream.
+    """
+
+    def __init__(self):
+        self.output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        self.head = b''
+        self.kind = None
+        self.gzip = None
+        self.raw_zip = None
+
+    def _start(self):
+        """ Decide the content type from the first bytes of the stream """
+        if self.head[:2] == b"\x1f\x8b":
+            self.kind = 'gzip'
+            self.gzip = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        elif self.head[:4] == b"PK\x03\x04":
+            # The zip central directory is at the end of the archive - spool the raw archive first
+            self.kind = 'zip'
+            self.raw_zip = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
         else:
-            response = await url_request(url, cookies=cookies, )
-        return response['response']
+            self.kind = 'plain'
+        chunk, self.head = self.head, b''
+        self._write(chunk)
 
-    except Exception as e:
-        return {"error": str(e)}
+    def _write(self, chunk: bytes):
+        """ Write a chunk of the stream in its decompressed form """
+        if self.kind == 'gzip':
+            while chunk:
+                self.output.write(self.gzip.decompress(chunk))
+                # Concatenated gzip members - start a new decompressor for the rest of the chunk
+                chunk = self.gzip.unused_data
+                if chunk:
+                    self.output.write(self.gzip.flush())
+                    self.gzip = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        elif self.kind == 'zip':
+            self.raw_zip.write(chunk)
+        else:
+            self.output.write(chunk)
 
+    def feed(self, chunk: bytes):
+        """ Feed the next chunk of the downloaded stream """
+        if self.kind is None:
+            self.head += chunk
+            if len(self.head) < 4:
+                return
+            self._start()
+        else:
+            self._write(chunk)
 
-async def extract_xml_bytes(file_bytes: bytes) -> bytes:
+    def finish(self) -> tempfile.SpooledTemporaryFile:
+        """ Flush the decompressor and return the XML file positioned at its start """
+        if self.kind is None:
+            self._start()
+        if self.kind == 'gzip':
+            self.output.write(self.gzip.flush())
+        elif self.kind == 'zip':
+            self.raw_zip.seek(0)
+            with zipfile.ZipFile(self.raw_zip) as z:
+                # Pick the first XML file inside the ZIP
+                name = next((n for n in z.namelist() if n.lower().endswith(".xml")), None)
+                if name is None:
+                    raise ValueError("No XML file found inside ZIP archive")
+                with z.open(name) as member:
+                    shutil.copyfileobj(member, self.output, CHUNK_SIZE)
+            self.raw_zip.close()
+        self.output.seek(0)
+        return self.output
+
+
+def decompress_file(path) -> tempfile.SpooledTemporaryFile:
+    """ Decompress a local (cached) file chunk by chunk into a spooled temp file """
+    decompressor = ChunkDecompressor()
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            decompressor.feed(chunk)
+    return decompressor.finish()
+
+
+async def download_to_file(url: str, cookies: dict[str, str] | None = None,
+                           client: httpx.AsyncClient | None = None) -> dict:
     """
-    Detect whether file_bytes is gzip, zip, or plain XML,
-    and return the extracted XML bytes.
+    Download the specified URL (raw, still compressed) to a local file, so it can be parsed in another process.
+    Immutable chain files go to the file cache (resumable, see resumable_download), others to a temp file
+    the caller must delete.
+    Returns {'path': path, 'temporary': bool} or {'Error': message}.
     """
-    # If structured data / str
-    if isinstance(file_bytes, str):
-        # Detect encoding
-        detected = chardet.detect(file_bytes.encode())  # fallback
-        encoding = detected['encoding'] or 'utf-8'
-        print('encoding:', encoding)
-        file_bytes = file_bytes.encode(encoding)
-
-    # GZIP magic number
-    if file_bytes[:2] == b"\x1f\x8b":
-        return gzip.decompress(file_bytes)
-
-    # ZIP magic number
-    if file_bytes[:4] == b"PK\x03\x04":
-        with zipfile.ZipFile(io.BytesIO(file_bytes)) as z:
-            # Pick the first XML file inside the ZIP
-            for name in z.namelist():
-                if name.lower().endswith(".xml"):
-                    return z.read(name)
-            raise ValueError("No XML file found inside ZIP archive")
-
-    # Otherwise, assume it's already plain XML
-    return file_bytes
-
-
-def sanitize_xml(xml_bytes: bytes) -> str:
+    cached = file_cache.cached_file(url)
+    if cached is not None:
+        return {'path': cached, 'temporary': False}
+
+    if client is None:
+        client = get_client(url)
+    # Cookies go with this request only - a shared client's cookie jar is never modified
+    headers = cookie_header(cookies)
+
+    if file_cache.is_cacheable(url):
+        return await resumable_download(url, client, headers)
+
+    writer = file_cache.TempWriter()
+    try:
+        async with scheduled(url), client.stream("GET", url, headers=headers) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                writer.write(chunk)
+        writer.commit()
+        return {'path': writer.path, 'temporary': True}
+
+    except httpx.HTTPStatusError as e:
+        writer.abort()
+        return {"Error": f"HTTP error: {e.response.status_code}"}
+    except httpx.RequestError as e:
+        writer.abort()
+        return {"Error": repr(e), "Type": type(e).__name__}
+
+
+def expected_total_size(response: httpx.Response, offset: int) -> int | None:
+    """ Full size of the file from Content-Range (206) or Content-Length (200) headers """
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range and not content_range.endswith('/*'):
+        return int(content_range.rsplit('/', 1)[1])
+    length = response.headers.get('Content-Length')
+    if length is not None:
+        return int(length) + (offset if response.status_code == 206 else 0)
+    return None
+
+
+async def resumable_download(url: str, client: httpx.AsyncClient, headers: dict[str, str] | None = None) -> dict:
     """
-    Sanitize malformed XML content before parsing.
-    Fixes:
-      - spaces in closing/opening tags
-      - stray ampersands (&)
-      - text beyond </Root>
-      - UTF BOMs
+    Download url into a partial file in the cache, resuming with HTTP Range requests when the
+    connection drops mid transfer. The file is verified (size, gzip CRC) before it is moved into the cache.
+    Returns {'path': path, 'temporary': False} or {'Error': message}.
     """
-    # Detect encoding
-    detected = chardet.detect(xml_bytes)
-    encoding = detected.get('encoding', 'utf-8')
-    text = xml_bytes.decode(encoding, errors='ignore')
+    partial = file_cache.PartialFile(url)
+    # Another session downloads the same file - wait for it
+    while not partial.try_lock():
+        await asyncio.sleep(0.5)
 
-    # Remove BOM if present
-    text = text.replace("\ufeff", "")
+    try:
+        # Finished meanwhile by the other downloader
+        cached = file_cache.cached_file(url)
+        if cached is not None:
+            return {'path': cached, 'temporary': False}
 
-    # Fix invalid tag spacing
-    text = re.sub(r'<(\w+)\s+>', r'<\1>', text)
-    text = re.sub(r'</(\w+)\s+>', r'</\1>', text)
+        error = None
+        for attempt in range(DOWNLOAD_ATTEMPTS):
+            offset = partial.size()
+            # Identity encoding, so byte offsets refer to the file itself
+            request_headers = {**(headers or {}), 'Accept-Encoding': 'identity'}
+            if offset:
+                request_headers['Range'] = f'bytes={offset}-'
+            expected_size = None
+            try:
+                async with scheduled(url), client.stream("GET", url, headers=request_headers) as response:
+                    if response.status_code == 416:
+                        # Range not satisfiable - the partial file is already complete (or broken, see verify)
+                        expected_size = offset
+                    else:
+                        response.raise_for_status()
+                        # 206 - server resumes from offset, 200 - server ignored the range, start over
+                        append = response.status_code == 206
+                        expected_size = expected_total_size(response, offset)
+                        with partial.open(append=append) as f:
+                            # Chunks as received - everything that arrived before a drop is kept
+                            async for chunk in response.aiter_raw():
+                                f.write(chunk)
 
-    # Escape stray ampersands
-    text = re.sub(r'&(?!amp;|lt;|gt;|quot;|apos;)', '&amp;', text)
+            except httpx.HTTPStatusError as e:
+                return {"Error": f"HTTP error: {e.response.status_code}"}
+            except httpx.TransportError as e:
+                # Dropped mid transfer - keep what we have and resume
+                error = {"Error": repr(e), "Type": type(e).__name__}
+                await asyncio.sleep(min(2 ** attempt, 10))
+                continue
 
-    # Truncate anything after </Root>
-    match = re.search(r'</Root>', text)
-    if match:
-        text = text[:match.end()]
+            if await asyncio.to_thread(file_cache.verify_file, partial.part_path, expected_size):
+                partial.commit()
+                return {'path': partial.path, 'temporary': False}
 
-    return text
+            # Corrupt or incomplete - download from scratch
+            partial.discard()
+            error = {"Error": f"Integrity check failed for {url}"}
 
+        return error or {"Error": f"Download of {url} failed"}
 
-async def fix_missing_subchain(xml_bytes: bytes) -> bytes:
+    finally:
+        partial.unlock()
+
+
+def parse_file_records(path: str, kind: str = 'items') -> dict:
     """
-    Insert missing </SubChain> before </SubChains> if it's missing.
-    Returns bytes ready for xmltodict or ET parsing.
+    Decompress and parse the local file at path into records.
+    The bytes are parsed as they are - repair passes run only if that fails.
+    CPU bound - runs in the parse process pool (see parse_executor).
+    Returns {'records': [...], 'repairs': [names of repairs applied]}.
     """
-    # Decode bytes (detect UTF BOM or fallback to utf-8)
-    xml_text = xml_bytes.decode('utf-8-sig')  # removes BOM if present
+    with decompress_file(path) as xml_file:
+        try:
+            return {'records': list(iter_records(xml_file, kind=kind)), 'repairs': []}
+        except Exception as e:
+            xml_file.seek(0)
+            records, repairs = parse_with_repair(
+                xml_file.read(),
+                parse=lambda b: list(iter_records(b, kind=kind)),
+                recover_parse=lambda b: list(iter_records(b, kind=kind, recover=True)),
+                first_error=e,
+            )
+            return {'records': records, 'repairs': repairs}
 
-    # Check if </SubChain> exists before </SubChains>
-    if '</SubChain>' not in xml_text.split('</SubChains>')[0]:
-        # Insert the missing closing tag
-        xml_text = xml_text.replace('</SubChains>', '</SubChain></SubChains>')
 
-    # Return as bytes
-    return xml_text.encode('utf-8')
+def parse_file_dict(path: str) -> dict:
+    """
+    Decompress and parse the local file at path into an xmltodict tree (store files).
+    The file is parsed as it is - its bytes are read into memory only for the repair passes.
+    CPU bound - runs in the parse process pool (see parse_executor).
+    Returns {'result': tree, 'repairs': [names of repairs applied]}.
+    """
+    with decompress_file(path) as xml_file:
+        try:
+            return {'result': xmltodict.parse(xml_file), 'repairs': []}
+        except Exception as e:
+            xml_file.seek(0)
+            result, repairs = parse_with_repair(xml_file.read(), parse=xmltodict.parse, first_error=e)
+            return {'result': result, 'repairs': repairs}
 
 
 async def data_dict(url: str, cookies: dict[str, str] | None = None,
-                    client: httpx.AsyncClient | None = None) -> dict:
-    """ Function to extract data to dict from the specified URL file"""
-    if client is not None:
-        downloaded_content = await download_url(url=url, client=client)
-    else:
-        downloaded_content = await download_url(url=url, cookies=cookies, )
-    xml_bytes = await extract_xml_bytes(downloaded_content)
+                    client: httpx.AsyncClient | None = None, chain: str | None = None) -> dict:
+    """
+    Function to extract data to dict from the specified URL file.
+    The download runs on the event loop, decompression and parsing run in the parse process pool.
+    """
+    downloaded = await download_to_file(url=url, cookies=cookies, client=client)
+    if 'Error' in downloaded:
+        raise RuntimeError(f"Download of {url} failed: {downloaded.get('Error')}")
 
-    if 'hazihinam' in url.lower():
-        xml_bytes = await fix_missing_subchain(xml_bytes)
+    try:
+        parsed = await run_in_pool(parse_file_dict, str(downloaded['path']))
+    except Exception as e:
+        record_repair_failure(chain or host_of(url), url, e)
+        raise
+    finally:
+        if downloaded['temporary']:
+            downloaded['path'].unlink(missing_ok=True)
+    record_repairs(chain or host_of(url), parsed['repairs'])
+    return parsed['result']
+
+
+async def data_records(url: str, kind: str = 'items', cookies: dict[str, str] | None = None,
+                       client: httpx.AsyncClient | None = None, chain: str | None = None) -> list[dict]:
+    """
+    Function to extract the list of records (items, promotions or stores) from the specified URL file.
+    Records are parsed one at a time instead of building the full xmltodict tree of the document.
+    The download runs on the event loop, decompression and parsing run in the parse process pool.
+    """
+    downloaded = await download_to_file(url=url, cookies=cookies, client=client)
+    if 'Error' in downloaded:
+        raise RuntimeError(f"Download of {url} failed: {downloaded.get('Error')}")
 
     try:
-        return xmltodict.parse(xml_bytes)
+        parsed = await run_in_pool(parse_file_records, str(downloaded['path']), kind=kind)
+        record_repairs(chain or host_of(url), parsed['repairs'])
+        return parsed['records']
     except Exception as e:
-        print("XML parsing failed:", e)
+        record_repair_failure(chain or host_of(url), url, e)
         raise
+    finally:
+        if downloaded['temporary']:
+            downloaded['path'].unlink(missing_ok=True)
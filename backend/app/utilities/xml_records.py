@@ -0,0 +1,100 @@
+from io import BytesIO
+from typing import IO, Iterator
+
+from lxml import etree
+
+
+# Record element and the container it must sit in, per record kind (tag names compared in lower case)
+#   items      - Root/Items/Item, root/Items/Item
+#   promotions - Root/Promotions/Promotion
+#   stores     - Root/SubChains/SubChain/Stores/Store, asx:abap/asx:values/STORES/STORE, Store/Branches/Branch
+RECORD_PATHS = {
+    'items': {('items', 'item')},
+    'promotions': {('promotions', 'promotion')},
+    'stores': {('stores', 'store'), ('branches', 'branch')},
+}
+
+
+def local_name(tag) -> str:
+    """ Return tag name without namespace / prefix """
+    if not isinstance(tag, str):
+        return ''
+    return tag.rsplit('}', 1)[-1]
+
+
+def element_to_dict(elem) -> dict | str | None:
+    """
+    Convert an element to the same structure xmltodict would build for it:
+    leaf → text (None if empty), repeated children → list, attributes → '@name', mixed text → '#text'.
+    """
+    if not len(elem) and not elem.attrib:
+        text = elem.text.strip() if elem.text else ''
+        return text or None
+
+    result = {f'@{local_name(k)}': v for k, v in elem.attrib.items()}
+    for child in elem:
+        tag = child.tag
+        if not isinstance(tag, str):
+            continue
+        name = local_name(tag) if '}' in tag else tag
+        # Fast path for the plain leaf fields that make up most of a record
+        if not len(child) and not child.attrib:
+            text = child.text
+            value = (text.strip() or None) if text else None
+        else:
+            value = element_to_dict(child)
+        if name in result:
+            if not isinstance(result[name], list):
+                result[name] = [result[name]]
+            result[name].append(value)
+        else:
+            result[name] = value
+
+    text = elem.text.strip() if elem.text else ''
+    if text:
+        result['#text'] = text
+    return result
+
+
+def tag_variants(tags: set[str]) -> list[str]:
+    """ All spellings of the record tags seen in chain files, in any namespace """
+    variants = set()
+    for tag in tags:
+        for spelling in (tag, tag.capitalize(), tag.upper()):
+            variants.add(f'{{*}}{spelling}')
+    return sorted(variants)
+
+
+def iter_records(source: bytes | IO[bytes], kind: str = 'items', recover: bool = False) -> Iterator[dict]:
+    """
+    Incrementally parse an XML document and yield one record dict at a time
+    (items, promotions or stores - see RECORD_PATHS).
+    Parsed records are cleared from the tree right after they are yielded, so memory stays flat
+    no matter how big the file is.
+    """
+    paths = RECORD_PATHS[kind]
+    record_tags = {tag for _, tag in paths}
+
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+
+    # Only record elements are reported by the parser - their fields are read from the element itself
+    context = etree.iterparse(source, events=('end',), tag=tag_variants(record_tags), recover=recover,
+                              huge_tree=True, remove_comments=True, remove_pis=True)
+    for _, elem in context:
+        tag = local_name(elem.tag).lower()
+        if tag not in record_tags:
+            continue
+        parent = elem.getparent()
+        if parent is None or (local_name(parent.tag).lower(), tag) not in paths:
+            # e.g. PromotionItems/Item inside a promotion - part of the enclosing record
+            continue
+
+        yield element_to_dict(elem)
+
+        # Free the record and the already processed siblings before it
+        elem.clear()
+        while elem.getprevious() is not None:
+            del parent[0]
+
+    del context
@@ -0,0 +1,154 @@
+import codecs
+import re
+from collections import Counter, defaultdict
+
+import chardet
+
+
+# Size of the sample used for encoding detection when the file has no BOM or encoding declaration
+SAMPLE_SIZE = 64 * 1024
+
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+PROLOG_ENCODING = re.compile(rb'^\s*<\?xml[^>]*encoding=["\']([A-Za-z0-9._-]+)["\']')
+
+# Repairs applied per chain - {chain: Counter({repair name: count})}
+REPAIR_STATS: dict[str, Counter] = defaultdict(Counter)
+
+
+def detect_encoding(xml_bytes: bytes) -> str:
+    """
+    Detect the encoding of an XML document in tiers:
+    BOM → encoding declared in the XML prolog → valid utf-8 sample → chardet over a small sample only.
+    """
+    for bom, encoding in BOMS:
+        if xml_bytes.startswith(bom):
+            return encoding
+
+    match = PROLOG_ENCODING.match(xml_bytes[:1024])
+    if match:
+        encoding = match.group(1).decode('ascii')
+        try:
+            return codecs.lookup(encoding).name
+        except LookupError:
+            pass  # unknown declared encoding - detect from content
+
+    sample = xml_bytes[:SAMPLE_SIZE]
+    try:
+        # errors at the end of the sample may be a multi byte character cut in the middle
+        sample.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        if e.start >= len(sample) - 3:
+            return 'utf-8'
+
+    return chardet.detect(sample).get('encoding') or 'utf-8'
+
+
+def decode_xml(xml_bytes: bytes) -> str:
+    """ Decode document bytes to text (without BOM) using the detected encoding """
+    try:
+        text = xml_bytes.decode(detect_encoding(xml_bytes))
+    except (UnicodeDecodeError, LookupError):
+        # Wrong declared encoding - fall back to detection from a sample of the content
+        encoding = chardet.detect(xml_bytes[:SAMPLE_SIZE]).get('encoding') or 'utf-8'
+        text = xml_bytes.decode(encoding, errors='ignore')
+    return text.replace('\ufeff', '')
+
+
+##### Repair passes - each takes and returns the document text
+def repair_encoding(text: str) -> str:
+    """ Re-declare the document as utf-8 (the text is re-encoded as utf-8 before parsing) """
+    return re.sub(r'^\s*<\?xml[^>]*\?>', '<?xml version="1.0" encoding="utf-8"?>', text, count=1)
+
+
+def repair_tag_spacing(text: str) -> str:
+    """ Fix invalid spaces before the end of opening / closing tags - <Item > and </Item > """
+    text = re.sub(r'<(\w+)\s+>', r'<\1>', text)
+    return re.sub(r'</(\w+)\s+>', r'</\1>', text)
+
+
+def repair_ampersands(text: str) -> str:
+    """ Escape stray ampersands """
+    return re.sub(r'&(?!amp;|lt;|gt;|quot;|apos;|#\d+;|#x[0-9a-fA-F]+;)', '&amp;', text)
+
+
+def repair_trailing_text(text: str) -> str:
+    """ Truncate anything after the closing root tag """
+    match = re.search(r'</(Root|root)>', text)
+    return text[:match.end()] if match else text
+
+
+def repair_missing_subchain(text: str) -> str:
+    """ Insert missing </SubChain> before </SubChains> (hazihinam stores files) """
+    head, sep, _ = text.partition('</SubChains>')
+    if sep and '</SubChain>' not in head:
+        return text.replace('</SubChains>', '</SubChain></SubChains>')
+    return text
+
+
+# Applied cumulatively, in this order, until the document parses
+REPAIRS = (
+    ('encoding', repair_encoding),
+    ('tag_spacing', repair_tag_spacing),
+    ('ampersands', repair_ampersands),
+    ('trailing_text', repair_trailing_text),
+    ('missing_subchain', repair_missing_subchain),
+)
+
+
+def parse_with_repair(xml_bytes: bytes, parse, recover_parse=None, first_error: Exception | None = None):
+    """
+    Parse xml_bytes with parse(bytes). Repair passes run only if parsing fails - one at a time, each on top of
+    the previous ones - until the document parses.
+    Returns (parse result, list of repairs applied). Re-raises the original error if no repair helps.
+    recover_parse - optional lenient parser, tried last on the fully repaired document
+    first_error - error of a parse already attempted by the caller (skips the first parse)
+    """
+    if first_error is None:
+        try:
+            return parse(xml_bytes), []
+        except Exception as e:
+            first_error = e
+
+    text = decode_xml(xml_bytes)
+    applied = []
+    for name, repair in REPAIRS:
+        repaired = repair(text)
+        if repaired == text and name != 'encoding':
+            continue  # nothing to fix for this pass
+        text = repaired
+        applied.append(name)
+        try:
+            return parse(text.encode('utf-8')), reported(applied)
+        except Exception:
+            continue
+
+    if recover_parse is not None:
+        try:
+            return recover_parse(text.encode('utf-8')), reported(applied + ['recover'])
+        except Exception:
+            pass
+
+    raise first_error
+
+
+def reported(applied: list[str]) -> list[str]:
+    """ Re-encoding is a prerequisite of the other passes - report it only when it was the fix by itself """
+    return applied if applied == ['encoding'] else [name for name in applied if name != 'encoding']
+
+
+def record_repairs(chain: str | None, applied: list[str]):
+    """ Count repairs applied to a chain file """
+    if not applied:
+        return
+    REPAIR_STATS[chain or 'unknown'].update(applied)
+
+
+def record_repair_failure(chain: str | None, url: str, error: Exception):
+    """ Count and report a chain file that could not be parsed, even with all repairs """
+    REPAIR_STATS[chain or 'unknown']['failed'] += 1
+    print(f"XML parsing failed for {chain or 'unknown'} ({url}): {error!r}")
@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+import pytest
+
+# Tests run without secrets, network or background work: embedded database and caches in a temp folder,
+# price tables only where a test enables them,
+# no prefetch thread, parsing on the event loop
+_tmp = tempfile.mkdtemp(prefix='xollify-tests-')
+os.environ.setdefault('XOLLIFY_DATABASE_URL', f'sqlite+aiosqlite:///{_tmp}/xollify.db')
+os.environ.setdefault('XOLLIFY_CACHE_DIR', _tmp)
+os.environ.setdefault('XOLLIFY_PREFETCH', '0')
+os.environ.setdefault('XOLLIFY_PARSE_WORKERS', '0')
+os.environ.setdefault('XOLLIFY_PRICE_DB', '0')
+
+# Imported after the environment is set up
+from backend.app.db import connection  # noqa: E402
+from backend.app.services import db_service, history_service, snapshot_service  # noqa: E402
+
+
+@pytest.fixture
+def price_db(tmp_path, monkeypatch):
+    """ Price tables in an empty SQLite database, snapshots in tmp_path """
+    url = f'sqlite+aiosqlite:///{tmp_path}/prices.db'
+    monkeypatch.setattr(connection, 'get_engine', lambda database_url=url: connection.get_factory(database_url)[0])
+    monkeypatch.setattr(connection, 'get_sessionmaker',
+                        lambda database_url=url: connection.get_factory(database_url)[1])
+    for module in ('create_db', 'sqlite_db'):
+        monkeypatch.setattr(f'backend.app.db.{module}.get_engine', connection.get_engine)
+    monkeypatch.setattr(snapshot_service, 'SNAPSHOT_DIR', tmp_path / 'snapshots')
+    monkeypatch.setattr(db_service, 'PRICE_DB_ENABLED', True)
+    monkeypatch.setattr(history_service, 'PRICE_DB_ENABLED', True)
@@ -0,0 +1,27 @@
+import asyncio
+
+from backend.app.core.binaprojects import KingStore
+
+BASE = 'https://kingstore.binaprojects.com/'
+
+
+def row(file_type: str, stamp: str = '202510160600') -> dict:
+    return {'FileNm': f'{file_type}{KingStore.chain_code}-001-{stamp}.gz', 'DateFile': '06:00 16/10/2025'}
+
+
+def test_prices_skips_type_whose_lookup_failed(monkeypatch, capsys):
+    async def get_file(file_type=0, store=0, file_date=None, client=None):
+        if file_type == 0:
+            return {'response': [row('Price'), row('Promo')]}
+        if file_type == 4:
+            return {'response': [row('PriceFull', '202510150600')]}
+        return {'Error': 'No files found in the last 14 days.'}
+
+    monkeypatch.setattr(KingStore, 'get_file', get_file)
+
+    result = asyncio.run(KingStore.prices('001'))
+
+    assert result == {'prices': f'{BASE}Download/{row("Price")["FileNm"]}',
+                      'promo': f'{BASE}Download/{row("Promo")["FileNm"]}',
+                      'pricefull': f'{BASE}Download/{row("PriceFull", "202510150600")["FileNm"]}'}
+    assert 'promofull files for kingstore store 001' in capsys.readouterr().out
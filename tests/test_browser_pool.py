@@ -0,0 +1,23 @@
+import asyncio
+import threading
+
+from backend.app.utilities import browser_pool
+from backend.app.utilities.browser_pool import run_in_browser
+
+
+async def where(pool, value):
+    """ Runs on the browser loop - no browser is launched """
+    return pool, threading.current_thread().name, value
+
+
+def test_pool_is_shared_by_all_loops_and_closed():
+    first = asyncio.run(run_in_browser(where, 1))
+    second = asyncio.run(run_in_browser(where, 2))
+
+    assert first[0] is second[0]
+    assert first[1] == second[1] == 'xollify-browser'
+    assert (first[2], second[2]) == (1, 2)
+
+    thread = browser_pool._thread
+    browser_pool.close_browser_pool()
+    assert not thread.is_alive()
@@ -0,0 +1,36 @@
+import asyncio
+
+from sqlalchemy import text
+
+from backend.app.db import connection
+from backend.app.services.async_runner import close_loop_resources
+
+
+def test_sessions_of_a_loop_reuse_pooled_connections():
+    async def run():
+        engine = connection.get_engine()
+        drivers = []
+        for _ in range(2):
+            async with connection.get_sessionmaker()() as session:
+                assert (await session.execute(text('SELECT 1'))).scalar() == 1
+                raw = await (await session.connection()).get_raw_connection()
+                drivers.append(raw.driver_connection)
+        checked_in = engine.pool.checkedin()
+        await close_loop_resources()
+        return drivers, checked_in
+
+    drivers, checked_in = asyncio.run(run())
+    assert drivers[0] is drivers[1]
+    assert checked_in == 1
+
+
+def test_engine_is_disposed_with_its_loop():
+    async def run():
+        async with connection.get_sessionmaker()() as session:
+            await session.execute(text('SELECT 1'))
+        loop = asyncio.get_running_loop()
+        assert loop in connection._engines
+        await close_loop_resources()
+        return loop in connection._engines
+
+    assert not asyncio.run(run())
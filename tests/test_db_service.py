@@ -0,0 +1,22 @@
+import asyncio
+
+import backend.app.bootstrap  # noqa: F401 - registers the chains
+from backend.app.services import db_service
+
+
+def test_update_stores_db_limits_concurrent_chains(monkeypatch):
+    running, peak = 0, 0
+
+    async def update_chain_stores_db(chain):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {chain.alias: 'ok'}
+
+    monkeypatch.setattr(db_service, 'update_chain_stores_db', update_chain_stores_db)
+    results = asyncio.run(db_service.update_stores_db())
+
+    assert len(results) == len(db_service.SupermarketChain.registry) > db_service.CHAIN_CONCURRENCY
+    assert peak == db_service.CHAIN_CONCURRENCY
@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+
+from backend.app.utilities import file_cache
+from backend.app.utilities.file_cache import cache_path, evict, is_cacheable, normalize_url
+
+
+def test_normalize_url_drops_volatile_params():
+    signed = 'https://Blob.Example.com/prices/PriceFull7290027600007-001-202510160600.gz?sv=2020&sig=abc&se=1'
+    other = 'https://blob.example.com/prices/PriceFull7290027600007-001-202510160600.gz?sig=def&sv=2021'
+    assert normalize_url(signed) == normalize_url(other) == \
+        'https://blob.example.com/prices/PriceFull7290027600007-001-202510160600.gz'
+
+
+def test_normalize_url_keeps_identifying_params_sorted():
+    assert normalize_url('https://x.com/d?store=2&file=a&_=123') == 'https://x.com/d?file=a&store=2'
+    assert normalize_url('https://x.com/d?file=a') != normalize_url('https://x.com/d?file=b')
+
+
+def test_normalize_url_unifies_backslashes():
+    assert normalize_url('https://x.com/a\\b.gz') == normalize_url('https://x.com/a/b.gz')
+
+
+@pytest.mark.parametrize('url, cacheable', [
+    ('https://x.com/PriceFull7290027600007-001-202510160600.gz', True),
+    ('https://x.com/20251016/Price7290027600007-001.gz', True),
+    ('https://x.com/Download?file=PriceFull7290027600007-001-202510160600.gz', False),
+    ('https://x.com/stores.xml', False),
+    ('', False),
+])
+def test_is_cacheable_needs_timestamp_in_path(url, cacheable):
+    assert is_cacheable(url) is cacheable
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_cache, 'CACHE_DIR', tmp_path)
+    return tmp_path
+
+
+def cached(url: str, size: int, age: float):
+    path = cache_path(url)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'x' * size)
+    os.utime(path, (time.time() - age, time.time() - age))
+    return path
+
+
+def test_evict_deletes_least_recently_used(cache_dir):
+    old = cached('https://x.com/a-20251016.gz', 100, age=30)
+    used = cached('https://x.com/b-20251016.gz', 100, age=20)
+    new = cached('https://x.com/c-20251016.gz', 100, age=10)
+    # Reading marks the file as recently used
+    assert file_cache.cached_file('https://x.com/b-20251016.gz') == used
+
+    evict(max_bytes=200)
+
+    assert not old.exists() and used.exists() and new.exists()
+
+
+def test_evict_removes_abandoned_partial_downloads(cache_dir):
+    path = cached('https://x.com/a-20251016.gz', 10, age=0)
+    fresh = path.with_name(f'{path.name}.part')
+    fresh.write_bytes(b'x')
+    stale = path.with_name('other.part')
+    stale.write_bytes(b'x')
+    old = time.time() - file_cache.PARTIAL_MAX_AGE - 1
+    os.utime(stale, (old, old))
+
+    evict(max_bytes=1000)
+
+    assert path.exists() and fresh.exists() and not stale.exists()
@@ -0,0 +1,96 @@
+from datetime import datetime, date
+
+import pytest
+
+from backend.app.utilities.file_index import FileIndex, parse_file_url
+
+
+CHAIN = '7290058140886'
+
+
+@pytest.mark.parametrize('url, expected', [
+    (f'https://x/file/d/PriceFull{CHAIN}-001-202510160600.gz', ('PriceFull', CHAIN, 1, datetime(2025, 10, 16, 6))),
+    ('https://x/Price7290492000005-000-123-20251016-060000.gz',
+     ('Price', '7290492000005', 123, datetime(2025, 10, 16, 6))),
+    (f'https://x/Promo{CHAIN}_015_20251016_0930.xml', ('Promo', CHAIN, 15, datetime(2025, 10, 16, 9, 30))),
+    (f'https://x/Stores{CHAIN}-202510160500.xml', ('Stores', CHAIN, None, datetime(2025, 10, 16, 5))),
+    (f'https://x/StoresFull{CHAIN}-000-202510160500.xml', ('Stores', CHAIN, None, datetime(2025, 10, 16, 5))),
+    (f'https://blob/PromoFull{CHAIN}-001-202510160600.gz?sv=2020&sig=abc',
+     ('PromoFull', CHAIN, 1, datetime(2025, 10, 16, 6))),
+])
+def test_parse_file_url(url, expected):
+    record = parse_file_url(url)
+    assert (record.file_type, record.chain_code, record.store_code, record.timestamp) == expected
+    assert record.url == url
+
+
+@pytest.mark.parametrize('url', [
+    'https://x/readme.txt',
+    f'https://x/PriceFull{CHAIN}-001.gz',
+    f'https://x/PriceFull{CHAIN}-001-202513400600.gz',
+    'https://x/PriceFull123-001-202510160600.gz',
+])
+def test_parse_file_url_rejects_other_names(url):
+    assert parse_file_url(url) is None
+
+
+def url(file_type: str, store: str, stamp: str, chain: str = CHAIN) -> str:
+    return f'https://x/{file_type}{chain}-{store}-{stamp}.gz'
+
+
+LISTING = [
+    url('PriceFull', '001', '202510150600'),
+    url('PriceFull', '001', '202510160600'),
+    url('Price', '001', '202510160700'),
+    url('Price', '001', '202510160800'),
+    url('Price', '002', '202510160800'),
+    url('PromoFull', '002', '202510140600'),
+    f'https://x/Stores{CHAIN}-202510150500.xml',
+    f'https://x/Stores{CHAIN}-202510160500.xml',
+]
+
+
+@pytest.fixture
+def index():
+    return FileIndex.from_urls(LISTING, cookies={'sid': '1'})
+
+
+def test_latest_for_store(index):
+    assert index.latest_for_store('001') == {
+        'PriceFull': url('PriceFull', '001', '202510160600'),
+        'PromoFull': None,
+        'Price': url('Price', '001', '202510160800'),
+        'Promo': None,
+    }
+    assert index.latest_file(2, 'PromoFull').timestamp == datetime(2025, 10, 14, 6)
+    assert index.cookies == {'sid': '1'}
+
+
+def test_latest_stores_url(index):
+    assert index.latest_stores_url() == f'https://x/Stores{CHAIN}-202510160500.xml'
+
+
+def test_stores_on(index):
+    assert index.stores_on(date(2025, 10, 16)) == {1, 2}
+    assert index.stores_on(date(2025, 10, 14)) == {2}
+
+
+def test_newer_than(index):
+    newer = index.newer_than(datetime(2025, 10, 16, 7))
+    assert [r.timestamp for r in newer] == [datetime(2025, 10, 16, 8)] * 2
+
+
+def test_files_since(index):
+    files = index.files_since('001', 'Price', datetime(2025, 10, 16, 6))
+    assert [r.url for r in files] == [url('Price', '001', '202510160700'), url('Price', '001', '202510160800')]
+    assert index.files_since('001', 'Price', datetime(2025, 10, 16, 8)) == []
+
+
+def test_files_since_before_the_listing(index):
+    assert index.files_since('001', 'Price', datetime(2025, 10, 1)) is None
+
+
+def test_other_chains_are_skipped():
+    index = FileIndex.from_urls([*LISTING, url('PriceFull', '001', '202510170600', chain='7290492000005')],
+                                chain_code=CHAIN)
+    assert len(index) == len(LISTING)
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from backend.app.pipeline import fresh_price_promo
+from backend.app.pipeline.fresh_price_promo import delta_store_records, merge_records
+from backend.app.services import snapshot_service
+from backend.app.utilities.file_index import parse_file_url
+
+
+CHAIN = '7290058140886'
+BASE = 'https://example.com/file/d/'
+
+
+def url(file_type: str, stamp: str) -> str:
+    return f'{BASE}{file_type}{CHAIN}-001-{stamp}.gz'
+
+
+class FakeChain:
+    """ Chain listing the given files of store 1 """
+    chain_code = CHAIN
+    alias = 'fake'
+
+    def __init__(self, listed: list[str] | None):
+        self.listed = listed
+
+    async def files_since(self, store_code, file_type, since):
+        if self.listed is None:
+            return None
+        records = [parse_file_url(u) for u in self.listed]
+        return [r for r in records if r.file_type == file_type and r.timestamp > since]
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    """ Records of the fake files by url - data_records() answers from it """
+    monkeypatch.setattr(snapshot_service, 'SNAPSHOT_DIR', tmp_path)
+    content = {}
+    downloaded = []
+
+    async def data_records(url, kind='items', cookies=None, client=None, chain=None):
+        downloaded.append(url)
+        return content[url]
+
+    monkeypatch.setattr(fresh_price_promo, 'data_records', data_records)
+    return content, downloaded
+
+
+def item(code: str, price: str) -> dict:
+    return {'ItemCode': code, 'ItemPrice': price}
+
+
+def prices(records: list[dict]) -> dict:
+    return {r['ItemCode']: r['ItemPrice'] for r in records}
+
+
+def test_merge_records_replaces_and_adds():
+    merged = merge_records([item('1', '1.00'), item('2', '2.00')], [item('2', '2.50'), item('3', '3.00')],
+                           'ItemCode')
+    assert prices(merged) == {'1': '1.00', '2': '2.50', '3': '3.00'}
+
+
+def test_merge_records_keeps_baseline_order():
+    merged = merge_records([item('1', '1'), item('2', '2')], [item('1', '9')], 'ItemCode')
+    assert [r['ItemCode'] for r in merged] == ['1', '2']
+
+
+def test_applies_every_delta_in_order(files):
+    content, downloaded = files
+    full = url('PriceFull', '202510160600')
+    deltas = [url('Price', '202510160700'), url('Price', '202510160800'), url('Price', '202510160900')]
+    content[full] = [item('1', '1.00'), item('2', '2.00'), item('3', '3.00')]
+    content[deltas[0]] = [item('1', '1.10')]
+    content[deltas[1]] = [item('2', '2.20'), item('1', '1.20')]
+    content[deltas[2]] = [item('4', '4.00')]
+    chain = FakeChain([full, *deltas])
+
+    records = asyncio.run(delta_store_records(chain, '001', 'items', {'pricefull': full, 'price': deltas[-1]}))
+
+    assert prices(records) == {'1': '1.20', '2': '2.20', '3': '3.00', '4': '4.00'}
+    assert downloaded == [full, *deltas]
+
+
+def test_only_new_deltas_are_applied_on_the_snapshot(files):
+    content, downloaded = files
+    full = url('PriceFull', '202510160600')
+    first, second = url('Price', '202510160700'), url('Price', '202510160800')
+    content[full] = [item('1', '1.00')]
+    content[first] = [item('1', '1.10')]
+    content[second] = [item('2', '2.00')]
+
+    asyncio.run(delta_store_records(FakeChain([full, first]), '001', 'items', {'pricefull': full, 'price': first}))
+    downloaded.clear()
+    records = asyncio.run(delta_store_records(FakeChain([full, first, second]), '001', 'items',
+                                              {'pricefull': full, 'price': second}))
+
+    assert prices(records) == {'1': '1.10', '2': '2.00'}
+    assert downloaded == [second]
+
+
+def test_newer_full_file_replaces_the_baseline(files):
+    content, downloaded = files
+    old_full, delta = url('PriceFull', '202510150600'), url('Price', '202510150700')
+    new_full = url('PriceFull', '202510160600')
+    content[old_full] = [item('1', '1.00'), item('2', '2.00')]
+    content[delta] = [item('1', '1.10')]
+    content[new_full] = [item('1', '1.50')]
+
+    asyncio.run(delta_store_records(FakeChain([old_full, delta]), '001', 'items',
+                                    {'pricefull': old_full, 'price': delta}))
+    records = asyncio.run(delta_store_records(FakeChain([old_full, delta, new_full]), '001', 'items',
+                                              {'pricefull': new_full, 'price': delta}))
+
+    assert prices(records) == {'1': '1.50'}
+
+
+def test_full_file_when_deltas_cannot_be_listed(files):
+    content, downloaded = files
+    full, delta = url('PriceFull', '202510160600'), url('Price', '202510160900')
+    content[full] = [item('1', '1.00')]
+    content[delta] = [item('1', '1.10')]
+
+    records = asyncio.run(delta_store_records(FakeChain(None), '001', 'items', {'pricefull': full, 'price': delta}))
+
+    assert prices(records) == {'1': '1.00'}
+    assert delta not in downloaded
+
+
+def test_records_are_returned_without_waiting_for_ingestion(files, monkeypatch):
+    content, downloaded = files
+    full = url('PriceFull', '202510160600')
+    content[full] = [item('1', '1.00')]
+    submitted = []
+    monkeypatch.setattr(fresh_price_promo, 'submit_ingest', lambda *args: submitted.append(args))
+
+    records = asyncio.run(delta_store_records(FakeChain([full]), '001', 'items', {'pricefull': full}))
+
+    assert submitted == [(CHAIN, '001', 'items', '20251016060000', records)]
@@ -0,0 +1,64 @@
+import asyncio
+
+import pyarrow as pa
+from sqlalchemy import select
+
+from backend.app.db import connection
+from backend.app.db.create_db import create_db
+from backend.app.db.models import PriceHistory
+from backend.app.services.history_service import price_changes, record_price_history
+
+CHAIN = '7290027600007'
+
+
+def table(prices: dict) -> pa.Table:
+    return pa.table({'ItemCode': pa.array(list(prices), pa.string()),
+                     'ItemPrice': pa.array(list(prices.values()), pa.string())})
+
+
+def changes(previous: dict | None, current: dict) -> dict:
+    diff = price_changes(table(previous) if previous is not None else None, table(current))
+    return {code: (price, before) for code, price, before in zip(*(diff[c].to_pylist() for c in diff.column_names))}
+
+
+def test_price_changes_keeps_new_and_changed_items():
+    assert changes({'1': '5.90', '2': '3.00', '3': '1.00'}, {'1': '5.90', '2': '3.50', '4': '2.00'}) == {
+        '2': ('3.50', '3.00'), '4': ('2.00', None)}
+
+
+def test_price_changes_compares_values_not_text():
+    assert changes({'1': '5.90', '2': '3'}, {'1': ' 5.9', '2': '3.00'}) == {}
+
+
+def test_price_changes_skips_invalid_prices():
+    assert changes({'1': '5.90'}, {'1': 'n/a', '2': '', '3': None}) == {}
+
+
+def test_price_changes_without_previous_lists_all():
+    assert changes(None, {'1': '5.90'}) == {'1': ('5.90', None)}
+
+
+def items(prices: dict) -> list[dict]:
+    return [{'ItemCode': code, 'ItemPrice': price} for code, price in prices.items()]
+
+
+def test_record_price_history_diffs_against_last_recorded(price_db):
+    async def run():
+        await create_db()
+        counts = [
+            # First snapshot is the starting point - not a change
+            await record_price_history(CHAIN, '001', '20251016060000', items({'1': '5.90', '2': '3.00'})),
+            await record_price_history(CHAIN, '001', '20251016070000', items({'1': '6.10', '2': '3.00'})),
+            # Already recorded
+            await record_price_history(CHAIN, '001', '20251016070000', items({'1': '9.99', '2': '3.00'})),
+            await record_price_history(CHAIN, '001', '20251016090000', items({'1': '6.10', '2': '2.50'})),
+        ]
+        async with connection.get_sessionmaker()() as session:
+            rows = (await session.execute(select(PriceHistory.item_code, PriceHistory.changed_at)
+                                          .order_by(PriceHistory.changed_at))).all()
+        await connection.dispose_engine()
+        return counts, rows
+
+    counts, rows = asyncio.run(run())
+    assert counts == [0, 1, 0, 1]
+    assert [(code, f'{changed_at:%H}') for code, changed_at in rows] == [('1', '07'), ('2', '09')]
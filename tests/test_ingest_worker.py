@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from backend.app.db import connection
+from backend.app.db.create_db import create_db
+from backend.app.pipeline import ingest_worker
+from backend.app.pipeline.ingest_worker import submit_ingest
+from backend.app.services import db_service
+
+CHAIN = '7290027600007'
+
+
+@pytest.fixture
+def ingester(price_db):
+    """ Price tables created, the ingest thread stopped (and its connections closed) after the test """
+    async def create():
+        await create_db()
+        await connection.dispose_engine()
+
+    asyncio.run(create())
+    yield
+    ingest_worker.stop_ingester()
+
+
+def store_prices() -> list[str]:
+    async def run():
+        prices = await db_service.get_store_prices([(CHAIN, '1')], ['1'])
+        await connection.dispose_engine()
+        return [d['ItemPrice'] for d in prices.get((CHAIN, '1'), [])]
+
+    return asyncio.run(run())
+
+
+def test_nothing_queued_when_price_db_disabled():
+    assert submit_ingest(CHAIN, '001', 'items', '20251016060000', [{'ItemCode': '1'}]) is None
+
+
+def test_snapshots_are_loaded_in_the_background(ingester):
+    first = submit_ingest(CHAIN, '001', 'items', '20251016060000', [{'ItemCode': '1', 'ItemPrice': '5.90'}])
+    older = submit_ingest(CHAIN, '001', 'items', '20251016050000', [{'ItemCode': '1', 'ItemPrice': '4.90'}])
+
+    assert (first.result(10), older.result(10)) == (True, False)
+    assert store_prices() == ['5.9']
+
+
+def test_failure_is_logged_and_next_snapshot_loaded(ingester, monkeypatch, capsys):
+    ingest_snapshot = ingest_worker.ingest_snapshot
+    calls = []
+
+    async def failing_once(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise RuntimeError('connection lost')
+        return await ingest_snapshot(*args)
+
+    monkeypatch.setattr(ingest_worker, 'ingest_snapshot', failing_once)
+    failed = submit_ingest(CHAIN, '001', 'items', '20251016060000', [{'ItemCode': '1', 'ItemPrice': '5.90'}])
+    loaded = submit_ingest(CHAIN, '001', 'items', '20251016070000', [{'ItemCode': '1', 'ItemPrice': '6.10'}])
+
+    with pytest.raises(RuntimeError):
+        failed.result(10)
+    assert loaded.result(10) is True
+    assert 'Ingesting items of chain 7290027600007 store 001 failed' in capsys.readouterr().out
+    assert store_prices() == ['6.1']
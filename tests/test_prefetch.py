@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app.pipeline import prefetch
+from backend.app.services import demand_service
+
+CHAIN = '7290027600007'
+BASE = 'https://example.com/'
+
+
+@pytest.fixture(autouse=True)
+def state(monkeypatch):
+    monkeypatch.setattr(prefetch, '_last_prefetch', {})
+    monkeypatch.setattr(demand_service, '_publications', demand_service.defaultdict(list))
+
+
+def publish(*stamps: str):
+    """ The chain published files at the hourly stamps """
+    demand_service.record_publication(CHAIN, {f'price{i}': f'{BASE}Price{CHAIN}-001-{stamp}.gz'
+                                              for i, stamp in enumerate(stamps)})
+
+
+def test_never_prefetched_is_due():
+    assert prefetch.is_due(CHAIN, '1', datetime(2025, 10, 16, 9))
+
+
+def test_due_after_expected_publication():
+    publish('202510160600', '202510160700')
+    prefetch._last_prefetch[(CHAIN, '1')] = datetime(2025, 10, 16, 7, 30)
+    assert not prefetch.is_due(CHAIN, '1', datetime(2025, 10, 16, 7, 50))
+    assert prefetch.is_due(CHAIN, '1', datetime(2025, 10, 16, 8, 5))
+
+
+def test_not_due_within_min_refetch():
+    publish('202510160600', '202510160700')
+    prefetch._last_prefetch[(CHAIN, '1')] = datetime(2025, 10, 16, 7, 55)
+    assert not prefetch.is_due(CHAIN, '1', datetime(2025, 10, 16, 8, 5))
+
+
+def test_due_again_when_prefetch_after_expected_time_found_nothing():
+    # Expected at 08:00, prefetched at 08:10 and nothing new was published
+    publish('202510160600', '202510160700')
+    prefetch._last_prefetch[(CHAIN, '1')] = datetime(2025, 10, 16, 8, 10)
+    assert not prefetch.is_due(CHAIN, '1', datetime(2025, 10, 16, 8, 40))
+    assert prefetch.is_due(CHAIN, '1', datetime(2025, 10, 16, 9, 10))
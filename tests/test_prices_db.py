@@ -0,0 +1,74 @@
+import asyncio
+import json
+from decimal import Decimal
+
+import pytest
+
+from backend.app.db import connection
+from backend.app.db.create_db import create_db
+from backend.app.db.models import store_code_key, store_key
+from backend.app.db.prices_db import PRICE_COLUMNS, PROMO_COLUMNS, price_rows, promo_rows
+from backend.app.services import db_service
+
+
+@pytest.mark.parametrize('code, key', [('001', '1'), (1, '1'), (' 42 ', '42'), ('000', '0'), ('A12', 'A12'),
+                                       ('²', '²'), (None, ''), ('', '')])
+def test_store_code_key_never_raises(code, key):
+    assert store_code_key(code) == key
+
+
+def test_store_key_matches_stores_table():
+    assert store_key(7290027600007, '007') == ('7290027600007', '7')
+
+
+def test_price_rows_convert_fields():
+    records = [
+        {'ItemCode': ' 7290000000011 ', 'ItemNm': 'Milk', 'Quantity': '1,000', 'bIsWeighted': '0',
+         'ItemPrice': '5.90', 'UnitOfMeasurePrice': 'n/a', 'AllowDiscount': '1'},
+        {'ItemCode': '', 'ItemPrice': '1.00'},
+    ]
+    row = dict(zip(PRICE_COLUMNS, price_rows(records)[0]))
+    assert len(price_rows(records)) == 1
+    assert row['item_code'] == '7290000000011'
+    assert row['item_name'] == 'Milk'
+    assert row['quantity'] == Decimal('1000')
+    assert row['is_weighted'] is False and row['allow_discount'] is True
+    assert row['item_price'] == Decimal('5.90')
+    assert row['unit_of_measure_price'] is None
+
+
+def test_promo_rows_flatten_items():
+    promo = {'PromotionId': '77', 'PromotionDescription': '2 for 10', 'MinQty': '2', 'DiscountedPrice': '10',
+             'PromotionStartDate': '2025-10-01', 'PromotionStartHour': '00:00',
+             'AdditionalRestrictions': {'Clubs': {'ClubId': '0'}},
+             'PromotionItems': {'Item': {'ItemCode': '1'}}}
+    promos, items = promo_rows([promo, {'PromotionId': None}])
+
+    row = dict(zip(PROMO_COLUMNS, promos[0]))
+    assert len(promos) == 1
+    assert row['min_qty'] == Decimal('2') and row['club_id'] == '0'
+    assert row['start_date'] == '2025-10-01 00:00' and row['end_date'] is None
+    assert json.loads(row['raw']) == promo
+    assert items == [('77', '1')]
+
+
+def test_ingest_snapshot_once_per_timestamp(price_db):
+    chain = '7290027600007'
+
+    async def run():
+        await create_db()
+        first = await db_service.ingest_snapshot(chain, '001', 'items', '20251016060000',
+                                                 [{'ItemCode': '1', 'ItemPrice': '5.90'}])
+        again = await db_service.ingest_snapshot(chain, '1', 'items', '20251016060000',
+                                                 [{'ItemCode': '1', 'ItemPrice': '9.90'}])
+        prices = await db_service.get_store_prices([(chain, '001')], ['1', '2'])
+        newer = await db_service.ingest_snapshot(chain, 1, 'items', '20251016070000',
+                                                 [{'ItemCode': '1', 'ItemPrice': '6.10'}])
+        updated = await db_service.get_store_prices([(chain, 1)], ['1'])
+        await connection.dispose_engine()
+        return first, again, prices, newer, updated
+
+    first, again, prices, newer, updated = asyncio.run(run())
+    assert (first, again, newer) == (True, False, True)
+    assert [d['ItemPrice'] for d in prices[(chain, '1')]] == ['5.9']
+    assert [d['ItemPrice'] for d in updated[(chain, '1')]] == ['6.1']
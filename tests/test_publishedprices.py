@@ -0,0 +1,60 @@
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from backend.app.core import publishedprices
+from backend.app.core.publishedprices import RamiLevi
+from backend.app.devtools.publishedprices_stub import PortalHandler
+from backend.app.utilities.http_client import close_clients
+from backend.app.utilities.url_to_dict import data_records
+
+
+@pytest.fixture
+def portal(monkeypatch):
+    """ The local stand-in portal on a free port, with the chains pointed at it """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PortalHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(publishedprices, 'PORTAL_URL', f'http://127.0.0.1:{server.server_port}')
+    monkeypatch.setattr(publishedprices, '_sessions', {})
+    RamiLevi.clear_listing_cache()
+    yield
+    RamiLevi.clear_listing_cache()
+    server.shutdown()
+    thread.join()
+
+
+def run(coro):
+    """ Run coro and close the pooled clients of its loop """
+    async def main():
+        try:
+            return await coro
+        finally:
+            await close_clients()
+    return asyncio.run(main())
+
+
+def test_list_files_with_server_side_search(portal):
+    result = run(RamiLevi.list_files(search='PriceFull'))
+    assert 'Error' not in result
+    assert len(result['links']) == 3
+    assert all('/file/d/PriceFull' in link for link in result['links'])
+    assert result['cookies'].get('cftpSID')
+
+
+def test_prices_resolve_latest_files_of_store(portal):
+    urls = run(RamiLevi.prices('001'))
+    assert set(urls) == {'pricefull', 'price', 'promofull', 'promo', 'cookies'}
+    assert f'PriceFull{RamiLevi.chain_code}-001-' in urls['pricefull']
+
+
+def test_files_download_with_the_session_cookies(portal):
+    async def download():
+        urls = await RamiLevi.prices('015')
+        return await data_records(urls['pricefull'], kind='items', cookies=urls['cookies'])
+
+    records = run(download())
+    assert len(records) == 10
+    assert records[0]['ItemPrice'] == '1.90'
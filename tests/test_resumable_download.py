@@ -0,0 +1,124 @@
+import asyncio
+import gzip
+
+import httpx
+import pytest
+
+from backend.app.utilities import file_cache, url_to_dict
+from backend.app.utilities.url_to_dict import resumable_download
+
+URL = 'https://example.com/PriceFull7290027600007-001-202510160600.gz'
+CONTENT = gzip.compress(b'<Root>' + b'<Item><ItemCode>1</ItemCode></Item>' * 2000 + b'</Root>')
+HALF = len(CONTENT) // 2
+
+
+class DroppedStream(httpx.AsyncByteStream):
+    """ Response body that breaks off after the given bytes """
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    async def __aiter__(self):
+        yield self.content
+        raise httpx.ReadError('connection dropped')
+
+
+class Transport(httpx.AsyncBaseTransport):
+    """ Answers requests with handler - unlike MockTransport the body is streamed, so it can break off """
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return self.handler(request)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_cache, 'CACHE_DIR', tmp_path)
+    sleep = asyncio.sleep
+    monkeypatch.setattr(url_to_dict.asyncio, 'sleep', lambda delay: sleep(0))
+    return tmp_path
+
+
+def download(handler):
+    """ Run resumable_download against handler - returns (result, Range headers of the requests) """
+    ranges = []
+
+    def record(request: httpx.Request) -> httpx.Response:
+        ranges.append(request.headers.get('Range'))
+        return handler(request)
+
+    async def run():
+        async with httpx.AsyncClient(transport=Transport(record)) as client:
+            return await resumable_download(URL, client)
+
+    return asyncio.run(run()), ranges
+
+
+def partial_range(request: httpx.Request) -> httpx.Response:
+    """ Serve the requested range of CONTENT with 206 """
+    start = int(request.headers['Range'].split('=')[1].rstrip('-'))
+    return httpx.Response(206, stream=httpx.ByteStream(CONTENT[start:]),
+                          headers={'Content-Range': f'bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}'})
+
+
+def write_partial(content: bytes):
+    partial = file_cache.PartialFile(URL)
+    partial.part_path.write_bytes(content)
+
+
+def assert_cached(result):
+    path = file_cache.cache_path(URL)
+    assert result == {'path': path, 'temporary': False}
+    assert path.read_bytes() == CONTENT
+    assert not path.with_name(f'{path.name}.part').exists()
+    assert not path.with_name(f'{path.name}.lock').exists()
+
+
+def test_resumes_with_range_after_drop():
+    def handler(request):
+        if 'Range' in request.headers:
+            return partial_range(request)
+        return httpx.Response(200, stream=DroppedStream(CONTENT[:HALF]),
+                              headers={'Content-Length': str(len(CONTENT))})
+
+    result, ranges = download(handler)
+    assert ranges == [None, f'bytes={HALF}-']
+    assert_cached(result)
+
+
+def test_restarts_when_server_ignores_range():
+    write_partial(CONTENT[:HALF])
+
+    result, ranges = download(lambda request: httpx.Response(200, stream=httpx.ByteStream(CONTENT)))
+    assert ranges == [f'bytes={HALF}-']
+    assert_cached(result)
+
+
+def test_range_not_satisfiable_commits_complete_partial():
+    write_partial(CONTENT)
+
+    result, ranges = download(lambda request: httpx.Response(416))
+    assert ranges == [f'bytes={len(CONTENT)}-']
+    assert_cached(result)
+
+
+def test_corrupt_resume_is_discarded_and_downloaded_again():
+    # Right size, wrong bytes - the gzip check fails after the resume
+    write_partial(CONTENT[:HALF - 8] + bytes(8))
+
+    def handler(request):
+        if 'Range' in request.headers:
+            return partial_range(request)
+        return httpx.Response(200, stream=httpx.ByteStream(CONTENT))
+
+    result, ranges = download(handler)
+    assert ranges == [f'bytes={HALF}-', None]
+    assert_cached(result)
+
+
+def test_http_error_keeps_nothing():
+    result, _ = download(lambda request: httpx.Response(404))
+    assert result == {'Error': 'HTTP error: 404'}
+    assert not file_cache.cache_path(URL).exists()
@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from backend.app.core import shufersal
+from backend.app.core.shufersal import Shufersal
+
+
+def page_html(stamps: list[datetime], file_type: str = 'Price', pages: int = 50) -> bytes:
+    links = ''.join(f'<a href="https://blob/{file_type}{Shufersal.chain_code}-001-{t:%Y%m%d%H%M}.gz?sig=1">x</a>'
+                    for t in stamps)
+    return f'{links}<a href="/FileObject/UpdateCategory?catID=0&amp;page={pages}">last</a>'.encode()
+
+
+def listing(pages: dict[int, bytes]):
+    """ get_file() answering from pages and recording the pages requested """
+    requested = []
+
+    async def get_file(store_code=None, file_type=0, page=1, client=None):
+        requested.append(page)
+        return {'response': pages.get(page, b'')}
+
+    return get_file, requested
+
+
+def hourly(start: datetime, count: int) -> list[datetime]:
+    return [start - timedelta(hours=i) for i in range(count)]
+
+
+def test_all_types_on_first_page(monkeypatch):
+    now = datetime(2025, 10, 16, 12)
+    html = page_html([now]) + page_html([now], 'Promo') + page_html([now], 'PriceFull') + \
+        page_html([now], 'PromoFull')
+    get_file, requested = listing({1: html})
+    monkeypatch.setattr(Shufersal, 'get_file', get_file)
+
+    result = asyncio.run(Shufersal.store_listing('001'))
+
+    assert requested == [1]
+    assert set(result['response']) == {'price', 'promo', 'pricefull', 'promofull'}
+    assert all(result['response'].values())
+
+
+def test_missing_type_stops_after_listing_span(monkeypatch):
+    # 20 hourly Price files per page - the store never publishes the other types
+    now = datetime(2025, 10, 16, 12)
+    pages = {p: page_html(hourly(now - timedelta(hours=20 * (p - 1)), 20)) for p in range(1, 51)}
+    get_file, requested = listing(pages)
+    monkeypatch.setattr(Shufersal, 'get_file', get_file)
+
+    result = asyncio.run(Shufersal.store_listing('001'))
+
+    assert requested == [1, 2]
+    assert result['response']['price'] and result['response']['promofull'] is None
+
+
+def test_page_cap(monkeypatch):
+    # Files every minute - the span is never reached
+    now = datetime(2025, 10, 16, 12)
+    pages = {p: page_html([now - timedelta(minutes=20 * (p - 1) + i) for i in range(20)]) for p in range(1, 51)}
+    get_file, requested = listing(pages)
+    monkeypatch.setattr(Shufersal, 'get_file', get_file)
+
+    asyncio.run(Shufersal.store_listing('001'))
+
+    assert requested == list(range(1, shufersal.MAX_STORE_PAGES + 1))
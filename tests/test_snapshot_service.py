@@ -0,0 +1,39 @@
+import pytest
+
+from backend.app.services import snapshot_service
+from backend.app.services.snapshot_service import latest_snapshot, load_snapshot, save_snapshot, file_timestamp
+
+CHAIN = '7290027600007'
+BASE = 'https://example.com/file/d/'
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_service, 'SNAPSHOT_DIR', tmp_path)
+
+
+@pytest.mark.parametrize('url, expected', [
+    (f'{BASE}PriceFull{CHAIN}-001-202510160600.gz', '20251016060000'),
+    (f'{BASE}Price7290492000005-000-123-20251016-060015.gz?x=1', '20251016060015'),
+    (f'{BASE}Promo{CHAIN}-001-20251016-0600.xml', '20251016060000'),
+    ('C:\\files\\Stores7290058140886-202510160500.xml', '20251016050000'),
+    (f'{BASE}PriceFull{CHAIN}-001-209913990000.gz', None),
+    (f'{BASE}readme.txt', None),
+    (None, None),
+])
+def test_file_timestamp(url, expected):
+    assert file_timestamp(url) == expected
+
+
+def test_full_and_delta_with_same_timestamp_are_kept_apart():
+    full = f'{BASE}PriceFull{CHAIN}-001-202510160600.gz'
+    delta = f'{BASE}Price{CHAIN}-001-202510160600.gz'
+    save_snapshot(CHAIN, '001', 'items', full, [{'ItemCode': '1', 'ItemPrice': '1.00'}])
+    save_snapshot(CHAIN, '001', 'items', delta, [{'ItemCode': '2', 'ItemPrice': '2.00'}],
+                  full_timestamp='20251015060000')
+
+    assert load_snapshot(CHAIN, '001', 'items', full) == [{'ItemCode': '1', 'ItemPrice': '1.00'}]
+    assert load_snapshot(CHAIN, '001', 'items', delta) == [{'ItemCode': '2', 'ItemPrice': '2.00'}]
+    latest = latest_snapshot(CHAIN, '001', 'items')
+    assert latest['timestamp'] == latest['full_timestamp'] == '20251016060000'
+    assert latest['records'] == [{'ItemCode': '1', 'ItemPrice': '1.00'}]
@@ -0,0 +1,69 @@
+import asyncio
+from decimal import Decimal
+
+from sqlalchemy import insert, select, text
+
+from backend.app.db import connection
+from backend.app.db.create_db import create_db
+from backend.app.db.models import Store, StorePrice
+from backend.app.db.prices_db import PostgresBackend
+from backend.app.db.sqlite_db import SqliteBackend
+from backend.app.db.storage import get_backend
+
+
+def test_backend_is_selected_by_database_url():
+    assert get_backend('sqlite+aiosqlite:///xollify.db') is SqliteBackend
+    assert get_backend('postgresql+asyncpg://user@host/db') is PostgresBackend
+
+
+def test_prices_are_exact_on_sqlite(price_db):
+    key = {'chain_code': '7290027600007', 'store_code': '1'}
+
+    async def run():
+        await create_db()
+        async with connection.get_engine().begin() as conn:
+            await conn.execute(insert(StorePrice), [{**key, 'item_code': '1', 'item_price': Decimal('5.90')},
+                                                    {**key, 'item_code': '2', 'item_price': Decimal('0.10')}])
+            stored = (await conn.execute(text('SELECT item_price, typeof(item_price) FROM store_prices '
+                                              'ORDER BY item_code'))).all()
+            prices = (await conn.execute(select(StorePrice.item_price).order_by(StorePrice.item_code))).scalars().all()
+            same = (await conn.execute(select(StorePrice.item_code)
+                                       .where(StorePrice.item_price == Decimal('5.9')))).scalars().all()
+        await connection.dispose_engine()
+        return stored, prices, same
+
+    stored, prices, same = asyncio.run(run())
+    assert stored == [('5.9', 'text'), ('0.1', 'text')]
+    assert prices == [Decimal('5.9'), Decimal('0.1')]
+    assert same == ['1']
+
+
+def test_unchanged_prices_are_not_rewritten(price_db):
+    records = [{'ItemCode': '1', 'ItemPrice': '5.90'}, {'ItemCode': '2', 'ItemPrice': '0.10'}]
+
+    async def run():
+        await create_db()
+        first = await SqliteBackend.ingest_store_prices('7290027600007', '1', records)
+        # Same prices written differently
+        same = [r | {'ItemPrice': r['ItemPrice'].rstrip('0')} for r in records]
+        again = await SqliteBackend.ingest_store_prices('7290027600007', '1', same)
+        await connection.dispose_engine()
+        return first, again
+
+    assert asyncio.run(run()) == (2, 0)
+
+
+def test_upsert_keeps_published_store_code(price_db):
+    store = {'chain_code': '7290027600007', 'store_code': '001', 'store_name': 'Store', 'city': 'Haifa'}
+
+    async def run():
+        await create_db()
+        async with connection.get_engine().begin() as conn:
+            await conn.execute(insert(Store), [store])
+        written = await SqliteBackend.upsert_stores([store | {'city': 'Tel Aviv'}])
+        async with connection.get_engine().begin() as conn:
+            rows = (await conn.execute(select(Store.store_code, Store.city))).all()
+        await connection.dispose_engine()
+        return written, rows
+
+    assert asyncio.run(run()) == (1, [('001', 'Tel Aviv')])
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from backend.app.core import super_class
+from backend.app.core.super_class import SupermarketChain
+
+
+class Chain(SupermarketChain):
+    abstract = True
+    alias = 'test-chain'
+
+
+class CountingFetch:
+    """ Fetch that counts its calls and answers after a short wait (or raises) """
+
+    def __init__(self, result=None, error: Exception | None = None):
+        self.calls = 0
+        self.result = result if result is not None else {'urls': ['a.gz']}
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+@pytest.fixture(autouse=True)
+def listings(monkeypatch):
+    monkeypatch.setattr(super_class, '_listings', {})
+
+
+def test_concurrent_callers_share_one_fetch():
+    fetch = CountingFetch()
+
+    async def run():
+        return await asyncio.gather(*(Chain.cached_listing('files', fetch) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert fetch.calls == 1
+    assert all(result == fetch.result for result in results)
+
+
+def test_listing_cached_within_ttl():
+    fetch = CountingFetch()
+    asyncio.run(Chain.cached_listing('files', fetch))
+    asyncio.run(Chain.cached_listing('files', fetch))
+    assert fetch.calls == 1
+
+    # Age the listing past LISTING_TTL
+    super_class._listings[('test-chain', 'files')]['created'] -= super_class.LISTING_TTL
+    asyncio.run(Chain.cached_listing('files', fetch))
+    assert fetch.calls == 2
+
+
+def test_failed_fetch_not_cached():
+    failing = CountingFetch(error=RuntimeError('listing down'))
+
+    async def run():
+        return await asyncio.gather(*(Chain.cached_listing('files', failing) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert failing.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    fetch = CountingFetch()
+    assert asyncio.run(Chain.cached_listing('files', fetch)) == fetch.result
+    assert fetch.calls == 1
+
+
+def test_error_result_not_cached():
+    error = CountingFetch(result={'Error': 'blocked'})
+    assert asyncio.run(Chain.cached_listing('files', error)) == {'Error': 'blocked'}
+    asyncio.run(Chain.cached_listing('files', error))
+    assert error.calls == 2
@@ -0,0 +1,93 @@
+import asyncio
+import gzip
+import io
+import zipfile
+
+import pytest
+
+from backend.app.utilities import url_to_dict
+from backend.app.utilities.url_to_dict import ChunkDecompressor
+
+
+XML = b'<?xml version="1.0" encoding="utf-8"?><Root><Items>' + b'<Item><ItemCode>1</ItemCode></Item>' * 500 + \
+      b'</Items></Root>'
+
+
+def decompress(content: bytes, chunk_size: int) -> bytes:
+    """ Feed content to a ChunkDecompressor in chunks of chunk_size """
+    decompressor = ChunkDecompressor()
+    for i in range(0, len(content), chunk_size):
+        decompressor.feed(content[i:i + chunk_size])
+    with decompressor.finish() as xml_file:
+        return xml_file.read()
+
+
+def zipped(content: bytes, name: str = 'Price.xml') -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('readme.txt', b'not this one')
+        z.writestr(name, content)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1000, 1 << 20])
+def test_gzip(chunk_size):
+    assert decompress(gzip.compress(XML), chunk_size) == XML
+
+
+def test_concatenated_gzip_members():
+    content = gzip.compress(XML[:100]) + gzip.compress(XML[100:])
+    assert decompress(content, 64) == XML
+
+
+@pytest.mark.parametrize('chunk_size', [2, 1000])
+def test_zip_picks_xml_member(chunk_size):
+    assert decompress(zipped(XML), chunk_size) == XML
+
+
+def test_zip_without_xml():
+    decompressor = ChunkDecompressor()
+    decompressor.feed(zipped(XML, name='Price.txt'))
+    with pytest.raises(ValueError):
+        decompressor.finish()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 1000])
+def test_plain_xml(chunk_size):
+    assert decompress(XML, chunk_size) == XML
+
+
+def test_stream_shorter_than_magic():
+    assert decompress(b'<a', 1) == b'<a'
+
+
+@pytest.mark.parametrize('content', [b'<Root><A>Tom &amp; Jerry</A></Root>', b'<Root><A>Tom & Jerry</A></Root>'])
+def test_data_dict_parses_and_repairs(monkeypatch, tmp_path, content):
+    path = tmp_path / 'Stores.xml'
+    path.write_bytes(gzip.compress(content))
+
+    async def download_to_file(url, cookies=None, client=None):
+        return {'path': path, 'temporary': True}
+
+    monkeypatch.setattr(url_to_dict, 'download_to_file', download_to_file)
+    result = asyncio.run(url_to_dict.data_dict('https://example.com/Stores7290058140886-202510160500.xml'))
+    assert result == {'Root': {'A': 'Tom & Jerry'}}
+    assert not path.exists()
+
+
+def test_data_dict_parses_in_pool(monkeypatch, tmp_path):
+    path = tmp_path / 'Stores.xml'
+    path.write_bytes(b'<Root><A>1</A></Root>')
+    calls = []
+
+    async def download_to_file(url, cookies=None, client=None):
+        return {'path': path, 'temporary': False}
+
+    async def run_in_pool(func, *args, **kwargs):
+        calls.append(func)
+        return func(*args, **kwargs)
+
+    monkeypatch.setattr(url_to_dict, 'download_to_file', download_to_file)
+    monkeypatch.setattr(url_to_dict, 'run_in_pool', run_in_pool)
+    assert asyncio.run(url_to_dict.data_dict('https://example.com/Stores.xml')) == {'Root': {'A': '1'}}
+    assert calls == [url_to_dict.parse_file_dict]
@@ -0,0 +1,81 @@
+import codecs
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from backend.app.utilities import xml_repair
+from backend.app.utilities.xml_repair import (detect_encoding, decode_xml, parse_with_repair, record_repairs,
+                                              record_repair_failure)
+
+
+def parse(xml_bytes: bytes):
+    return ET.fromstring(xml_bytes)
+
+
+def test_detect_encoding_from_bom():
+    assert detect_encoding(codecs.BOM_UTF8 + b'<Root/>') == 'utf-8-sig'
+
+
+def test_detect_encoding_from_prolog():
+    assert detect_encoding(b'<?xml version="1.0" encoding="windows-1255"?><Root/>') == 'cp1255'
+
+
+def test_detect_encoding_utf8_without_declaration():
+    assert detect_encoding('<Root>חלב</Root>'.encode('utf-8')) == 'utf-8'
+
+
+def test_decode_xml_falls_back_when_declaration_is_wrong():
+    xml_bytes = '<?xml version="1.0" encoding="utf-8"?><Root>חלב</Root>'.encode('cp1255')
+    assert decode_xml(xml_bytes).startswith('<?xml')
+
+
+def test_valid_document_is_not_repaired():
+    root, applied = parse_with_repair(b'<Root><A>1</A></Root>', parse=parse)
+    assert root.find('A').text == '1'
+    assert applied == []
+
+
+@pytest.mark.parametrize('xml_bytes, repair', [
+    (b'<Root><A>Tom & Jerry</A></Root>', 'ampersands'),
+    (b'<Root><A>1</A></Root>garbage', 'trailing_text'),
+])
+def test_broken_document_is_repaired(xml_bytes, repair):
+    root, applied = parse_with_repair(xml_bytes, parse=parse)
+    assert root.find('A') is not None
+    assert applied == [repair]
+
+
+def test_wrong_encoding_declaration_is_repaired():
+    name = 'חלב תנובה 3% בקרטון'
+    xml_bytes = ('<?xml version="1.0" encoding="utf-8"?><Root>' + f'<A>{name}</A>' * 20 + '</Root>').encode('cp1255')
+    root, applied = parse_with_repair(xml_bytes, parse=parse)
+    assert root.find('A').text == name
+    assert applied == ['encoding']
+
+
+def test_recover_parse_is_tried_last():
+    root, applied = parse_with_repair(b'<Root><A>1</B></Root>', parse=parse,
+                                      recover_parse=lambda b: ET.fromstring(b'<Root/>'))
+    assert root.tag == 'Root'
+    assert applied == ['recover']
+
+
+def test_original_error_is_raised_when_no_repair_helps():
+    with pytest.raises(ET.ParseError):
+        parse_with_repair(b'<Root><A>1</B></Root>', parse=parse)
+
+
+def test_repairs_are_counted_without_output(monkeypatch, capsys):
+    monkeypatch.setattr(xml_repair, 'REPAIR_STATS', xml_repair.defaultdict(xml_repair.Counter))
+    record_repairs('chain', ['ampersands'])
+    record_repairs('chain', ['ampersands', 'tag_spacing'])
+    record_repairs('chain', [])
+    assert xml_repair.REPAIR_STATS['chain'] == {'ampersands': 2, 'tag_spacing': 1}
+    assert capsys.readouterr().out == ''
+
+
+def test_repair_failure_is_counted_and_reported(monkeypatch, capsys):
+    monkeypatch.setattr(xml_repair, 'REPAIR_STATS', xml_repair.defaultdict(xml_repair.Counter))
+    record_repair_failure('chain', 'https://example.com/Price.gz', ValueError('bad'))
+    assert xml_repair.REPAIR_STATS['chain']['failed'] == 1
+    assert 'chain' in capsys.readouterr().out